@@ -0,0 +1,192 @@
+import json
+
+from django.http import JsonResponse, QueryDict
+from django.views.decorators.http import require_http_methods
+
+from . import views
+from .forms import ChatForm
+from .search_index import PAGE_SIZE as SEARCH_PAGE_SIZE
+from .session_store import CHAT_ID_PATTERN
+
+# JSON endpoints next to the HTML views, so the page can create, rename, delete
+# and page through chats without a full render:
+#
+#   GET    api/chats/                    chats, most recently active first (?page=, ?page_size=)
+#   POST   api/chats/                    new chat {"title"?}: id allocated locally, nothing sent upstream
+#   GET    api/chats/<id>/               the chat and its latest page of messages
+#   PATCH  api/chats/<id>/               rename {"title"}
+#   DELETE api/chats/<id>/               delete
+#   GET    api/chats/<id>/messages/      messages, newest first (?before=<cursor>, ?limit=)
+#   POST   api/chats/<id>/messages/      send {"message", "file_url"?}: the reply as JSON,
+#                                        or as text/event-stream with ?stream=1 (like /stream/);
+#                                        a failed reply is not saved (502, or an "error" event)
+#   GET    api/search/?q=                 full-text search over all chats (?chat_id=, ?page=, ?page_size=);
+#                                        "truncated": true if only the newest SEARCH_CANDIDATES of
+#                                        "total" matches were ranked (and can be paged through)
+#
+# Bodies are JSON or form-encoded; POST/PATCH/DELETE need the CSRF token (X-CSRFToken).
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def error(message, status):
+    return JsonResponse({"error": message}, status=status)
+
+
+def read_body(request):
+    if request.content_type == "application/json":
+        try:
+            body = json.loads(request.body or b"{}")
+        except ValueError:
+            return None
+        return body if isinstance(body, dict) else None
+    if request.method == "POST":
+        return request.POST
+    # Django only parses form bodies of POST requests
+    return QueryDict(request.body)
+
+
+def int_param(request, name, default, maximum=None):
+    value = request.GET.get(name)
+    if value is None:
+        return default
+    if not value.isdigit() or int(value) < 1:
+        return None
+    return min(int(value), maximum) if maximum else int(value)
+
+
+def chat_json(chat_id, entry):
+    return {
+        "id": chat_id,
+        "title": entry.get("title"),
+        "messages": entry.get("messages", 0),
+        "created": entry.get("created"),
+        "updated": entry.get("updated"),
+    }
+
+
+def get_chat(chat_id):
+    """The chat's index entry, or None if there is no such chat."""
+    if not CHAT_ID_PATTERN.match(chat_id):
+        return None
+    entry = views.session_store.index.get(chat_id)
+    if entry is None and views.session_store.exists(chat_id):
+        # Session file written by another process since the index was loaded
+        entry = {}
+    return entry
+
+
+@require_http_methods(["GET", "POST"])
+def chats(request):
+    if request.method == "POST":
+        body = read_body(request)
+        if body is None:
+            return error("Invalid JSON body", 400)
+        title = (body.get("title") or "").strip() or None
+        chat_id = views.create_chat(title)
+        return JsonResponse(chat_json(chat_id, views.session_store.index.get(chat_id) or {}), status=201)
+
+    page = int_param(request, "page", 1)
+    page_size = int_param(request, "page_size", PAGE_SIZE, MAX_PAGE_SIZE)
+    if page is None or page_size is None:
+        return error("page and page_size must be positive integers", 400)
+    entries = views.session_store.index.entries()
+    chat_ids = sorted(entries, key=lambda chat_id: entries[chat_id].get("updated", 0), reverse=True)
+    start = (page - 1) * page_size
+    return JsonResponse({
+        "chats": [chat_json(chat_id, entries[chat_id]) for chat_id in chat_ids[start:start + page_size]],
+        "total": len(chat_ids),
+        "next_page": page + 1 if len(chat_ids) > start + page_size else None,
+    })
+
+
+@require_http_methods(["GET", "PATCH", "DELETE"])
+def chat_detail(request, chat_id):
+    entry = get_chat(chat_id)
+    if entry is None:
+        return error("Chat not found", 404)
+
+    if request.method == "DELETE":
+        views.delete_chat(chat_id)
+        return JsonResponse({"id": chat_id, "deleted": True})
+
+    if request.method == "PATCH":
+        body = read_body(request)
+        title = (body.get("title") or "").strip() if body is not None else ""
+        if not title:
+            return error("title is required", 400)
+        views.rename_chat(chat_id, title)
+        return JsonResponse(chat_json(chat_id, views.session_store.index.get(chat_id) or {}))
+
+    chat_messages, older_cursor = views.get_chat_history_page(chat_id)
+    return JsonResponse({**chat_json(chat_id, entry), "history": chat_messages, "next_cursor": older_cursor})
+
+
+@require_http_methods(["GET", "POST"])
+def chat_messages(request, chat_id):
+    if get_chat(chat_id) is None:
+        return error("Chat not found", 404)
+
+    if request.method == "GET":
+        before = request.GET.get("before")
+        limit = int_param(request, "limit", views.HISTORY_PAGE_SIZE, MAX_PAGE_SIZE)
+        if (before is not None and not before.isdigit()) or limit is None:
+            return error("before and limit must be integers", 400)
+        page, older_cursor = views.get_chat_history_page(chat_id, int(before) if before else None, limit)
+        return JsonResponse({"id": chat_id, "messages": page, "next_cursor": older_cursor})
+
+    body = read_body(request)
+    if body is None:
+        return error("Invalid JSON body", 400)
+    form = ChatForm({"message": body.get("message"), "file_url": body.get("file_url") or ""})
+    if not form.is_valid():
+        return JsonResponse({"error": form.errors}, status=400)
+    prompt = form.cleaned_data["message"]
+    file_url = form.cleaned_data.get("file_url") or None
+
+    if request.GET.get("stream") in ("1", "true"):
+        return views.stream_turn(chat_id, prompt, file_url)
+
+    history = views.get_full_chat_history(chat_id)
+    full_prompt = views.build_prompt(chat_id, history, prompt)
+    response_text, failure = views.send_message(full_prompt, file_url, chat_id)
+    if failure is not None:
+        # Nothing is saved, the client can simply retry
+        return error(failure, 502)
+
+    views.save_to_chat_log(chat_id, prompt, response_text)
+    views.set_chat_title(chat_id, response_text)
+    return JsonResponse({
+        "id": chat_id,
+        "reply": response_text,
+        "chat": chat_json(chat_id, views.session_store.index.get(chat_id) or {}),
+    })
+
+
+@require_http_methods(["GET"])
+def search(request):
+    query = request.GET.get("q", "").strip()
+    if not query:
+        return error("q is required", 400)
+    page = int_param(request, "page", 1)
+    page_size = int_param(request, "page_size", SEARCH_PAGE_SIZE, MAX_PAGE_SIZE)
+    if page is None or page_size is None:
+        return error("page and page_size must be positive integers", 400)
+    chat_id = request.GET.get("chat_id") or None
+    if chat_id is not None and not CHAT_ID_PATTERN.match(chat_id):
+        return error("Invalid chat_id", 400)
+
+    with views.tracing.span("search_index", op="search"):
+        results, next_page, total = views.search_index.search(query, page, page_size, chat_id)
+    titles = views.session_store.load_titles()
+    for result in results:
+        result["title"] = titles.get(result["chat_id"])
+    return JsonResponse({
+        "query": query,
+        "results": results,
+        "page": page,
+        "next_page": next_page,
+        "total": total,
+        "truncated": views.search_index.truncated(total),
+    })
@@ -0,0 +1,189 @@
+import atexit
+import json
+import os
+import threading
+import time
+
+from .atomic import atomic_write, file_lock
+
+# In-memory index of every chat's title and activity, persisted to chat_index.json.
+# Reads never touch the disk unless another process rewrote the file (its mtime
+# changed); writes are batched and flushed atomically FLUSH_DELAY seconds later.
+# Several processes (gunicorn workers) share the file: what is pending is kept as
+# changes (fields set, messages added), and a flush re-reads the file under a lock
+# file and applies them on top, so no worker overwrites another's updates.
+
+INDEX_FILENAME = "chat_index.json"
+FLUSH_DELAY = 1.0
+
+
+class ChatIndex:
+    def __init__(self, directory, bootstrap=None, flush_delay=FLUSH_DELAY):
+        """bootstrap() -> {chat_id: entry} builds the index when no index file exists yet."""
+        self.path = os.path.join(directory, INDEX_FILENAME)
+        self.flush_delay = flush_delay
+        self._bootstrap = bootstrap
+        self._lock = threading.RLock()
+        self._entries = None
+        self._mtime = None
+        # chat_id -> change (None = deleted) made since the last flush, see _apply
+        self._pending = {}
+        self._timer = None
+        atexit.register(self.flush)
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _load(self):
+        # Caller holds the lock
+        mtime = self._file_mtime()
+        if self._entries is not None and mtime == self._mtime:
+            return self._entries
+        if mtime is None:
+            entries = {}
+            if self._bootstrap:
+                # As defaults: another worker that bootstrapped first and flushed keeps its entries
+                for chat_id, entry in self._bootstrap().items():
+                    self._record(chat_id, {"reset": False, "fields": {}, "defaults": entry, "add_messages": 0})
+            self._schedule_flush()
+        else:
+            entries = self._read_file()
+        # Changes not flushed yet are applied on top of what is on disk
+        for chat_id, change in self._pending.items():
+            self._apply(entries, chat_id, change)
+        self._entries = entries
+        self._mtime = mtime
+        return entries
+
+    def _read_file(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    @staticmethod
+    def _apply(entries, chat_id, change):
+        """Apply a change to entries[chat_id]: None deletes it, otherwise defaults fill
+        empty fields, fields are set and add_messages is added to the message count."""
+        if change is None:
+            entries.pop(chat_id, None)
+            return
+        entry = {} if change["reset"] else dict(entries.get(chat_id) or {})
+        for field, value in change["defaults"].items():
+            if not entry.get(field):
+                entry[field] = value
+        for field, value in change["fields"].items():
+            # Last activity only moves forward, whichever worker flushes last
+            entry[field] = max(value, entry.get(field) or 0) if field == "updated" else value
+        if change["add_messages"]:
+            entry["messages"] = (entry.get("messages") or 0) + change["add_messages"]
+        entries[chat_id] = entry
+
+    def _record(self, chat_id, change):
+        # Caller holds the lock; folds change into what is pending for chat_id
+        pending = self._pending.get(chat_id, False)
+        if change is None or pending is False or change["reset"]:
+            self._pending[chat_id] = change
+        elif pending is None:
+            # Deleted, then written again: whatever is on disk for it is gone
+            self._pending[chat_id] = {**change, "reset": True}
+        else:
+            # An absolute message count replaces the increments before it
+            add_messages = change["add_messages"] if "messages" in change["fields"] else (
+                pending["add_messages"] + change["add_messages"]
+            )
+            defaults = dict(pending["defaults"])
+            for field, value in change["defaults"].items():
+                if not defaults.get(field):
+                    defaults[field] = value
+            self._pending[chat_id] = {
+                "reset": pending["reset"],
+                "fields": {**pending["fields"], **change["fields"]},
+                "defaults": defaults,
+                "add_messages": add_messages,
+            }
+
+    def _update(self, chat_id, fields=None, defaults=None, add_messages=0):
+        # Caller holds the lock; fields=None deletes the chat
+        change = None if fields is None else {
+            "reset": False, "fields": fields, "defaults": defaults or {}, "add_messages": add_messages,
+        }
+        self._apply(self._entries, chat_id, change)
+        self._record(chat_id, change)
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending or self._entries is None:
+                return
+            # Read-modify-write under the lock file: other workers' flushes are kept
+            with file_lock(self.path + ".lock"):
+                entries = self._read_file()
+                for chat_id, change in self._pending.items():
+                    self._apply(entries, chat_id, change)
+                atomic_write(self.path, json.dumps(entries, ensure_ascii=False, indent=2).encode("utf-8"))
+                self._mtime = self._file_mtime()
+            self._entries = entries
+            self._pending = {}
+
+    # Reads
+    def entries(self):
+        with self._lock:
+            return dict(self._load())
+
+    def get(self, chat_id):
+        with self._lock:
+            return self._load().get(chat_id)
+
+    def titles(self):
+        with self._lock:
+            return {chat_id: entry.get("title") for chat_id, entry in self._load().items()}
+
+    def ids_by_activity(self):
+        """Chat ids, most recently active first."""
+        with self._lock:
+            entries = self._load()
+            return sorted(entries, key=lambda chat_id: entries[chat_id].get("updated", 0), reverse=True)
+
+    # Writes
+    def touch(self, chat_id, new_messages=0, messages=None, updated=None):
+        """Record activity on a chat: new_messages appended, or messages in total."""
+        with self._lock:
+            self._load()
+            updated = updated or time.time()
+            fields = {"updated": updated}
+            if messages is not None:
+                fields["messages"] = messages
+                new_messages = 0
+            self._update(chat_id, fields, {"title": None, "created": updated, "messages": 0}, new_messages)
+
+    def set_title(self, chat_id, title, overwrite=True):
+        with self._lock:
+            entry = self._load().get(chat_id)
+            if entry is not None and entry.get("title") and not overwrite:
+                return
+            now = time.time()
+            defaults = {"created": now, "updated": now, "messages": 0}
+            if overwrite:
+                self._update(chat_id, {"title": title}, defaults)
+            else:
+                # Another worker may have titled the chat since: its title is kept
+                self._update(chat_id, {}, {**defaults, "title": title})
+
+    def remove(self, chat_id):
+        with self._lock:
+            if chat_id in self._load():
+                self._update(chat_id)
@@ -0,0 +1,103 @@
+import os
+import re
+
+# Same estimate as the document chunks, so the two token budgets agree
+from text_chunker import estimate_tokens
+
+# Builds the prompt sent to the chat API within a token budget.
+# The newest turns are sent verbatim; older turns are folded into a rolling,
+# extractive summary (the first sentence of each message). The summary is saved
+# next to the session (SessionStore.write_summary) together with how many
+# messages it covers, so each message is summarized once, not on every request.
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKENS", 3000))
+# Share of the budget the summary of older turns may use
+SUMMARY_SHARE = 0.25
+# Words kept from each summarized message
+SUMMARY_LINE_WORDS = 25
+
+SUMMARY_HEADER = "Summary of the earlier conversation:"
+HISTORY_HEADER = "This is the conversation so far:"
+
+SENTENCE_END = re.compile(r"(?<=[.!?؟])\s")
+
+
+def format_message(message):
+    return f"{message['role'].capitalize()}: {message['content']}"
+
+
+def format_prompt(summary_lines, messages, latest_user_message):
+    lines = []
+    if summary_lines:
+        lines.append(SUMMARY_HEADER)
+        lines.extend(summary_lines)
+        lines.append("")
+    if messages:
+        lines.append(HISTORY_HEADER)
+        lines.extend(format_message(message) for message in messages)
+        lines.append("")  # empty line to separate
+
+    lines.append("Now, the user asks:")
+    lines.append(f"User: {latest_user_message}")
+    return "\n".join(lines)
+
+
+def summarize_message(message):
+    text = " ".join(message["content"].split())
+    first_sentence = SENTENCE_END.split(text, maxsplit=1)[0]
+    words = first_sentence.split()
+    if len(words) > SUMMARY_LINE_WORDS:
+        first_sentence = " ".join(words[:SUMMARY_LINE_WORDS]) + " ..."
+    return f"- {message['role'].capitalize()}: {first_sentence}"
+
+
+class ContextBuilder:
+    def __init__(self, store, budget=CONTEXT_TOKEN_BUDGET):
+        self.store = store
+        self.budget = budget
+        self.summary_budget = int(budget * SUMMARY_SHARE)
+
+    def _summary(self, chat_id, history, upto):
+        """Summary lines covering at least history[:upto]; returns (lines, messages covered)."""
+        summary = self.store.read_summary(chat_id)
+        # A summary covering more messages than exist belongs to a rewritten chat
+        if not summary or summary["covered"] > len(history):
+            summary = {"covered": 0, "lines": [], "dropped": 0}
+        if summary["covered"] >= upto:
+            return summary["lines"], summary["covered"]
+
+        lines = summary["lines"] + [summarize_message(message) for message in history[summary["covered"]:upto]]
+        # Keep the newest lines that fit; the oldest fall out of the summary
+        dropped = summary["dropped"]
+        while len(lines) > 1 and estimate_tokens("\n".join([SUMMARY_HEADER, *lines])) > self.summary_budget:
+            lines.pop(0)
+            dropped += 1
+        self.store.write_summary(chat_id, {"covered": upto, "lines": lines, "dropped": dropped})
+        return lines, upto
+
+    def build(self, chat_id, history, latest_user_message):
+        """Return (prompt, stats) where stats reports the tokens used and saved."""
+        full_tokens = estimate_tokens(format_prompt(None, history, latest_user_message))
+        if full_tokens <= self.budget or not chat_id:
+            return format_prompt(None, history, latest_user_message), {
+                "tokens": full_tokens, "full_tokens": full_tokens, "saved": 0, "summarized": 0,
+            }
+
+        # Newest messages that fit in what the summary and the new message leave over
+        available = (self.budget - self.summary_budget - estimate_tokens(HISTORY_HEADER)
+                     - estimate_tokens(format_prompt(None, [], latest_user_message)))
+        start = len(history)
+        used = 0
+        while start > 0:
+            cost = estimate_tokens(format_message(history[start - 1])) + 1
+            if used + cost > available:
+                break
+            used += cost
+            start -= 1
+
+        summary_lines, covered = self._summary(chat_id, history, start)
+        prompt = format_prompt(summary_lines, history[max(start, covered):], latest_user_message)
+        tokens = estimate_tokens(prompt)
+        return prompt, {
+            "tokens": tokens, "full_tokens": full_tokens, "saved": full_tokens - tokens, "summarized": covered,
+        }
@@ -0,0 +1,67 @@
+import json
+import os
+import re
+
+from django.core.management.base import BaseCommand
+
+from chat.session_store import INDEX_FILENAME, LEGACY_EXT, TITLES_FILENAME
+from chat.views import search_index, session_store
+
+# Old plain-text logs: "User: ..." / "GPT: ..." (or "Bot: ...") lines, continued on following lines
+TXT_ROLE_RE = re.compile(r"^(User|GPT|Bot): ?(.*)$")
+
+
+def parse_txt_session(text):
+    messages = []
+    for line in text.splitlines():
+        match = TXT_ROLE_RE.match(line)
+        if match:
+            role = "user" if match.group(1) == "User" else "gpt"
+            messages.append({"role": role, "content": match.group(2)})
+        elif messages:
+            messages[-1]["content"] += "\n" + line
+    for message in messages:
+        message["content"] = message["content"].strip()
+    return messages
+
+
+class Command(BaseCommand):
+    help = "Convert chat sessions saved as .json lists or .txt logs to the append-only .jsonl store."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be converted.")
+        parser.add_argument("--keep", action="store_true", help="Keep the original .txt files after converting.")
+
+    def handle(self, *args, **options):
+        directory = session_store.directory
+        converted = skipped = 0
+
+        for name in sorted(os.listdir(directory)):
+            chat_id, ext = os.path.splitext(name)
+            if name in (TITLES_FILENAME, INDEX_FILENAME) or ext not in (LEGACY_EXT, ".txt"):
+                continue
+            if os.path.exists(session_store.path(chat_id)):
+                self.stdout.write(f"skip {name}: {chat_id} already has a .jsonl session")
+                skipped += 1
+                continue
+
+            path = os.path.join(directory, name)
+            with open(path, "r", encoding="utf-8") as f:
+                messages = json.load(f) if ext == LEGACY_EXT else parse_txt_session(f.read())
+
+            self.stdout.write(f"{name}: {len(messages)} messages")
+            converted += 1
+            if options["dry_run"]:
+                continue
+
+            # write() also removes the legacy .json file; keep the chat's place in the sidebar
+            session_store.write(chat_id, messages, updated=os.path.getmtime(path))
+            search_index.remove(chat_id)
+            search_index.add(chat_id, messages)
+            first_reply = next((message["content"] for message in messages if message["role"] == "gpt"), "")
+            session_store.set_title(chat_id, " ".join(first_reply.split()[:3]) or "Untitled", overwrite=False)
+            if ext == ".txt" and not options["keep"]:
+                os.remove(path)
+
+        session_store.index.flush()
+        self.stdout.write(self.style.SUCCESS(f"Converted {converted} sessions, skipped {skipped}."))
@@ -0,0 +1,15 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from chat.views import iter_sessions, search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index from the chat session files."
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = search_index.rebuild(iter_sessions())
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} messages in {elapsed:.1f}s ({search_index.path})."))
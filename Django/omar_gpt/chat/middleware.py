@@ -0,0 +1,25 @@
+import time
+
+import tracing
+
+
+# Gives every request an id (X-Request-ID in and out, forwarded upstream by
+# api_client) and records a "django_request" span per view, see tracing.py.
+class RequestTracingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = tracing.start_request(request.headers.get(tracing.REQUEST_ID_HEADER))
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = self.get_response(request)
+            status = response.status_code
+            response[tracing.REQUEST_ID_HEADER] = tracing.current_request_id()
+            return response
+        finally:
+            match = getattr(request, "resolver_match", None)
+            view = match.url_name if match and match.url_name else "unmatched"
+            tracing.record("django_request", time.perf_counter() - started, view=view, status=status)
+            tracing.end_request(token)
@@ -0,0 +1,218 @@
+import html
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from arabic_text import normalize, tokenize
+
+# Full-text search over the messages of every chat (SQLite FTS5, BM25 ranking).
+# Messages are indexed as save_to_chat_log appends them, so searching never
+# opens a session file. The index holds the normalized text (arabic_text:
+# diacritics, tatweel and letter variants folded, so "أحمد" finds "احمد");
+# snippets are cut from the original text kept next to it.
+# Hits are ranked with BM25 among the newest SEARCH_CANDIDATES matches, which
+# keeps a word found in most messages as fast to search as a rare one; older
+# matches past that are counted in the total but not ranked (see truncated()).
+# SEARCH_CANDIDATES=0 ranks every match (about 0.5 s for 200,000 of them).
+# A missing index file is built from the session files on first use;
+# `manage.py rebuild_search_index` rebuilds it on demand.
+
+SEARCH_DB_FILENAME = "search_index.sqlite3"
+PAGE_SIZE = 20
+# Newest matches BM25 ranks per search; also the deepest page reachable
+SEARCH_CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", 2000))
+# Words shown around the first hit
+SNIPPET_WORDS = 24
+SNIPPET_BEFORE = 8
+
+# Words of the original text, with the Arabic marks normalize() drops kept inside them
+_MARKS = "".join(map(chr, [*range(0x064B, 0x0653), 0x0670, 0x0640]))
+WORD_PATTERN = re.compile(f"[\\w{_MARKS}]+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    chat_id TEXT NOT NULL,
+    role TEXT,
+    content TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_chat ON messages (chat_id);
+-- Contentless: the normalized text is only tokenized, the original lives in messages.
+-- chat is the chat id as one token, so one chat's hits are found without a scan
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5 (body, chat, content='', tokenize='unicode61 remove_diacritics 2');
+"""
+
+
+def fold(text):
+    # normalize() plus Latin accents, like the index's unicode61 remove_diacritics
+    decomposed = unicodedata.normalize("NFKD", normalize(text))
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def chat_token(chat_id):
+    # "1f0c-..." would be split at the dashes into several (not unique) tokens
+    return "".join(char for char in chat_id if char.isalnum())
+
+
+def match_expression(query, chat_id=None):
+    """FTS5 query: every word must match, the last one as a prefix (search as you type)."""
+    terms = tokenize(query)
+    if not terms:
+        return None, []
+    phrases = [f'"{term}"' for term in terms]
+    phrases[-1] += "*"
+    expression = f"body : ({' '.join(phrases)})"
+    if chat_id is not None:
+        expression = f'chat : "{chat_token(chat_id)}" AND {expression}'
+    return expression, [fold(term) for term in terms]
+
+
+def make_snippet(content, terms):
+    """HTML-escaped excerpt of content around the first hit, hits wrapped in <mark>."""
+    words = list(WORD_PATTERN.finditer(content))
+    if not words:
+        return html.escape(content[:200])
+    exact, prefix = set(terms[:-1]), terms[-1] if terms else None
+
+    def is_hit(word):
+        folded = fold(word)
+        return folded in exact or (prefix is not None and folded.startswith(prefix))
+
+    hits = [i for i, word in enumerate(words) if is_hit(word.group())]
+    start = max(0, hits[0] - SNIPPET_BEFORE) if hits else 0
+    end = min(len(words), start + SNIPPET_WORDS)
+
+    parts = ["… " if start > 0 else ""]
+    position = words[start].start()
+    for i in range(start, end):
+        word = words[i]
+        parts.append(html.escape(content[position:word.start()]))
+        text = html.escape(word.group())
+        parts.append(f"<mark>{text}</mark>" if i in hits else text)
+        position = word.end()
+    parts.append(" …" if end < len(words) else html.escape(content[position:]))
+    return "".join(parts).strip()
+
+
+class SearchIndex:
+    def __init__(self, path, sessions=None, candidates=SEARCH_CANDIDATES):
+        """sessions() -> iterable of (chat_id, messages, updated) builds a new index file."""
+        self.path = path
+        self.candidates = candidates
+        self._sessions = sessions
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _connect(self):
+        # Caller holds the lock
+        if self._db is None:
+            new = not os.path.exists(self.path)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+            if new and self._sessions is not None:
+                self._rebuild(self._sessions())
+        return self._db
+
+    def _insert(self, chat_id, messages, created):
+        for message in messages:
+            content = message.get("content") or ""
+            row = self._db.execute(
+                "INSERT INTO messages (chat_id, role, content, created) VALUES (?, ?, ?, ?)",
+                (chat_id, message.get("role"), content, created),
+            ).lastrowid
+            self._db.execute(
+                "INSERT INTO messages_fts (rowid, body, chat) VALUES (?, ?, ?)",
+                (row, normalize(content), chat_token(chat_id)),
+            )
+
+    def _delete(self, chat_id):
+        rows = self._db.execute("SELECT id, content FROM messages WHERE chat_id = ?", (chat_id,)).fetchall()
+        # Contentless FTS tables forget a row given the exact text it was indexed with
+        self._db.executemany(
+            "INSERT INTO messages_fts (messages_fts, rowid, body, chat) VALUES ('delete', ?, ?, ?)",
+            [(row, normalize(content), chat_token(chat_id)) for row, content in rows],
+        )
+        self._db.execute("DELETE FROM messages WHERE chat_id = ?", (chat_id,))
+
+    def _rebuild(self, sessions):
+        with self._db:
+            self._db.execute("DELETE FROM messages")
+            self._db.execute("INSERT INTO messages_fts (messages_fts) VALUES ('delete-all')")
+            count = 0
+            for chat_id, messages, updated in sessions:
+                self._insert(chat_id, messages, updated or time.time())
+                count += len(messages)
+        self._db.execute("INSERT INTO messages_fts (messages_fts) VALUES ('optimize')")
+        self._db.commit()
+        return count
+
+    def add(self, chat_id, messages):
+        """Index messages just appended to a chat."""
+        with self._lock:
+            building = self._db is None and self._sessions is not None and not os.path.exists(self.path)
+            self._connect()
+            if building:
+                # The first build read the session files, and they already hold these messages
+                return
+            with self._db:
+                self._insert(chat_id, messages, time.time())
+
+    def remove(self, chat_id):
+        with self._lock:
+            self._connect()
+            with self._db:
+                self._delete(chat_id)
+
+    def rebuild(self, sessions):
+        """Replace the whole index with sessions (chat_id, messages, updated); returns the message count."""
+        with self._lock:
+            self._connect()
+            return self._rebuild(sessions)
+
+    def count(self):
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    def search(self, query, page=1, page_size=PAGE_SIZE, chat_id=None):
+        """Best matches first: ([{"chat_id", "role", "snippet", "score", "created"}], next page or None,
+        number of matches). Only the newest `candidates` of them are ranked and paged through."""
+        expression, terms = match_expression(query, chat_id)
+        if expression is None:
+            return [], None, 0
+        offset = (page - 1) * page_size
+        with self._lock:
+            db = self._connect()
+            # BM25 over the body only; the page is joined with the messages last
+            rows = db.execute(
+                "SELECT m.chat_id, m.role, m.content, m.created, f.score FROM ("
+                "  SELECT rowid, bm25(messages_fts, 1.0, 0.0) AS score FROM messages_fts"
+                "  WHERE messages_fts MATCH ? ORDER BY rowid DESC LIMIT ?"
+                ") f JOIN messages m ON m.id = f.rowid"
+                " ORDER BY f.score, f.rowid DESC LIMIT ? OFFSET ?",
+                (expression, self.candidates if self.candidates > 0 else -1, page_size + 1, offset),
+            ).fetchall()
+            total = db.execute(
+                "SELECT COUNT(*) FROM messages_fts WHERE messages_fts MATCH ?", (expression,)
+            ).fetchone()[0]
+
+        results = [
+            {
+                "chat_id": row_chat_id,
+                "role": role,
+                "snippet": make_snippet(content, terms),
+                # bm25: lower is better in SQLite, flipped so higher is better
+                "score": round(-score, 4),
+                "created": created,
+            }
+            for row_chat_id, role, content, created, score in rows[:page_size]
+        ]
+        return results, page + 1 if len(rows) > page_size else None, total
+
+    def truncated(self, total):
+        """True if a search with total matches left the oldest of them unranked."""
+        return 0 < self.candidates < total
@@ -0,0 +1,216 @@
+import json
+import os
+import re
+import threading
+
+from .atomic import atomic_write
+from .chat_index import INDEX_FILENAME, ChatIndex
+
+# Chat sessions are append-only JSONL files, one message per line: adding a turn
+# is a single O(1) append instead of re-reading and rewriting the whole log.
+# Older sessions saved as a JSON list (<chat_id>.json) are still readable and are
+# converted to JSONL the first time they are appended to; the
+# migrate_chat_sessions management command converts them (and .txt logs) in bulk.
+# Titles, message counts and last activity live in the cached ChatIndex, so the
+# sidebar never has to list or open the session files.
+
+# Chat ids become session file names
+CHAT_ID_PATTERN = re.compile(r"^[\w-]{1,128}\Z")
+
+SESSION_EXT = ".jsonl"
+LEGACY_EXT = ".json"
+TITLES_FILENAME = "chat_titles.json"
+# Rolling summaries of older turns (see context.py), one <chat_id>.json per chat
+SUMMARY_DIR = "summaries"
+
+# Bytes read per step when paging backwards through a session file
+READ_BLOCK = 64 * 1024
+
+
+def encode_messages(messages):
+    return "".join(json.dumps(message, ensure_ascii=False) + "\n" for message in messages).encode("utf-8")
+
+
+class SessionStore:
+    def __init__(self, directory):
+        self.directory = directory
+        self.titles_path = os.path.join(directory, TITLES_FILENAME)
+        os.makedirs(directory, exist_ok=True)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self.index = ChatIndex(directory, bootstrap=self._scan)
+
+    def _lock(self, chat_id):
+        with self._locks_guard:
+            return self._locks.setdefault(chat_id, threading.Lock())
+
+    def path(self, chat_id):
+        return os.path.join(self.directory, f"{chat_id}{SESSION_EXT}")
+
+    def legacy_path(self, chat_id):
+        return os.path.join(self.directory, f"{chat_id}{LEGACY_EXT}")
+
+    def summary_path(self, chat_id):
+        return os.path.join(self.directory, SUMMARY_DIR, f"{chat_id}.json")
+
+    def exists(self, chat_id):
+        return os.path.exists(self.path(chat_id)) or os.path.exists(self.legacy_path(chat_id))
+
+    def _read_legacy(self, chat_id):
+        path = self.legacy_path(chat_id)
+        if not os.path.exists(path):
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _migrate_legacy(self, chat_id):
+        # Caller holds the chat lock
+        messages = self._read_legacy(chat_id)
+        atomic_write(self.path(chat_id), encode_messages(messages))
+        os.remove(self.legacy_path(chat_id))
+
+    def append(self, chat_id, *messages):
+        """Append messages to a chat in one write, so concurrent turns never lose each other."""
+        data = encode_messages(messages)
+        # A first-time index bootstrap scans the files: done before this write, so it isn't counted twice
+        self.index.get(chat_id)
+        with self._lock(chat_id):
+            if not os.path.exists(self.path(chat_id)) and os.path.exists(self.legacy_path(chat_id)):
+                self._migrate_legacy(chat_id)
+            fd = os.open(self.path(chat_id), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+        self.index.touch(chat_id, new_messages=len(messages))
+
+    def write(self, chat_id, messages, updated=None):
+        """Replace a chat's whole history atomically."""
+        with self._lock(chat_id):
+            atomic_write(self.path(chat_id), encode_messages(messages))
+            for path in (self.legacy_path(chat_id), self.summary_path(chat_id)):
+                if os.path.exists(path):
+                    os.remove(path)
+        self.index.touch(chat_id, messages=len(messages), updated=updated)
+
+    def read(self, chat_id):
+        path = self.path(chat_id)
+        if not os.path.exists(path):
+            return self._read_legacy(chat_id)
+        messages = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    messages.append(json.loads(line))
+                except ValueError:
+                    # A write interrupted by a crash leaves at most one torn line: skip it
+                    continue
+        return messages
+
+    def read_page(self, chat_id, before=None, limit=30):
+        """Return (up to limit messages, newest first, cursor for the older ones or None).
+
+        Reads the session file backwards from the cursor (a byte offset), so a page
+        costs the same however long the chat is.
+        """
+        if not os.path.exists(self.path(chat_id)):
+            if not os.path.exists(self.legacy_path(chat_id)):
+                return [], None
+            with self._lock(chat_id):
+                if not os.path.exists(self.path(chat_id)):
+                    self._migrate_legacy(chat_id)
+
+        with open(self.path(chat_id), "rb") as f:
+            size = f.seek(0, os.SEEK_END)
+            end = size if before is None else max(0, min(int(before), size))
+            start = end
+            data = b""
+            # Enough data for limit complete lines plus the (possibly partial) one before them
+            while start > 0 and data.count(b"\n") <= limit + 1:
+                step = min(READ_BLOCK, start)
+                start -= step
+                f.seek(start)
+                data = f.read(step) + data
+
+        lines = data.split(b"\n")
+        offset = start
+        if start > 0:
+            # The first piece is the tail of a line that starts before what we read
+            offset += len(lines[0]) + 1
+            lines = lines[1:]
+
+        entries = []
+        for line in lines:
+            if line.strip():
+                try:
+                    entries.append((offset, json.loads(line)))
+                except ValueError:
+                    pass
+            offset += len(line) + 1
+
+        page = entries[-limit:] if limit > 0 else []
+        # Nothing before the cursor: no cursor either, or "Load older" would ask again forever
+        cursor = page[0][0] if page and page[0][0] > 0 else None
+        return [message for _, message in reversed(page)], cursor
+
+    def delete(self, chat_id):
+        with self._lock(chat_id):
+            for path in (self.path(chat_id), self.legacy_path(chat_id), self.summary_path(chat_id)):
+                if os.path.exists(path):
+                    os.remove(path)
+        self.index.remove(chat_id)
+
+    def list_ids(self):
+        """Chat ids, most recently active first."""
+        return self.index.ids_by_activity()
+
+    def scan_ids(self):
+        """Chat ids found on disk (slow: lists the folder)."""
+        ids = set()
+        for name in os.listdir(self.directory):
+            if name in (TITLES_FILENAME, INDEX_FILENAME) or name.startswith("."):
+                continue
+            for ext in (SESSION_EXT, LEGACY_EXT):
+                if name.endswith(ext):
+                    ids.add(name[:-len(ext)])
+        return list(ids)
+
+    def _scan(self):
+        # Builds the index the first time, from the session files and the old chat_titles.json
+        titles = {}
+        if os.path.exists(self.titles_path):
+            with open(self.titles_path, "r", encoding="utf-8") as f:
+                titles = json.load(f)
+        entries = {}
+        for chat_id in self.scan_ids():
+            path = self.path(chat_id) if os.path.exists(self.path(chat_id)) else self.legacy_path(chat_id)
+            mtime = os.path.getmtime(path)
+            entries[chat_id] = {
+                "title": titles.get(chat_id),
+                "created": mtime,
+                "updated": mtime,
+                "messages": len(self.read(chat_id)),
+            }
+        return entries
+
+    # Summaries
+    def read_summary(self, chat_id):
+        try:
+            with open(self.summary_path(chat_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def write_summary(self, chat_id, summary):
+        os.makedirs(os.path.dirname(self.summary_path(chat_id)), exist_ok=True)
+        atomic_write(self.summary_path(chat_id), json.dumps(summary, ensure_ascii=False).encode("utf-8"))
+
+    # Titles
+    def load_titles(self):
+        return self.index.titles()
+
+    def set_title(self, chat_id, title, overwrite=True):
+        self.index.set_title(chat_id, title, overwrite)
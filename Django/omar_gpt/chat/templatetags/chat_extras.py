@@ -1,5 +1,7 @@
 from django import template
 
+from .. import text_utils
+
 register = template.Library()
 
 @register.filter
@@ -8,8 +10,11 @@ def get_item(dictionary, key):
 
 @register.filter
 def contains_arabic(value):
-    import re
-    return bool(re.search(r'[\u0600-\u06FF]', value))
+    return text_utils.contains_arabic(value)
+
+@register.filter
+def is_rtl(message):
+    return text_utils.is_rtl(message)
 
 @register.filter
 def trim(value):
@@ -1,3 +1,218 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from . import views
+from .chat_index import ChatIndex
+from .search_index import SearchIndex
+from .session_store import SessionStore
+
+
+def make_messages(count, start=0):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}"} for i in range(start, start + count)]
+
+
+class SessionStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = SessionStore(self.tmp.name)
+
+    def tearDown(self):
+        self.store.index.flush()
+        self.tmp.cleanup()
+
+    def test_read_page_walks_back_to_the_start(self):
+        self.store.append("chat", *make_messages(7))
+        seen = []
+        cursor = None
+        for _ in range(5):
+            page, cursor = self.store.read_page("chat", before=cursor, limit=3)
+            seen.extend(page)
+            if cursor is None:
+                break
+        self.assertIsNone(cursor)
+        self.assertEqual([m["content"] for m in reversed(seen)], [f"message {i}" for i in range(7)])
+
+    def test_read_page_empty_page_has_no_cursor(self):
+        self.store.append("chat", *make_messages(3))
+        self.assertEqual(self.store.read_page("chat", before=0), ([], None))
+        self.assertEqual(self.store.read_page("chat", before=1), ([], None))
+        self.assertEqual(self.store.read_page("missing"), ([], None))
+
+    def test_legacy_json_is_migrated(self):
+        with open(self.store.legacy_path("old"), "w", encoding="utf-8") as f:
+            json.dump(make_messages(2), f)
+
+        page, cursor = self.store.read_page("old")
+        self.assertEqual([m["content"] for m in page], ["message 1", "message 0"])
+        self.assertIsNone(cursor)
+        self.assertTrue(os.path.exists(self.store.path("old")))
+        self.assertFalse(os.path.exists(self.store.legacy_path("old")))
+
+    def test_append_migrates_legacy_json_first(self):
+        with open(self.store.legacy_path("old"), "w", encoding="utf-8") as f:
+            json.dump(make_messages(2), f)
+
+        self.store.append("old", *make_messages(1, start=2))
+        self.assertEqual(self.store.read("old"), make_messages(3))
+        self.assertFalse(os.path.exists(self.store.legacy_path("old")))
+        self.assertEqual(self.store.index.get("old")["messages"], 3)
+
+
+class ChatIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_flush_merges_changes_from_other_instances(self):
+        # Two workers with their own index over the same folder
+        first = ChatIndex(self.tmp.name, flush_delay=60)
+        second = ChatIndex(self.tmp.name, flush_delay=60)
+        first.touch("a", new_messages=2)
+        second.touch("a", new_messages=3)
+        second.touch("b", new_messages=1)
+        second.set_title("a", "Title")
+        first.flush()
+        second.flush()
+
+        entries = ChatIndex(self.tmp.name).entries()
+        self.assertEqual(entries["a"]["messages"], 5)
+        self.assertEqual(entries["a"]["title"], "Title")
+        self.assertEqual(entries["b"]["messages"], 1)
+
+    def test_remove_is_kept_across_instances(self):
+        first = ChatIndex(self.tmp.name, flush_delay=60)
+        first.touch("a", new_messages=1)
+        first.flush()
+        second = ChatIndex(self.tmp.name, flush_delay=60)
+        second.remove("a")
+        second.flush()
+        first.touch("b", new_messages=1)
+        first.flush()
+
+        self.assertEqual(set(ChatIndex(self.tmp.name).entries()), {"b"})
+
+
+class SearchIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index = SearchIndex(os.path.join(self.tmp.name, "search.sqlite3"))
+        self.index.add("chat-one", [{"role": "user", "content": "alpha beta AND gamma"}])
+        self.index.add("chat-two", [{"role": "assistant", "content": "alpha delta NEAR epsilon"}])
+
+    def tearDown(self):
+        if self.index._db is not None:
+            self.index._db.close()
+        self.tmp.cleanup()
+
+    def test_operator_characters_are_plain_text(self):
+        for query in ['"alpha', 'alpha"', "alpha*", "-alpha", "alpha:", ":alpha", "(alpha", "alpha)",
+                      "^alpha", "alpha +", "{alpha}", "alpha;"]:
+            results, next_page, total = self.index.search(query)
+            self.assertEqual(total, 2, query)
+            self.assertEqual(len(results), 2, query)
+            self.assertIsNone(next_page)
+
+    def test_operator_words_match_as_words(self):
+        results, _, total = self.index.search("NEAR")
+        self.assertEqual(total, 1)
+        self.assertEqual(results[0]["chat_id"], "chat-two")
+        results, _, total = self.index.search("alpha AND")
+        self.assertEqual(total, 1)
+        self.assertEqual(results[0]["chat_id"], "chat-one")
+        self.assertEqual(self.index.search("NEAR(alpha")[2], 1)
+        self.assertEqual(self.index.search("NOT alpha")[2], 0)
+
+    def test_query_without_words(self):
+        self.assertEqual(self.index.search('"* - :()'), ([], None, 0))
+
+    def test_chat_filter(self):
+        results, _, total = self.index.search("alpha", chat_id="chat-one")
+        self.assertEqual(total, 1)
+        self.assertEqual(results[0]["chat_id"], "chat-one")
+
+    def test_truncated(self):
+        self.index.candidates = 1
+        results, _, total = self.index.search("alpha")
+        self.assertEqual((len(results), total), (1, 2))
+        self.assertTrue(self.index.truncated(total))
+        self.index.candidates = 0
+        self.assertFalse(self.index.truncated(total))
+
+    def test_first_turn_on_a_new_index_is_indexed_once(self):
+        # As save_to_chat_log does it: the turn is appended to the session, then indexed
+        store = SessionStore(os.path.join(self.tmp.name, "sessions"))
+        index = SearchIndex(
+            os.path.join(self.tmp.name, "new.sqlite3"),
+            sessions=lambda: ((chat_id, store.read(chat_id), None) for chat_id in store.scan_ids()),
+        )
+        messages = ({"role": "user", "content": "hello"}, {"role": "gpt", "content": "hi"})
+        store.append("chat", *messages)
+        index.add("chat", messages)
+        results, _, total = index.search("hello")
+        self.assertEqual((len(results), total), (1, 1))
+
+        store.append("chat", *messages)
+        index.add("chat", messages)
+        self.assertEqual(index.search("hello")[2], 2)
+        index._db.close()
+        store.index.flush()
+
+
+class FailedReplyTests(SimpleTestCase):
+    """A reply that fails upstream leaves no turn behind, whichever endpoint sent it."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = SessionStore(self.tmp.name)
+        index = SearchIndex(os.path.join(self.tmp.name, "search.sqlite3"))
+        for target, value in (("session_store", self.store), ("search_index", index), ("iter_reply", self.failing_reply)):
+            patcher = mock.patch.object(views, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.store.index.flush()
+        self.tmp.cleanup()
+
+    @staticmethod
+    def failing_reply(message, file_url=None, current_chat_id=None):
+        yield {"content": "Partial "}
+        yield {"error": "❌ Error: upstream failed"}
+
+    def test_stream_saves_nothing(self):
+        response = self.client.post("/stream/", {"message": "hello", "chat_id": "chat"})
+        body = b"".join(response.streaming_content).decode("utf-8")
+        events = [json.loads(line[5:]) for line in body.split("\n\n") if line.startswith("data:")]
+        self.assertEqual(events, [{"content": "Partial "}, {"error": "❌ Error: upstream failed"}, {"done": True}])
+        self.assertFalse(self.store.exists("chat"))
+
+    def test_json_api_saves_nothing(self):
+        self.store.append("chat", {"role": "user", "content": "earlier"})
+        response = self.client.post(
+            "/api/chats/chat/messages/", {"message": "hello"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(self.store.read("chat"), [{"role": "user", "content": "earlier"}])
+
+    def test_form_saves_nothing(self):
+        response = self.client.post("/", {"message": "hello"})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "upstream failed")
+        self.assertEqual(self.store.scan_ids(), [])
+
+    def test_complete_reply_is_saved(self):
+        def reply(message, file_url=None, current_chat_id=None):
+            yield {"content": "Hello there"}
+            yield {"done": True, "chatID": current_chat_id}
+
+        with mock.patch.object(views, "iter_reply", reply):
+            response = self.client.post("/stream/", {"message": "hello", "chat_id": "chat"})
+            body = b"".join(response.streaming_content).decode("utf-8")
+        self.assertIn('"chatID": "chat"', body)
+        self.assertEqual([m["content"] for m in self.store.read("chat")], ["hello", "Hello there"])
@@ -0,0 +1,23 @@
+import re
+
+# Arabic detection. The browser shapes and orders Arabic itself (dir="rtl"), so
+# nothing here reshapes text. Messages get their "rtl" flag when they are saved
+# (annotate_message), so rendering a chat (the is_rtl filter) only reads it.
+
+ARABIC_PATTERN = re.compile(r'[\u0600-\u06FF]')
+
+
+def contains_arabic(text):
+    return bool(ARABIC_PATTERN.search(text))
+
+
+def annotate_message(message):
+    """Add "rtl" to a message before it is stored."""
+    message["rtl"] = contains_arabic(message["content"])
+    return message
+
+
+def is_rtl(message):
+    # Messages saved before the flag existed are checked on the fly
+    rtl = message.get("rtl")
+    return contains_arabic(message.get("content", "")) if rtl is None else rtl
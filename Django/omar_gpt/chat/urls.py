@@ -1,6 +1,14 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.chat_view, name='chat'),
+    path('history/', views.chat_history, name='chat_history'),
+    path('chats/', views.chat_list, name='chat_list'),
+    path('stream/', views.chat_stream, name='chat_stream'),
+    path('metrics/', views.metrics, name='metrics'),
+    path('api/chats/', api.chats, name='api_chats'),
+    path('api/chats/<str:chat_id>/', api.chat_detail, name='api_chat'),
+    path('api/chats/<str:chat_id>/messages/', api.chat_messages, name='api_chat_messages'),
+    path('api/search/', api.search, name='api_search'),
 ]
@@ -1,108 +1,131 @@
 import os
-import requests
 import json
+import logging
+import time
 import uuid
-import re
+import sqlite3
 
 from django.shortcuts import render, redirect
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST
+from django.template.loader import render_to_string
 from .forms import ChatForm
+from .session_store import CHAT_ID_PATTERN, SessionStore
+from .search_index import SEARCH_DB_FILENAME, SearchIndex
+from .context import ContextBuilder
+from .text_utils import annotate_message
 from dotenv import load_dotenv
-
-# Arabic reshaper
-import arabic_reshaper
-from bidi.algorithm import get_display
+from api_client import CHAT_API_URL, client, iter_sse_events
+import requests
+import tracing
 
 load_dotenv()
 
-API_URL = "http://localhost:3000/api/chat"
+# Payloads and prompts are logged at DEBUG (LOG_LEVEL=DEBUG), timings go to tracing
+logger = logging.getLogger(__name__)
+
+API_URL = CHAT_API_URL
 headers = {"Content-Type": "application/json"}
 
 CHAT_LOG_DIR = os.path.join(os.path.dirname(__file__), 'chat_sessions')
-TITLES_FILE = os.path.join(CHAT_LOG_DIR, 'chat_titles.json')
 
-# Ensure folders exist
-os.makedirs(CHAT_LOG_DIR, exist_ok=True)
+# Messages / sidebar chats rendered per page ("load older" / "more chats" fetch the rest)
+HISTORY_PAGE_SIZE = 30
+SIDEBAR_PAGE_SIZE = 50
 
-# Arabic helpers
-def contains_arabic(text):
-    return bool(re.search(r'[\u0600-\u06FF]', text))
-
-def fix_arabic(text):
-    try:
-        if contains_arabic(text):
-            reshaped = arabic_reshaper.reshape(text)
-            bidi_text = get_display(reshaped)
-            return bidi_text
-        else:
-            return text
-    except Exception:
-        return text
+# Append-only session logs + chat titles (creates the folder if needed)
+session_store = SessionStore(CHAT_LOG_DIR)
+# Full-text search over all chats, indexed as messages are saved
+search_index = SearchIndex(os.path.join(CHAT_LOG_DIR, SEARCH_DB_FILENAME), sessions=lambda: iter_sessions())
+# Token-budgeted prompts (CHAT_CONTEXT_TOKENS), older turns summarized once and cached
+context_builder = ContextBuilder(session_store)
 
 # Chat file utilities
-def get_chat_log_path(chat_id):
-    return os.path.join(CHAT_LOG_DIR, f"{chat_id}.json")
-
 def save_to_chat_log(chat_id, prompt, response):
-    file_path = get_chat_log_path(chat_id)
-    if os.path.exists(file_path):
-        with open(file_path, "r", encoding="utf-8") as f:
-            chat_data = json.load(f)
-    else:
-        chat_data = []
-
-    chat_data.append({"role": "user", "content": prompt})
-    chat_data.append({"role": "gpt", "content": response})
-
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(chat_data, f, ensure_ascii=False, indent=2)
+    # The RTL flag is computed once here, not on every render
+    messages = (
+        annotate_message({"role": "user", "content": prompt}),
+        annotate_message({"role": "gpt", "content": response}),
+    )
+    with tracing.span("session_io", op="append"):
+        session_store.append(chat_id, *messages)
+    try:
+        with tracing.span("search_index", op="add"):
+            search_index.add(chat_id, messages)
+    except sqlite3.Error as e:
+        # The turn is saved either way; `manage.py rebuild_search_index` catches the index up
+        logger.warning("Search index update failed for %s: %s", chat_id, e)
+
+def new_chat_id():
+    # Chat ids are allocated here (the chat API accepts any chatID), so a new chat
+    # costs nothing upstream. Nothing is written: the first saved turn creates the session
+    return str(uuid.uuid4())
+
+def create_chat(title=None):
+    # An empty chat that exists right away (POST api/chats/)
+    chat_id = new_chat_id()
+    with tracing.span("session_io", op="create"):
+        session_store.write(chat_id, [])
+    if title:
+        session_store.set_title(chat_id, title)
+    return chat_id
 
 def get_full_chat_history(chat_id):
-    file_path = get_chat_log_path(chat_id)
-    if os.path.exists(file_path):
-        with open(file_path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return []
+    with tracing.span("session_io", op="read"):
+        return session_store.read(chat_id)
 
 def list_chat_ids():
-    if not os.path.exists(CHAT_LOG_DIR):
-        return []
-    return [f.replace(".json", "") for f in os.listdir(CHAT_LOG_DIR) if f.endswith(".json")]
+    return session_store.list_ids()
+
+def get_chat_history_page(chat_id, before=None, limit=HISTORY_PAGE_SIZE):
+    # Newest messages first, plus the cursor for the next (older) page
+    with tracing.span("session_io", op="read_page"):
+        return session_store.read_page(chat_id, before=before, limit=limit)
+
+def get_sidebar_page(page=1):
+    titles = load_titles()
+    chat_ids = [cid for cid in list_chat_ids() if titles.get(cid) and titles[cid] != "chat_tit"]
+    start = (page - 1) * SIDEBAR_PAGE_SIZE
+    next_page = page + 1 if len(chat_ids) > start + SIDEBAR_PAGE_SIZE else None
+    return chat_ids[start:start + SIDEBAR_PAGE_SIZE], titles, next_page
 
 def load_titles():
-    if os.path.exists(TITLES_FILE):
-        with open(TITLES_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
+    return session_store.load_titles()
 
-def save_titles(titles):
-    with open(TITLES_FILE, "w", encoding="utf-8") as f:
-        json.dump(titles, f, ensure_ascii=False, indent=2)
+def rename_chat(chat_id, new_title):
+    session_store.set_title(chat_id, new_title)
+
+def delete_chat(chat_id):
+    session_store.delete(chat_id)
+    try:
+        search_index.remove(chat_id)
+    except sqlite3.Error as e:
+        logger.warning("Search index update failed for %s: %s", chat_id, e)
+
+def iter_sessions():
+    # (chat_id, messages, last activity) of every chat on disk, to (re)build the search index
+    for chat_id in session_store.scan_ids():
+        entry = session_store.index.get(chat_id) or {}
+        yield chat_id, session_store.read(chat_id), entry.get("updated")
 
 def set_chat_title(chat_id, response_text):
-    titles = load_titles()
-    if chat_id not in titles:
-        first_words = " ".join(response_text.strip().split()[:3])
-        titles[chat_id] = first_words or "Untitled"
-        save_titles(titles)
-
-# Build readable prompt text
-def build_prompt(history, latest_user_message):
-    lines = []
-    if history:
-        lines.append("This is the conversation so far:")
-        for msg in history:
-            role = msg['role'].capitalize()
-            lines.append(f"{role}: {msg['content']}")
-        lines.append("")  # empty line to separate
-
-    lines.append("Now, the user asks:")
-    lines.append(f"User: {latest_user_message}")
-    return "\n".join(lines)
-
-
-# Sending message
-def send_message(message, file_url=None, current_chat_id=None):
+    first_words = " ".join(response_text.strip().split()[:3])
+    session_store.set_title(chat_id, first_words or "Untitled", overwrite=False)
+
+# Build readable prompt text, within the context token budget
+def build_prompt(chat_id, history, latest_user_message):
+    with tracing.span("build_prompt"):
+        prompt, stats = context_builder.build(chat_id, history, latest_user_message)
+    tracing.increment("context_tokens_total", stats["tokens"])
+    tracing.increment("context_tokens_saved_total", stats["saved"])
+    logger.debug("🧮 Context: %s tokens (full history %s, saved %s, %s messages summarized)",
+                 stats["tokens"], stats["full_tokens"], stats["saved"], stats["summarized"])
+    return prompt
+
+
+# Streaming a reply: yields {"content": token} events, then {"done": True, "chatID": ...}
+# or {"error": message}
+def iter_reply(message, file_url=None, current_chat_id=None):
     data = {
         "message": message,
         "systemprompt": "Default system prompt here"
@@ -114,38 +137,55 @@ def send_message(message, file_url=None, current_chat_id=None):
     if current_chat_id:
         data["chatID"] = current_chat_id
 
-    print("\n🔵 Sending this JSON payload to API:")
-    print(json.dumps(data, indent=2, ensure_ascii=False))
-    print("🔵 End JSON\n")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("🔵 Sending this JSON payload to API:\n%s", json.dumps(data, indent=2, ensure_ascii=False))
 
+    # Time to first token and to the whole reply, as "chat_ttft" / "chat_reply" spans
+    started = time.perf_counter()
+    first_token = True
     try:
-        response = requests.post(API_URL, json=data, headers=headers)
-        response.encoding = 'utf-8'
-
-        print("\n🔴 Full RAW API Response:")
-        print(response.text)
-        print("🔴 End of API Response\n")
-
-        if response.status_code == 200:
-            response_lines = response.text.strip().split("\n\n")
-            combined_content = ""
-            api_chat_id = current_chat_id
-
-            for line in response_lines:
-                if line.startswith("data: "):
-                    json_chunk = line.replace("data: ", "")
-                    parsed_chunk = json.loads(json_chunk)
-                    for key, value in parsed_chunk.items():
-                        if key == "content":
-                            combined_content += value
-                        elif key == "chatID":
-                            api_chat_id = value
-
-            return combined_content.strip(), api_chat_id
-        else:
-            return f"❌ Error {response.status_code}: {response.text}", current_chat_id
+        with client.stream("chat", "POST", API_URL, json=data, headers=headers) as response:
+            response.encoding = 'utf-8'
+
+            if response.status_code != 200:
+                yield {"error": f"❌ Error {response.status_code}: {response.text}"}
+                return
+
+            for payload in iter_sse_events(response):
+                try:
+                    event = json.loads(payload)
+                except ValueError:
+                    event = None
+                if not isinstance(event, dict):
+                    # One bad event shouldn't cost the whole reply
+                    logger.warning("Skipping malformed chat API event: %r", payload[:200])
+                    continue
+                if "content" in event:
+                    if first_token:
+                        tracing.record("chat_ttft", time.perf_counter() - started)
+                        first_token = False
+                    yield {"content": event["content"]}
+                elif event.get("done"):
+                    tracing.record("chat_reply", time.perf_counter() - started)
+                    yield {"done": True, "chatID": event.get("chatID") or current_chat_id}
+                    return
+                elif "error" in event:
+                    yield {"error": f"❌ Error: {event['error']}"}
+                    return
     except requests.exceptions.RequestException as e:
-        return f"🚫 Request failed: {e}", current_chat_id
+        yield {"error": f"🚫 Request failed: {e}"}
+
+# Sending message: (whole reply, None), or (None, error message) if the chat API failed.
+# A failed turn is never saved, not even the part of the reply that arrived before the
+# error (the same on every path: form, SSE and the JSON API); the user can simply retry
+def send_message(message, file_url=None, current_chat_id=None):
+    reply = []
+    for event in iter_reply(message, file_url, current_chat_id):
+        if "content" in event:
+            reply.append(event["content"])
+        elif "error" in event:
+            return None, event["error"]
+    return "".join(reply).strip(), None
 
 # Main Chat View
 def chat_view(request):
@@ -155,90 +195,164 @@ def chat_view(request):
     delete_id = request.GET.get("delete_chat")
     rename_id = request.GET.get("rename_chat")
     download_id = request.GET.get("download_chat")
+    if any(value and not CHAT_ID_PATTERN.match(value) for value in (chat_id, delete_id, rename_id, download_id)):
+        return HttpResponse("Invalid chat id", status=400)
 
     # Download Chat
     if download_id:
-        file_path = get_chat_log_path(download_id)
-        if os.path.exists(file_path):
-            with open(file_path, "rb") as f:
-                response = HttpResponse(f.read(), content_type='application/json')
-                response['Content-Disposition'] = f'attachment; filename="{download_id}.json"'
-                return response
+        if session_store.exists(download_id):
+            history = get_full_chat_history(download_id)
+            response = HttpResponse(json.dumps(history, ensure_ascii=False, indent=2), content_type='application/json')
+            response['Content-Disposition'] = f'attachment; filename="{download_id}.json"'
+            return response
         else:
             return redirect(f"/?chat_id={download_id}")
 
     # Delete Chat
     if delete_id:
-        file_path = get_chat_log_path(delete_id)
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        titles = load_titles()
-        if delete_id in titles:
-            del titles[delete_id]
-            save_titles(titles)
+        delete_chat(delete_id)
         return redirect("/")
 
     # Rename Chat
     if rename_id and request.method == "POST":
         new_title = request.POST.get("new_title", "").strip()
         if new_title:
-            titles = load_titles()
-            titles[rename_id] = new_title
-            save_titles(titles)
+            rename_chat(rename_id, new_title)
         return redirect(f"/?chat_id={rename_id}")
 
-    # New Chat
+    # New Chat: the landing page, its id is allocated with the first message
     if request.method == "POST" and "new_chat" in request.GET:
-         # Send a "Test" message to create new chat_id
-         response, new_chat_id = send_message("Test")
-
-         if new_chat_id:
-             return redirect(f"/?chat_id={new_chat_id}")
-         else:
-             return redirect("/")  # fallback
+        return redirect("/")
 
 
     # Sending Message
+    error = None
     if request.method == "POST" and "new_chat" not in request.GET:
         form = ChatForm(request.POST)
         if form.is_valid():
             prompt = form.cleaned_data["message"]
             file_url = form.cleaned_data.get("file_url")
 
-            history = []
-            if current_chat_id:
-                history = get_full_chat_history(current_chat_id)
+            new_chat = not current_chat_id
+            if new_chat:
+                current_chat_id = new_chat_id()
+            history = get_full_chat_history(current_chat_id)
 
             # Build readable prompt to send
-            full_prompt = build_prompt(history, prompt)
-            print("\n🔵🔵🔵🔵 heree Sending this prompt to API:")
-            print(full_prompt)
-            print("\n🔵🔵🔵🔵 heree Sending this prompt to API:")
-            response, new_chat_id = send_message(full_prompt, file_url, current_chat_id)
-
-            if not current_chat_id and new_chat_id:
-                current_chat_id = new_chat_id
-                return redirect(f"/?chat_id={current_chat_id}")
-
-            save_to_chat_log(current_chat_id, prompt, response)
-            set_chat_title(current_chat_id, response)
+            full_prompt = build_prompt(current_chat_id, history, prompt)
+            logger.debug("🔵 Sending this prompt to API:\n%s", full_prompt)
+            response, error = send_message(full_prompt, file_url, current_chat_id)
+
+            if error is None:
+                save_to_chat_log(current_chat_id, prompt, response)
+                set_chat_title(current_chat_id, response)
+                if new_chat:
+                    return redirect(f"/?chat_id={current_chat_id}")
+            elif new_chat:
+                current_chat_id = None
     else:
         form = ChatForm()
 
-    # Load chat history for display
-    chat_messages = []
+    # Load the latest page of chat history for display
+    chat_messages, older_cursor = [], None
     if current_chat_id:
-        chat_messages = list(reversed(get_full_chat_history(current_chat_id)))
-
-    all_chat_ids = list_chat_ids()
-    all_chat_ids.sort(reverse=True)
-
-    return render(request, "chat/chat.html", {
-        "form": form,
-        "chat_ids": all_chat_ids,
-        "chat_titles": load_titles(),
-        "current_chat": current_chat_id,
-        "chat_messages": chat_messages,
-    })
-
-
+        chat_messages, older_cursor = get_chat_history_page(current_chat_id)
+
+    # Most recently active chats first
+    chat_ids, chat_titles, sidebar_next_page = get_sidebar_page()
+
+    with tracing.span("render", template="chat"):
+        return render(request, "chat/chat.html", {
+            "form": form,
+            "chat_ids": chat_ids,
+            "chat_titles": chat_titles,
+            "sidebar_next_page": sidebar_next_page,
+            "current_chat": current_chat_id,
+            "chat_messages": chat_messages,
+            "older_cursor": older_cursor,
+            "error": error,
+        })
+
+# Older messages of a chat, as an HTML fragment (for "Load older messages")
+def chat_history(request):
+    chat_id = request.GET.get("chat_id") or ""
+    before = request.GET.get("before") or ""
+    if not CHAT_ID_PATTERN.match(chat_id) or not before.isdigit():
+        return JsonResponse({"error": "A valid chat_id and an integer before are required"}, status=400)
+
+    chat_messages, older_cursor = get_chat_history_page(chat_id, int(before))
+    with tracing.span("render", template="messages"):
+        html = render_to_string("chat/_messages.html", {"chat_messages": chat_messages}, request=request)
+    return JsonResponse({"html": html, "next_cursor": older_cursor, "count": len(chat_messages)})
+
+# Another page of the sidebar, as an HTML fragment (for "More chats")
+def chat_list(request):
+    page = request.GET.get("page", "1")
+    page = int(page) if page.isdigit() and int(page) > 0 else 1
+
+    chat_ids, chat_titles, next_page = get_sidebar_page(page)
+    with tracing.span("render", template="chat_list"):
+        html = render_to_string("chat/_chat_list.html", {
+            "chat_ids": chat_ids,
+            "chat_titles": chat_titles,
+            "current_chat": request.GET.get("chat_id"),
+        }, request=request)
+    return JsonResponse({"html": html, "next_page": next_page})
+
+def sse(event):
+    return f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+# Send a message and relay the reply to the browser token by token (text/event-stream).
+# The turn is saved to the chat log once the reply is complete (not if it failed, see send_message).
+@require_POST
+def chat_stream(request):
+    form = ChatForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({"error": form.errors}, status=400)
+
+    chat_id = request.POST.get("chat_id") or new_chat_id()
+    if not CHAT_ID_PATTERN.match(chat_id):
+        return JsonResponse({"error": "Invalid chat_id"}, status=400)
+    return stream_turn(chat_id, form.cleaned_data["message"], form.cleaned_data.get("file_url"))
+
+def stream_turn(chat_id, prompt, file_url=None):
+    """text/event-stream response relaying the reply to prompt; the turn is saved when it ends."""
+    history = get_full_chat_history(chat_id)
+    full_prompt = build_prompt(chat_id, history, prompt)
+
+    # The body is produced after the middleware returned: carry the request id over
+    request_id = tracing.current_request_id()
+
+    def events():
+        token = tracing.start_request(request_id)
+        try:
+            yield from relay()
+        finally:
+            tracing.end_request(token)
+
+    def relay():
+        reply = []
+
+        for event in iter_reply(full_prompt, file_url, chat_id):
+            if "content" in event:
+                reply.append(event["content"])
+                yield sse({"content": event["content"]})
+            elif "error" in event:
+                # Nothing is saved; without a chatID the page doesn't switch to a new chat
+                yield sse({"error": event["error"]})
+                yield sse({"done": True})
+                return
+
+        response_text = "".join(reply).strip()
+        save_to_chat_log(chat_id, prompt, response_text)
+        set_chat_title(chat_id, response_text)
+        yield sse({"done": True, "chatID": chat_id})
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # don't let a proxy buffer the tokens
+    return response
+
+# Prometheus-style metrics (spans, upstream latency), see tracing.py
+def metrics(request):
+    return HttpResponse(tracing.render_metrics(), content_type="text/plain; version=0.0.4")
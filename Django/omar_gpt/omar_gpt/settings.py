@@ -15,6 +15,10 @@ import os
 import sys
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
+# Repository root, for the shared modules that live there (api_client.py, ...)
+REPO_ROOT = BASE_DIR.parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.append(str(REPO_ROOT))
 
 
 # Quick-start development settings - unsuitable for production
@@ -43,6 +47,7 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    'chat.middleware.RequestTracingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,6 +59,14 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'omar_gpt.urls'
 
+# Prompts / payloads in chat.views are logged at DEBUG: set LOG_LEVEL=DEBUG to see them
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'loggers': {'chat': {'handlers': ['console'], 'level': os.getenv('LOG_LEVEL', 'INFO')}},
+}
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
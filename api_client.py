@@ -0,0 +1,349 @@
+# Filename: api_client.py
+#
+# Shared HTTP client for the chat API (Node, app.js) and the OCR API (easyocrapi.py),
+# used by the Django app, rag_service.py and the OCR scripts.
+#
+# - one pooled keep-alive session per process instead of a new connection per call
+# - (connect, read) timeouts per endpoint, so a stalled upstream can't hold a worker forever
+# - connection failures retried a bounded number of times with backoff
+#   (requests that reached the server are never retried: chat posts aren't idempotent)
+# - a circuit breaker per endpoint: after CIRCUIT_FAILURES failures in a row calls fail
+#   fast for CIRCUIT_RESET seconds instead of piling up behind a dead upstream
+# - latency/error counters per endpoint (client.stats()), also recorded as
+#   "upstream" spans in tracing.py; the current request id is forwarded in the
+#   X-Request-ID header
+#
+# AsyncApiClient is the same thing on httpx for async callers (httpx is only
+# imported when it is used).
+
+import os
+import socket
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import tracing
+
+CHAT_API_URL = os.getenv("CHAT_API_URL", "http://localhost:3000/api/chat")
+OCR_API_URL = os.getenv("OCR_API_URL", "http://127.0.0.1:5000")
+
+CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", 3.05))
+# Read timeout = longest silence allowed between bytes. The chat API processes
+# attached files before its first token, so it gets much longer than the default.
+TIMEOUTS = {
+    "chat": (CONNECT_TIMEOUT, float(os.getenv("CHAT_API_TIMEOUT", 300))),
+    "ocr": (CONNECT_TIMEOUT, float(os.getenv("OCR_API_TIMEOUT", 600))),
+    "default": (CONNECT_TIMEOUT, float(os.getenv("API_TIMEOUT", 30))),
+}
+
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", 20))
+API_RETRIES = int(os.getenv("API_RETRIES", 2))
+API_BACKOFF = float(os.getenv("API_BACKOFF", 0.3))
+CIRCUIT_FAILURES = int(os.getenv("API_CIRCUIT_FAILURES", 5))
+CIRCUIT_RESET = float(os.getenv("API_CIRCUIT_RESET", 30))
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of calling an endpoint whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=CIRCUIT_FAILURES, reset_timeout=CIRCUIT_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            # Half-open: let a single trial request through
+            if state == "half-open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class LatencyStats:
+    def __init__(self, endpoint=None, window=1024):
+        self.endpoint = endpoint
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds, error=False):
+        with self._lock:
+            self.count += 1
+            self.errors += bool(error)
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            self.recent.append(seconds)
+        tracing.record("upstream", seconds, endpoint=self.endpoint)
+        if error:
+            tracing.increment("upstream_errors_total", endpoint=self.endpoint)
+
+    def snapshot(self):
+        with self._lock:
+            recent = sorted(self.recent)
+
+        def percentile(p):
+            return recent[min(len(recent) - 1, int(p * len(recent)))] if recent else None
+
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg": self.total / self.count if self.count else None,
+            "max": self.max,
+            "p50": percentile(0.5),
+            "p99": percentile(0.99),
+        }
+
+
+class _Endpoints:
+    # Breakers and stats are created per endpoint name on first use
+    def __init__(self):
+        self.breakers = {}
+        self.latency = {}
+        self._lock = threading.Lock()
+
+    def get(self, endpoint):
+        with self._lock:
+            if endpoint not in self.breakers:
+                self.breakers[endpoint] = CircuitBreaker()
+                self.latency[endpoint] = LatencyStats(endpoint)
+            return self.breakers[endpoint], self.latency[endpoint]
+
+    def timeout(self, endpoint):
+        return TIMEOUTS.get(endpoint, TIMEOUTS["default"])
+
+    def prepare(self, endpoint, kwargs):
+        kwargs.setdefault("timeout", self.timeout(endpoint))
+        request_id = tracing.current_request_id()
+        if request_id:
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), tracing.REQUEST_ID_HEADER: request_id}
+
+    def stats(self):
+        with self._lock:
+            endpoints = list(self.breakers)
+        return {
+            endpoint: {**self.latency[endpoint].snapshot(), "circuit": self.breakers[endpoint].state}
+            for endpoint in endpoints
+        }
+
+
+class ApiClient:
+    def __init__(self, pool_size=API_POOL_SIZE, retries=API_RETRIES, backoff=API_BACKOFF):
+        self.endpoints = _Endpoints()
+        self.session = requests.Session()
+        retry = Retry(total=retries, connect=retries, read=0, status=0, other=0, backoff_factor=backoff)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _send(self, endpoint, method, url, **kwargs):
+        breaker, latency = self.endpoints.get(endpoint)
+        if not breaker.allow():
+            raise CircuitOpenError(f"{endpoint} API unavailable (circuit open after {breaker.failures} failures)")
+
+        self.endpoints.prepare(endpoint, kwargs)
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            breaker.record_failure()
+            latency.record(time.perf_counter() - started, error=True)
+            raise
+        return response, breaker, latency, started
+
+    def request(self, endpoint, method, url, **kwargs):
+        response, breaker, latency, started = self._send(endpoint, method, url, **kwargs)
+        failed = response.status_code >= 500
+        breaker.record_failure() if failed else breaker.record_success()
+        latency.record(time.perf_counter() - started, error=failed)
+        return response
+
+    def get(self, endpoint, url, **kwargs):
+        return self.request(endpoint, "GET", url, **kwargs)
+
+    def post(self, endpoint, url, **kwargs):
+        return self.request(endpoint, "POST", url, **kwargs)
+
+    @contextmanager
+    def stream(self, endpoint, method, url, **kwargs):
+        """Like request(stream=True); latency covers the whole body, errors while reading count as failures."""
+        response, breaker, latency, started = self._send(endpoint, method, url, stream=True, **kwargs)
+        failed = response.status_code >= 500
+        try:
+            yield response
+        except requests.exceptions.RequestException:
+            failed = True
+            raise
+        finally:
+            response.close()
+            breaker.record_failure() if failed else breaker.record_success()
+            latency.record(time.perf_counter() - started, error=failed)
+
+    def stats(self):
+        return self.endpoints.stats()
+
+
+class AsyncApiClient:
+    def __init__(self, pool_size=API_POOL_SIZE, retries=API_RETRIES):
+        import httpx
+
+        self.endpoints = _Endpoints()
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            # httpx only retries failed connection attempts
+            transport=httpx.AsyncHTTPTransport(retries=retries),
+        )
+
+    def _prepare(self, endpoint, kwargs):
+        import httpx
+
+        connect, read = self.endpoints.timeout(endpoint)
+        kwargs.setdefault("timeout", httpx.Timeout(read, connect=connect))
+        self.endpoints.prepare(endpoint, kwargs)
+
+    async def request(self, endpoint, method, url, **kwargs):
+        import httpx
+
+        breaker, latency = self.endpoints.get(endpoint)
+        if not breaker.allow():
+            raise CircuitOpenError(f"{endpoint} API unavailable (circuit open after {breaker.failures} failures)")
+        self._prepare(endpoint, kwargs)
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            breaker.record_failure()
+            latency.record(time.perf_counter() - started, error=True)
+            raise
+        failed = response.status_code >= 500
+        breaker.record_failure() if failed else breaker.record_success()
+        latency.record(time.perf_counter() - started, error=failed)
+        return response
+
+    async def get(self, endpoint, url, **kwargs):
+        return await self.request(endpoint, "GET", url, **kwargs)
+
+    async def post(self, endpoint, url, **kwargs):
+        return await self.request(endpoint, "POST", url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, endpoint, method, url, **kwargs):
+        import httpx
+
+        breaker, latency = self.endpoints.get(endpoint)
+        if not breaker.allow():
+            raise CircuitOpenError(f"{endpoint} API unavailable (circuit open after {breaker.failures} failures)")
+        self._prepare(endpoint, kwargs)
+        started = time.perf_counter()
+        failed = True
+        try:
+            async with self.client.stream(method, url, **kwargs) as response:
+                failed = response.status_code >= 500
+                try:
+                    yield response
+                except httpx.HTTPError:
+                    failed = True
+                    raise
+        finally:
+            breaker.record_failure() if failed else breaker.record_success()
+            latency.record(time.perf_counter() - started, error=failed)
+
+    def stats(self):
+        return self.endpoints.stats()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+def abort_stream(response):
+    """Make a read blocked on a streaming response (in another thread) fail right away.
+
+    Closing the response from another thread doesn't wake a blocked recv(), so
+    the connection's socket is shut down; the reading thread then gets a
+    RequestException and closes the response itself.
+    """
+    connection = getattr(response.raw, "_connection", None)
+    sock = getattr(connection, "sock", None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+def iter_sse_events(response):
+    """Yield each "data:" payload (a string) of a text/event-stream response as soon as it arrives."""
+    data_lines = []
+    for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+        if line:
+            if line.startswith("data:"):
+                data_lines.append(line[5:].lstrip())
+        elif data_lines:
+            yield "\n".join(data_lines)
+            data_lines = []
+    if data_lines:
+        yield "\n".join(data_lines)
+
+
+async def aiter_sse_events(response):
+    """Async iter_sse_events for an httpx streaming response."""
+    data_lines = []
+    async for line in response.aiter_lines():
+        line = line.rstrip("\r\n")
+        if line:
+            if line.startswith("data:"):
+                data_lines.append(line[5:].lstrip())
+        elif data_lines:
+            yield "\n".join(data_lines)
+            data_lines = []
+    if data_lines:
+        yield "\n".join(data_lines)
+
+
+# Process-wide clients
+client = ApiClient()
+_async_client = None
+
+
+def get_async_client():
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncApiClient()
+    return _async_client
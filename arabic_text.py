@@ -0,0 +1,37 @@
+# Filename: arabic_text.py
+#
+# Text normalization for search: Arabic spelling variants that readers treat as
+# the same word are folded together, so a query matches regardless of diacritics
+# or how alef / yeh / teh marbuta were typed.
+
+import re
+
+# Harakat (fathatan .. sukun), superscript alef and tatweel are dropped
+_REMOVE = dict.fromkeys([*range(0x064B, 0x0653), 0x0670, 0x0640])
+
+_FOLD = {
+    # alef with madda / hamza above / hamza below / wasla -> bare alef
+    0x0622: "ا", 0x0623: "ا", 0x0625: "ا", 0x0671: "ا",
+    # alef maksura and Farsi yeh -> yeh
+    0x0649: "ي", 0x06CC: "ي",
+    # teh marbuta -> heh
+    0x0629: "ه",
+    # waw / yeh with hamza -> waw / yeh
+    0x0624: "و", 0x0626: "ي",
+    # Farsi kaf -> kaf
+    0x06A9: "ك",
+}
+
+_TABLE = {**_REMOVE, **_FOLD}
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def normalize(text):
+    """Lowercase, strip Arabic diacritics and tatweel, and fold letter variants."""
+    return text.lower().translate(_TABLE)
+
+
+def tokenize(text):
+    """Normalized word tokens of text."""
+    return TOKEN_PATTERN.findall(normalize(text))
@@ -0,0 +1 @@
+# Offline benchmarks, run from the repo root: python -m benchmarks.run_all
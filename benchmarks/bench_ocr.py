@@ -0,0 +1,118 @@
+# Filename: benchmarks/bench_ocr.py
+#
+# End-to-end OCR through easyocrapi's POST /extract-text/ (in process, via
+# FastAPI's TestClient): mybook.pdf plus synthetic scanned English, Arabic and
+# mixed PDFs. Every timed run gets an empty OCR cache so pages are really OCR'd;
+# the "cached" case then re-posts the same document to measure a cache hit.
+# Loading the EasyOCR reader is timed once, separately, and not counted in the runs.
+#
+#   --force-ocr   ignore text layers (OCR_TEXT_LAYER=0), e.g. for mybook.pdf
+#
+# Run: python -m benchmarks.bench_ocr [--quick] [--pages 5] [--repeat 3]
+
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.common import REPO_ROOT, argument_parser, log, measure, peak_rss_mb, summarize, write_report
+from benchmarks.synthetic_pdf import make_pdf
+
+SYNTHETIC_LANGUAGES = ["en", "ar", "mixed"]
+
+
+def case(name, document, pages, samples, **extra):
+    stats = summarize(samples)
+    mean = sum(samples) / len(samples) if samples else 0
+    result = {
+        "case": name,
+        "document": document,
+        "pages": pages,
+        **stats,
+        "pages_per_second": round(pages / mean, 3) if mean else None,
+        **extra,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    log(f"  {name}: p50 {stats.get('p50_ms')} ms, {result['pages_per_second']} pages/s")
+    return result
+
+
+def main():
+    parser = argument_parser("OCR benchmarks (easyocrapi /extract-text/)")
+    parser.set_defaults(repeat=3)
+    parser.add_argument("--pages", type=int, default=5, help="pages per synthetic PDF")
+    parser.add_argument("--force-ocr", action="store_true", help="OCR pages even when they have a text layer")
+    parser.add_argument("--no-mybook", action="store_true", help="skip mybook.pdf")
+    args = parser.parse_args()
+    pages = 2 if args.quick else args.pages
+
+    directory = tempfile.mkdtemp(prefix="bench_ocr_")
+    # Must be set before easyocrapi / ocr_pipeline read them at import time
+    os.environ["OCR_CACHE_PATH"] = os.path.join(directory, "startup_cache.sqlite3")
+    os.environ.setdefault("OCR_WARMUP", "lazy")
+    if args.force_ocr:
+        os.environ["OCR_TEXT_LAYER"] = "0"
+
+    try:
+        from fastapi.testclient import TestClient
+
+        import easyocrapi
+        import ocr_reader
+        from ocr_cache import OcrCache
+
+        started = time.perf_counter()
+        ocr_reader.get_reader()
+        reader_seconds = time.perf_counter() - started
+    except ImportError as e:
+        # No OCR stack installed (easyocr / torch / pdf2image): report it instead of failing the suite
+        log(f"OCR: skipped ({e})")
+        write_report("ocr", [{"case": "skipped", "reason": str(e)}], args.output)
+        shutil.rmtree(directory, ignore_errors=True)
+        return
+
+    results = [{"case": "reader_load", "seconds": round(reader_seconds, 3), "peak_rss_mb": peak_rss_mb()}]
+    log(f"OCR: reader loaded in {results[0]['seconds']} s")
+    try:
+        documents = []
+        mybook = os.path.join(REPO_ROOT, "mybook.pdf")
+        if not args.no_mybook and os.path.exists(mybook):
+            documents.append(("mybook", mybook))
+        for language in SYNTHETIC_LANGUAGES:
+            path = os.path.join(directory, f"synthetic-{language}-{pages}p.pdf")
+            documents.append((f"synthetic-{language}-{pages}p", make_pdf(path, pages, language)))
+
+        with TestClient(easyocrapi.app) as client:
+            for name, path in documents:
+                with open(path, "rb") as f:
+                    content = f.read()
+                runs = 0
+                report = {}
+
+                def post():
+                    response = client.post("/extract-text/", files={"file": (os.path.basename(path), content, "application/pdf")})
+                    body = response.json()
+                    if response.status_code != 200:
+                        raise RuntimeError(body.get("message"))
+                    report.update(body)
+
+                def post_uncached():
+                    nonlocal runs
+                    runs += 1
+                    # Fresh cache: neither the document nor its pages have been seen
+                    easyocrapi.cache = OcrCache(os.path.join(directory, f"{name}-{runs}.sqlite3"))
+                    post()
+
+                log(f"OCR: {name}")
+                samples = measure(post_uncached, args.repeat, warmup=0)
+                page_count = len(report.get("pages", []))
+                results.append(case(f"extract_text/{name}", name, page_count, samples,
+                                    sources=report.get("sources"), characters=len(report.get("extracted_text", ""))))
+                results.append(case(f"extract_text_cached/{name}", name, page_count,
+                                    measure(post, args.repeat, warmup=0)))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    write_report("ocr", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
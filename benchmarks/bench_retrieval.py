@@ -0,0 +1,120 @@
+# Filename: benchmarks/bench_retrieval.py
+#
+# Retrieval hot paths of vector_store / keyword_index over synthetic data:
+# bulk add, top-k cosine search, BM25 keyword scoring, hybrid search, and the
+# first search of a fresh process (memmap + postings loaded from disk).
+# Embeddings are seeded random vectors; documents are random Arabic/English
+# words with a Zipf-like frequency, so BM25 postings have realistic lengths.
+#
+# Run: python -m benchmarks.bench_retrieval [--quick] [--rows 1000 10000] [--dim 1536]
+
+import shutil
+import tempfile
+
+import numpy as np
+
+from benchmarks.common import argument_parser, log, measure, peak_rss_mb, summarize, write_report
+from vector_store import VectorStore, top_k
+
+ROW_COUNTS = [1000, 10000, 50000]
+QUICK_ROW_COUNTS = [1000, 5000]
+ADD_BATCH = 1000
+WORDS_PER_DOCUMENT = 60
+K = 5
+
+ENGLISH_WORDS = (
+    "water river delta rain cloud evaporation history chapter book lesson science city farm "
+    "market trade king army map desert sea ship school teacher student question answer"
+).split()
+ARABIC_WORDS = (
+    "الماء النهر الدلتا المطر السحاب التبخر التاريخ الفصل الكتاب الدرس العلوم المدينة المزرعة "
+    "السوق التجارة الملك الجيش الخريطة الصحراء البحر السفينة المدرسة المعلم الطالب السؤال الجواب"
+).split()
+
+
+def make_vocabulary(size=5000):
+    # The real words plus numbered variants of them, so the vocabulary has a long tail
+    base = ENGLISH_WORDS + ARABIC_WORDS
+    return base + [f"{base[i % len(base)]}{i}" for i in range(size - len(base))]
+
+
+def make_documents(rng, vocabulary, count):
+    # Zipf ranks, clipped to the vocabulary
+    ranks = np.minimum(rng.zipf(1.3, size=(count, WORDS_PER_DOCUMENT)), len(vocabulary)) - 1
+    return [{"content": " ".join(vocabulary[r] for r in row), "url": None, "metadata": {}} for row in ranks]
+
+
+def case(operation, rows, samples, **extra):
+    stats = summarize(samples)
+    result = {"case": f"{operation}/{rows}", "operation": operation, "rows": rows, **stats, **extra,
+              "peak_rss_mb": peak_rss_mb()}
+    log(f"  {result['case']}: p50 {stats.get('p50_ms')} ms, p99 {stats.get('p99_ms')} ms")
+    return result
+
+
+def bench_rows(directory, rows, dim, repeat, rng, vocabulary):
+    results = []
+    store = VectorStore(directory)
+    chat_id = f"bench-{rows}"
+
+    add_samples = []
+    for start in range(0, rows, ADD_BATCH):
+        count = min(ADD_BATCH, rows - start)
+        embeddings = rng.standard_normal((count, dim), dtype=np.float32)
+        documents = make_documents(rng, vocabulary, count)
+        add_samples.extend(measure(lambda: store.add(chat_id, embeddings, documents), 1, warmup=0))
+    results.append(case("add", rows, add_samples, batch=ADD_BATCH,
+                        rows_per_second=round(rows / sum(add_samples), 1)))
+
+    queries = rng.standard_normal((repeat + 1, dim), dtype=np.float32)
+    texts = [" ".join(vocabulary[r] for r in rng.integers(0, 50, size=3)) for _ in range(repeat + 1)]
+
+    # First search of a fresh process: maps the files and loads the BM25 postings
+    cold = VectorStore(directory)
+    results.append(case("hybrid_search_cold", rows,
+                        measure(lambda: cold.search(chat_id, queries[0], K, texts[0]), 1, warmup=0)))
+
+    def cycle(values):
+        position = 0
+
+        def next_value():
+            nonlocal position
+            position = (position + 1) % len(values)
+            return values[position]
+        return next_value
+
+    next_query, next_text = cycle(queries), cycle(texts)
+    results.append(case("vector_search", rows, measure(lambda: store.search(chat_id, next_query(), K), repeat), k=K))
+    results.append(case("keyword_scores", rows,
+                        measure(lambda: store.keywords.scores(chat_id, next_text(), rows), repeat)))
+    results.append(case("hybrid_search", rows,
+                        measure(lambda: store.search(chat_id, next_query(), K, next_text()), repeat), k=K))
+
+    scores = rng.standard_normal(rows).astype(np.float32)
+    results.append(case("top_k", rows, measure(lambda: top_k(scores, K), repeat), k=K))
+    return results
+
+
+def main():
+    parser = argument_parser("Vector / keyword retrieval benchmarks")
+    parser.add_argument("--rows", type=int, nargs="+", help="rows per chat (default: 1000 10000 50000)")
+    parser.add_argument("--dim", type=int, default=1536, help="embedding size (ada-002: 1536)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    row_counts = args.rows or (QUICK_ROW_COUNTS if args.quick else ROW_COUNTS)
+
+    rng = np.random.default_rng(args.seed)
+    vocabulary = make_vocabulary()
+    directory = tempfile.mkdtemp(prefix="bench_retrieval_")
+    results = []
+    try:
+        for rows in row_counts:
+            log(f"Retrieval: {rows} rows x {args.dim}")
+            results += bench_rows(directory, rows, args.dim, args.repeat, rng, vocabulary)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    write_report("retrieval", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# Filename: benchmarks/bench_sessions.py
+#
+# Session storage as the chat views use it: save_to_chat_log (append),
+# get_full_chat_history (read), get_chat_history_page (latest page) for chats of
+# 10 to 10,000 messages, and get_sidebar_page / list_chat_ids for 10 to 10,000
+# chats, warm and with a cold chat index, and the full-text search_index for
+# 1,000 to 300,000 messages. The views' session_store and search_index are
+# pointed at a temporary folder, so the real chat_sessions are never touched.
+#
+# Run: python -m benchmarks.bench_sessions [--quick] [--output sessions.json]
+
+import os
+import shutil
+import tempfile
+
+from benchmarks.common import argument_parser, log, measure, peak_rss_mb, summarize, write_report
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "omar_gpt.settings")
+django.setup()
+
+from chat import views
+from chat.search_index import SearchIndex
+from chat.session_store import SessionStore
+from chat.text_utils import annotate_message
+
+MESSAGE_COUNTS = [10, 100, 1000, 10000]
+CHAT_COUNTS = [10, 100, 1000, 10000]
+QUICK_COUNTS = [10, 100]
+INDEXED_COUNTS = [1000, 10000, 100000, 300000]
+QUICK_INDEXED_COUNTS = [1000]
+# Messages per chat in the search index
+CHAT_SIZE = 100
+
+USER_TEXTS = [
+    "What does chapter three say about the water cycle?",
+    "ما هي الفكرة الرئيسية في الفصل الثالث من الكتاب؟",
+]
+GPT_TEXTS = [
+    "Chapter three explains evaporation, condensation and precipitation, with examples from the Nile delta.",
+    "يشرح الفصل الثالث دورة الماء: التبخر ثم التكاثف ثم الهطول، مع أمثلة من دلتا النيل.",
+]
+
+
+def make_messages(count):
+    messages = []
+    for i in range(count):
+        texts = USER_TEXTS if i % 2 == 0 else GPT_TEXTS
+        role = "user" if i % 2 == 0 else "gpt"
+        messages.append(annotate_message({"role": role, "content": f"{texts[(i // 2) % 2]} ({i})"}))
+    return messages
+
+
+def case(operation, size_name, size, samples, **extra):
+    stats = summarize(samples)
+    mean = sum(samples) / len(samples) if samples else 0
+    result = {
+        "case": f"{operation}/{size}",
+        "operation": operation,
+        size_name: size,
+        **stats,
+        "ops_per_second": round(1 / mean, 1) if mean else None,
+        **extra,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    log(f"  {result['case']}: p50 {stats.get('p50_ms')} ms, p99 {stats.get('p99_ms')} ms")
+    return result
+
+
+def bench_messages(store, counts, repeat):
+    results = []
+    for count in counts:
+        chat_id = f"bench-{count}"
+        store.write(chat_id, make_messages(count))
+        # Each append adds a turn; with repeat << count the chat size barely moves
+        user, gpt = USER_TEXTS[1], GPT_TEXTS[1]
+        results.append(case("append", "messages", count,
+                            measure(lambda: views.save_to_chat_log(chat_id, user, gpt), repeat)))
+        results.append(case("read_full", "messages", count,
+                            measure(lambda: views.get_full_chat_history(chat_id), repeat)))
+        results.append(case("read_page", "messages", count,
+                            measure(lambda: views.get_chat_history_page(chat_id), repeat)))
+    return results
+
+
+def bench_chats(directory, counts, repeat):
+    results = []
+    for count in counts:
+        folder = os.path.join(directory, f"chats-{count}")
+        store = views.session_store = SessionStore(folder)
+        messages = make_messages(4)
+        for i in range(count):
+            chat_id = f"chat-{i:05d}"
+            store.write(chat_id, messages, updated=1_700_000_000 + i)
+            store.set_title(chat_id, f"Chat {i}")
+        store.index.flush()
+
+        results.append(case("sidebar", "chats", count, measure(lambda: views.get_sidebar_page(), repeat)))
+        results.append(case("list_ids", "chats", count, measure(lambda: views.list_chat_ids(), repeat)))
+
+        # A fresh process: the index is read back from chat_index.json on the first call
+        def cold_sidebar():
+            views.session_store = SessionStore(folder)
+            views.get_sidebar_page()
+        results.append(case("sidebar_cold", "chats", count, measure(cold_sidebar, max(1, repeat // 4))))
+        views.session_store.index.flush()
+    return results
+
+
+def bench_search(directory, counts, repeat):
+    results = []
+    for count in counts:
+        index = SearchIndex(os.path.join(directory, f"search-{count}.sqlite3"))
+        sessions = ((f"chat-{i:06d}", make_messages(CHAT_SIZE)) for i in range(count // CHAT_SIZE))
+        seconds = measure(lambda: index.rebuild((chat_id, messages, None) for chat_id, messages in sessions), 1, warmup=0)
+        results.append(case("index_rebuild", "messages", count, seconds,
+                            rows_per_second=round(count / seconds[0], 1)))
+
+        # A word in half the messages, a prefix, Arabic, one chat only, no hit
+        queries = {
+            "common": "chapter",
+            "prefix": "evapor",
+            "arabic": "الفصل الثالث",
+            "chat": "water",
+            "miss": "photosynthesis",
+        }
+        for name, query in queries.items():
+            chat_id = "chat-000000" if name == "chat" else None
+            results.append(case(f"search_{name}", "messages", count,
+                                measure(lambda: index.search(query, chat_id=chat_id), repeat)))
+        results.append(case("search_page_10", "messages", count,
+                            measure(lambda: index.search("chapter", page=10), repeat)))
+    return results
+
+
+def main():
+    parser = argument_parser("Session storage benchmarks (chat views)")
+    args = parser.parse_args()
+    counts = QUICK_COUNTS if args.quick else MESSAGE_COUNTS
+    chat_counts = QUICK_COUNTS if args.quick else CHAT_COUNTS
+    indexed_counts = QUICK_INDEXED_COUNTS if args.quick else INDEXED_COUNTS
+
+    directory = tempfile.mkdtemp(prefix="bench_sessions_")
+    original_store, original_index = views.session_store, views.search_index
+    try:
+        store = views.session_store = SessionStore(os.path.join(directory, "messages"))
+        views.search_index = SearchIndex(os.path.join(directory, "search_index.sqlite3"))
+        log("Sessions: messages per chat")
+        results = bench_messages(store, counts, args.repeat)
+        store.index.flush()
+        log("Sessions: chats in the sidebar")
+        results += bench_chats(directory, chat_counts, args.repeat)
+        log("Sessions: full-text search")
+        results += bench_search(directory, indexed_counts, args.repeat)
+    finally:
+        views.session_store, views.search_index = original_store, original_index
+        shutil.rmtree(directory, ignore_errors=True)
+    write_report("sessions", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# Filename: benchmarks/common.py
+#
+# Shared helpers for the benchmark scripts: latency percentiles, peak RSS and
+# the JSON report every script writes (stdout, or --output file), so two runs
+# can be diffed with benchmarks/compare.py.
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DJANGO_ROOT = os.path.join(REPO_ROOT, "Django", "omar_gpt")
+
+for path in (REPO_ROOT, DJANGO_ROOT):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def percentile(sorted_values, fraction):
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def summarize(seconds):
+    """Latency stats, in milliseconds, of a list of durations in seconds."""
+    values = sorted(seconds)
+    if not values:
+        return {"runs": 0}
+    return {
+        "runs": len(values),
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3),
+        "min_ms": round(values[0] * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3),
+    }
+
+
+def measure(fn, repeat, warmup=1):
+    """Call fn() warmup + repeat times; return the repeat durations (seconds)."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def peak_rss_mb():
+    # High-water mark of this process so far (ru_maxrss is KB on Linux, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak /= 1024
+    return round(peak / 1024, 1)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def argument_parser(description):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--output", "-o", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per case")
+    parser.add_argument("--quick", action="store_true", help="small sizes only (smoke test)")
+    return parser
+
+
+def write_report(suite, results, output=None):
+    """Print (or save) {"suite", "environment", "results"}, results being a list of case dicts."""
+    report = {"suite": suite, "environment": environment(), "results": results}
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return report
+
+
+def log(message):
+    # Progress goes to stderr so stdout stays valid JSON
+    print(message, file=sys.stderr, flush=True)
@@ -0,0 +1,59 @@
+# Filename: benchmarks/compare.py
+#
+# Side by side p50 / p99 (and throughput where there is one) of two reports
+# written by run_all.py, with the change in percent. Slower by more than
+# --threshold percent is flagged as a regression.
+#
+# Run: python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+
+import argparse
+import json
+
+METRICS = ["p50_ms", "p99_ms", "pages_per_second", "rows_per_second", "ops_per_second", "peak_rss_mb"]
+# Higher is better for these; lower for the rest
+THROUGHPUT = {"pages_per_second", "rows_per_second", "ops_per_second"}
+
+
+def load_cases(path):
+    with open(path, encoding="utf-8") as f:
+        report = json.load(f)
+    # run_all.py reports hold several suites, a single bench_*.py report just one
+    suites = report.get("suites") or [report]
+    return {
+        f"{suite['suite']}:{result['case']}": result
+        for suite in suites
+        for result in suite.get("results", [])
+    }
+
+
+def compare(old, new, threshold):
+    rows = []
+    for name in sorted(old.keys() & new.keys()):
+        for metric in METRICS:
+            before, after = old[name].get(metric), new[name].get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before * 100
+            worse = -change if metric in THROUGHPUT else change
+            rows.append((name, metric, before, after, change, worse > threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent change counted as a regression")
+    args = parser.parse_args()
+
+    rows = compare(load_cases(args.old), load_cases(args.new), args.threshold)
+    width = max((len(name) for name, *_ in rows), default=10)
+    for name, metric, before, after, change, regression in rows:
+        flag = "  ⚠️ regression" if regression else ""
+        print(f"{name:<{width}}  {metric:<16} {before:>12} -> {after:<12} {change:+7.1f}%{flag}")
+    regressions = sum(1 for row in rows if row[-1])
+    print(f"\n{len(rows)} metrics compared, {regressions} regressions over {args.threshold}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# Filename: benchmarks/fake_chat_api.py
+#
+# Local stand-in for the Node server's POST /api/chat, for load tests without
+# Gemini, OpenAI or Supabase. Speaks the same SSE protocol as
+# controllers/chat.controller.js: data: {"content": ...} per token, then
+# data: {"done": true, "chatID": ...}, or data: {"error": ...} on failure.
+#
+#   FAKE_TOKENS             tokens per reply (default 50)
+#   FAKE_TOKEN_RATE         tokens per second, 0 = as fast as possible (default 50)
+#   FAKE_FIRST_TOKEN_DELAY  seconds before the first token (default 0.5)
+#   FAKE_ERROR_RATE         fraction of requests that fail, 0..1 (default 0)
+#   FAKE_ERROR_MODE         http (500 up front) | stream (error event mid-reply) | mixed (default)
+#
+# GET /config shows the settings, POST /config changes them while running,
+# GET /stats counts requests, errors and concurrent streams.
+#
+# Run: python -m benchmarks.fake_chat_api --port 3000 --token-rate 100 --first-token-delay 0.2
+#  (or: uvicorn benchmarks.fake_chat_api:app --port 3000, configured by the env vars)
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+ERROR_MODES = ("http", "stream", "mixed")
+
+settings = {
+    "tokens": int(os.getenv("FAKE_TOKENS", 50)),
+    "token_rate": float(os.getenv("FAKE_TOKEN_RATE", 50)),
+    "first_token_delay": float(os.getenv("FAKE_FIRST_TOKEN_DELAY", 0.5)),
+    "error_rate": float(os.getenv("FAKE_ERROR_RATE", 0)),
+    "error_mode": os.getenv("FAKE_ERROR_MODE", "mixed"),
+}
+
+stats = {"requests": 0, "completed": 0, "http_errors": 0, "stream_errors": 0, "active": 0, "max_active": 0}
+
+# Reply words, Arabic and English like the real model's answers
+WORDS = "the water cycle starts with evaporation الماء يتبخر من البحر ثم يتكاثف في السحاب and falls as rain".split()
+
+app = FastAPI()
+
+
+def sse(event):
+    return f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+def pick_error():
+    """None, "http" or "stream" for the next request, per error_rate / error_mode."""
+    if random.random() >= settings["error_rate"]:
+        return None
+    mode = settings["error_mode"]
+    return random.choice(("http", "stream")) if mode == "mixed" else mode
+
+
+@app.post("/api/chat")
+async def chat(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+    chat_id = body.get("chatID") or str(uuid.uuid4())
+    error = pick_error()
+
+    if error == "http":
+        stats["http_errors"] += 1
+        return JSONResponse(status_code=500, content={"message": "Internal server error"})
+
+    tokens = settings["tokens"]
+    interval = 1 / settings["token_rate"] if settings["token_rate"] > 0 else 0
+    # Stream errors happen somewhere in the middle of the reply
+    fail_at = random.randrange(tokens) if error == "stream" and tokens else None
+
+    async def generate():
+        stats["active"] += 1
+        stats["max_active"] = max(stats["max_active"], stats["active"])
+        try:
+            await asyncio.sleep(settings["first_token_delay"])
+            for i in range(tokens):
+                if i == fail_at:
+                    stats["stream_errors"] += 1
+                    yield sse({"error": "Internal server error"})
+                    return
+                if i and interval:
+                    await asyncio.sleep(interval)
+                yield sse({"content": WORDS[i % len(WORDS)] + " "})
+            stats["completed"] += 1
+            yield sse({"done": True, "chatID": chat_id})
+        finally:
+            stats["active"] -= 1
+
+    return StreamingResponse(generate(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/config")
+async def get_config():
+    return settings
+
+
+@app.post("/config")
+async def set_config(request: Request):
+    updates = await request.json()
+    unknown = set(updates) - set(settings)
+    if unknown:
+        return JSONResponse(status_code=400, content={"message": f"Unknown settings: {sorted(unknown)}"})
+    if updates.get("error_mode", settings["error_mode"]) not in ERROR_MODES:
+        return JSONResponse(status_code=400, content={"message": f"error_mode must be one of {ERROR_MODES}"})
+    for key, value in updates.items():
+        settings[key] = type(settings[key])(value)
+    return settings
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+
+@app.post("/stats/reset")
+async def reset_stats():
+    # "active" streams are still running, keep counting them
+    stats.update({key: 0 for key in stats if key != "active"})
+    return stats
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake /api/chat SSE server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3000)
+    parser.add_argument("--tokens", type=int, default=settings["tokens"])
+    parser.add_argument("--token-rate", type=float, default=settings["token_rate"])
+    parser.add_argument("--first-token-delay", type=float, default=settings["first_token_delay"])
+    parser.add_argument("--error-rate", type=float, default=settings["error_rate"])
+    parser.add_argument("--error-mode", choices=ERROR_MODES, default=settings["error_mode"])
+    args = parser.parse_args()
+    settings.update(
+        tokens=args.tokens,
+        token_rate=args.token_rate,
+        first_token_delay=args.first_token_delay,
+        error_rate=args.error_rate,
+        error_mode=args.error_mode,
+    )
+    print(f"🤖 Fake chat API on http://{args.host}:{args.port}/api/chat {settings}")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
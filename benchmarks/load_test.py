@@ -0,0 +1,291 @@
+# Filename: benchmarks/load_test.py
+#
+# Concurrent load generator: N simulated users, each holding its own chat for
+# a number of turns, against
+#   django  a running Django app (manage.py runserver / gunicorn), through
+#           POST /stream/ (--mode stream, default) or the form POST / (--mode form)
+#   rag     rag_service.send_message, called from N threads in this process
+# with the chat API normally being benchmarks/fake_chat_api.py, so nothing
+# calls Gemini, OpenAI or Supabase.
+#
+# Reports throughput (turns/s, tokens/s), p50/p99/max latency and time to first
+# token, errors, replies cut short, and lost writes: turns that succeeded but
+# whose prompt is missing from the chat history the app serves back afterwards.
+#
+# Run (three terminals):
+#   python -m benchmarks.fake_chat_api --port 3000 --first-token-delay 0.3 --token-rate 100
+#   cd Django/omar_gpt && python manage.py runserver --noreload
+#   python -m benchmarks.load_test django --users 20 --turns 5
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from benchmarks.common import environment, log, peak_rss_mb, summarize
+from api_client import CHAT_API_URL, iter_sse_events
+
+
+class Turn:
+    def __init__(self, user, number, prompt):
+        self.user = user
+        self.number = number
+        self.prompt = prompt
+        self.chat_id = None
+        self.seconds = None
+        self.ttft = None
+        self.tokens = 0
+        self.error = None
+
+
+def fake_api_base(chat_url):
+    # http://localhost:3000/api/chat -> http://localhost:3000
+    parsed = urlparse(chat_url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+def iter_events(response):
+    """SSE "data:" payloads as they arrive.
+
+    iter_lines(chunk_size=None), as api_client.iter_sse_events uses it, waits for
+    the whole body when the server doesn't use chunked encoding (runserver
+    doesn't), which would make every time to first token equal the full latency.
+    """
+    read1 = getattr(response.raw, "read1", None)
+    if read1 is None:
+        # urllib3 < 2
+        yield from iter_sse_events(response)
+        return
+    buffer = b""
+    while True:
+        chunk = read1(64 * 1024)
+        if not chunk:
+            break
+        buffer += chunk.replace(b"\r\n", b"\n")
+        while b"\n\n" in buffer:
+            block, buffer = buffer.split(b"\n\n", 1)
+            data = [line[5:].lstrip() for line in block.decode("utf-8").split("\n") if line.startswith("data:")]
+            if data:
+                yield "\n".join(data)
+
+
+def fetch_json(url):
+    try:
+        response = requests.get(url, timeout=5)
+        response.raise_for_status()
+        return response.json()
+    except (requests.exceptions.RequestException, ValueError):
+        return None
+
+
+class DjangoUser:
+    """One browser-like session against the Django app."""
+
+    def __init__(self, base_url, mode, timeout):
+        self.base_url = base_url.rstrip("/")
+        self.mode = mode
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.chat_id = None
+        # The chat page sets the CSRF cookie the POSTs need
+        self.session.get(f"{self.base_url}/", timeout=timeout).raise_for_status()
+        self.csrf_token = self.session.cookies.get("csrftoken")
+
+    def headers(self):
+        return {"X-CSRFToken": self.csrf_token, "Referer": f"{self.base_url}/"}
+
+    def send(self, turn):
+        started = time.perf_counter()
+        if self.mode == "stream":
+            self._send_stream(turn, started)
+        else:
+            self._send_form(turn)
+        turn.seconds = time.perf_counter() - started
+        turn.chat_id = self.chat_id
+
+    def _send_stream(self, turn, started):
+        data = {"message": turn.prompt, "chat_id": self.chat_id or ""}
+        with self.session.post(f"{self.base_url}/stream/", data=data, headers=self.headers(),
+                               stream=True, timeout=self.timeout) as response:
+            if response.status_code != 200:
+                turn.error = f"HTTP {response.status_code}"
+                return
+            for event in map(json.loads, iter_events(response)):
+                if "content" in event:
+                    if turn.ttft is None:
+                        turn.ttft = time.perf_counter() - started
+                    turn.tokens += 1
+                elif "error" in event:
+                    turn.error = event["error"]
+                elif event.get("done"):
+                    self.chat_id = event.get("chatID") or self.chat_id
+
+    def _send_form(self, turn):
+        params = {"chat_id": self.chat_id} if self.chat_id else None
+        data = {"message": turn.prompt, "csrfmiddlewaretoken": self.csrf_token}
+        response = self.session.post(f"{self.base_url}/", params=params, data=data, headers=self.headers(),
+                                     allow_redirects=False, timeout=self.timeout)
+        if response.status_code in (301, 302):
+            chat_ids = parse_qs(urlparse(response.headers.get("Location", "")).query).get("chat_id")
+            if chat_ids:
+                self.chat_id = chat_ids[0]
+        elif response.status_code != 200:
+            turn.error = f"HTTP {response.status_code}"
+
+    def history(self, chat_id):
+        response = self.session.get(f"{self.base_url}/", params={"download_chat": chat_id}, timeout=self.timeout)
+        if response.status_code != 200 or "json" not in response.headers.get("Content-Type", ""):
+            return None
+        return response.json()
+
+
+class RagUser:
+    """rag_service.send_message as the Tk client calls it (one chat id per process, see rag_service)."""
+
+    def __init__(self, rag_service):
+        self.rag_service = rag_service
+
+    def send(self, turn):
+        started = time.perf_counter()
+
+        def on_token(text):
+            if turn.ttft is None:
+                turn.ttft = time.perf_counter() - started
+            turn.tokens += 1
+
+        reply = self.rag_service.send_message(turn.prompt, on_token=on_token)
+        turn.seconds = time.perf_counter() - started
+        if reply.startswith(("Error:", "Request failed:")) or reply == "No content in response.":
+            turn.error = reply.splitlines()[0]
+        turn.chat_id = self.rag_service.chat_session_id
+
+
+def run_user(user, number, turns):
+    results = []
+    for i in range(turns):
+        # Unique prompt per turn, so the history check can find each one
+        turn = Turn(number, i, f"load-test user {number} turn {i}: what is the water cycle? ما هي دورة الماء؟")
+        try:
+            user.send(turn)
+        except requests.exceptions.RequestException as e:
+            turn.error = str(e)
+        results.append(turn)
+    return results
+
+
+def count_lost_writes(users_turns):
+    """Turns reported successful whose prompt is not in the saved chat history."""
+    lost = 0
+    unchecked = 0
+    for user, turns in users_turns:
+        by_chat = {}
+        for turn in turns:
+            if turn.error is None:
+                by_chat.setdefault(turn.chat_id, []).append(turn.prompt)
+        for chat_id, prompts in by_chat.items():
+            history = user.history(chat_id) if chat_id else None
+            if history is None:
+                unchecked += len(prompts)
+                continue
+            saved = {message.get("content") for message in history if message.get("role") == "user"}
+            lost += sum(1 for prompt in prompts if prompt not in saved)
+    return lost, unchecked
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test of the Django chat app or rag_service")
+    parser.add_argument("target", choices=["django", "rag"])
+    parser.add_argument("--output", "-o", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--users", type=int, default=10, help="concurrent sessions")
+    parser.add_argument("--turns", type=int, default=5, help="messages per session")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Django app (target django)")
+    parser.add_argument("--mode", choices=["stream", "form"], default="stream", help="Django endpoint to drive")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--chat-api", default=CHAT_API_URL, help="chat API the app talks to (for /config and /stats)")
+    args = parser.parse_args()
+
+    fake_base = fake_api_base(args.chat_api)
+    fake_config = fetch_json(f"{fake_base}/config")
+    if fake_config is not None:
+        requests.post(f"{fake_base}/stats/reset", timeout=5)
+    else:
+        log(f"⚠️ No fake chat API at {fake_base} (config / upstream stats not reported)")
+
+    if args.target == "django":
+        make_user = lambda: DjangoUser(args.url, args.mode, args.timeout)
+        quiet = contextlib.nullcontext()
+    else:
+        import rag_service
+        rag_service.chat_session_id = None
+        make_user = lambda: RagUser(rag_service)
+        # send_message prints every payload and reply
+        quiet = contextlib.redirect_stdout(io.StringIO())
+
+    try:
+        users = [make_user() for _ in range(args.users)]
+    except requests.exceptions.RequestException as e:
+        log(f"❌ Could not open a session on {args.url}: {e}")
+        sys.exit(1)
+
+    log(f"Load test: {args.users} users x {args.turns} turns against {args.target}")
+    with quiet, ThreadPoolExecutor(max_workers=args.users) as pool:
+        started = time.perf_counter()
+        futures = [pool.submit(run_user, user, number, args.turns) for number, user in enumerate(users)]
+        users_turns = [(user, future.result()) for user, future in zip(users, futures)]
+        wall = time.perf_counter() - started
+
+    turns = [turn for _, user_turns in users_turns for turn in user_turns]
+    ok = [turn for turn in turns if turn.error is None]
+    expected_tokens = fake_config.get("tokens") if fake_config else None
+    short = sum(1 for turn in ok if expected_tokens is not None and turn.tokens < expected_tokens)
+    if args.target == "django":
+        lost, unchecked = count_lost_writes(users_turns)
+    else:
+        # rag_service keeps nothing on disk
+        lost, unchecked = None, None
+
+    errors = {}
+    for turn in turns:
+        if turn.error is not None:
+            errors[turn.error[:80]] = errors.get(turn.error[:80], 0) + 1
+
+    report = {
+        "target": args.target,
+        "mode": args.mode if args.target == "django" else None,
+        "users": args.users,
+        "turns_per_user": args.turns,
+        "environment": environment(),
+        "fake_chat_api": fake_config,
+        "wall_seconds": round(wall, 3),
+        "turns": len(turns),
+        "succeeded": len(ok),
+        "failed": len(turns) - len(ok),
+        "errors": errors,
+        "short_replies": short,
+        "lost_writes": lost,
+        "unchecked_writes": unchecked,
+        "turns_per_second": round(len(ok) / wall, 2) if wall else None,
+        "tokens_per_second": round(sum(turn.tokens for turn in ok) / wall, 1) if wall else None,
+        "latency": summarize([turn.seconds for turn in ok if turn.seconds is not None]),
+        "time_to_first_token": summarize([turn.ttft for turn in ok if turn.ttft is not None]),
+        "upstream": fetch_json(f"{fake_base}/stats") if fake_config is not None else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    log(f"✅ {len(ok)}/{len(turns)} turns ok, {report['turns_per_second']} turns/s, "
+        f"p99 {report['latency'].get('p99_ms')} ms, lost writes: {lost}")
+
+
+if __name__ == "__main__":
+    main()
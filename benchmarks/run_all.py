@@ -0,0 +1,59 @@
+# Filename: benchmarks/run_all.py
+#
+# Runs every benchmark suite in its own process (so each one's peak RSS is its
+# own) and writes one combined JSON report, by default to
+# benchmarks/results/<commit>-<time>.json. Compare two runs with
+# python -m benchmarks.compare old.json new.json
+#
+# Run: python -m benchmarks.run_all [--quick] [--suites sessions retrieval] [--output report.json]
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.common import REPO_ROOT, argument_parser, environment, log
+
+SUITES = ["ocr", "sessions", "retrieval"]
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+
+
+def run_suite(suite, quick=False, repeat=None):
+    command = [sys.executable, "-m", f"benchmarks.bench_{suite}"]
+    if quick:
+        command.append("--quick")
+    if repeat:
+        command += ["--repeat", str(repeat)]
+    started = time.perf_counter()
+    completed = subprocess.run(command, cwd=REPO_ROOT, stdout=subprocess.PIPE, text=True)
+    seconds = round(time.perf_counter() - started, 2)
+    if completed.returncode != 0:
+        log(f"❌ {suite} failed (exit code {completed.returncode})")
+        return {"suite": suite, "error": f"exit code {completed.returncode}", "seconds": seconds}
+    report = json.loads(completed.stdout)
+    log(f"✅ {suite} done in {seconds} s")
+    return {"suite": suite, "seconds": seconds, "results": report["results"]}
+
+
+def main():
+    parser = argument_parser("Run all benchmark suites")
+    parser.set_defaults(repeat=None)
+    parser.add_argument("--suites", nargs="+", choices=SUITES, default=SUITES)
+    args = parser.parse_args()
+
+    env = environment()
+    report = {"environment": env, "suites": [run_suite(suite, args.quick, args.repeat) for suite in args.suites]}
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{env['commit'] or 'nogit'}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    log(f"📄 Report: {output}")
+
+
+if __name__ == "__main__":
+    main()
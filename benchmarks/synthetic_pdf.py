@@ -0,0 +1,94 @@
+# Filename: benchmarks/synthetic_pdf.py
+#
+# Scanned-looking multi-page PDFs (one rendered image per page, no text layer)
+# in English, Arabic or both, for the OCR benchmark. Same seed = same bytes.
+#
+# Run: python -m benchmarks.synthetic_pdf out.pdf --pages 5 --language mixed
+
+import argparse
+import os
+import random
+
+import arabic_reshaper
+from bidi.algorithm import get_display
+from PIL import Image, ImageDraw, ImageFont
+
+# A4 at 150 DPI
+PAGE_SIZE = (1240, 1754)
+DPI = 150
+MARGIN = 100
+FONT_SIZE = 28
+LINES_PER_PAGE = 30
+
+# Any TTF with Arabic glyphs works; BENCH_FONT overrides
+FONT_CANDIDATES = [
+    os.getenv("BENCH_FONT"),
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+    "/Library/Fonts/Arial Unicode.ttf",
+    "C:/Windows/Fonts/arial.ttf",
+]
+
+ENGLISH_SENTENCES = [
+    "The river carries water from the mountains to the sea.",
+    "Students read the third chapter before the lesson.",
+    "Evaporation and condensation form the water cycle.",
+    "The market opens early on the day of the harvest.",
+    "Ships crossed the desert sea along the old trade routes.",
+]
+ARABIC_SENTENCES = [
+    "يحمل النهر الماء من الجبال إلى البحر.",
+    "قرأ الطلاب الفصل الثالث قبل الدرس.",
+    "التبخر والتكاثف يكونان دورة الماء.",
+    "يفتح السوق مبكرا في يوم الحصاد.",
+    "عبرت السفن البحر على طرق التجارة القديمة.",
+]
+
+
+def load_font(size=FONT_SIZE):
+    for path in FONT_CANDIDATES:
+        if path and os.path.exists(path):
+            return ImageFont.truetype(path, size)
+    return ImageFont.load_default()
+
+
+def render_page(lines, font):
+    page = Image.new("L", PAGE_SIZE, 255)
+    draw = ImageDraw.Draw(page)
+    line_height = int(FONT_SIZE * 1.6)
+    for i, (text, rtl) in enumerate(lines):
+        y = MARGIN + i * line_height
+        if rtl:
+            # Shaped and visually ordered: PIL without libraqm can't do either itself
+            text = get_display(arabic_reshaper.reshape(text))
+            width = draw.textlength(text, font=font)
+            draw.text((PAGE_SIZE[0] - MARGIN - width, y), text, font=font, fill=0)
+        else:
+            draw.text((MARGIN, y), text, font=font, fill=0)
+    return page
+
+
+def make_pdf(path, pages=5, language="mixed", seed=0):
+    """Write a pages-long scanned-style PDF; language is "en", "ar" or "mixed"."""
+    rng = random.Random(seed)
+    font = load_font()
+    images = []
+    for _ in range(pages):
+        lines = []
+        for _ in range(LINES_PER_PAGE):
+            rtl = language == "ar" or (language == "mixed" and rng.random() < 0.5)
+            lines.append((rng.choice(ARABIC_SENTENCES if rtl else ENGLISH_SENTENCES), rtl))
+        images.append(render_page(lines, font))
+    images[0].save(path, "PDF", resolution=DPI, save_all=True, append_images=images[1:])
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic scanned PDF")
+    parser.add_argument("path")
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--language", choices=["en", "ar", "mixed"], default="mixed")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    make_pdf(args.path, args.pages, args.language, args.seed)
+    print(f"✅ {args.path}: {args.pages} pages ({args.language})")
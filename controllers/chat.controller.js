@@ -17,6 +17,13 @@ export const openSourceRAGModelChat = async (req, res) => {
     console.log("Chat ID:", chatID);
     console.log("System Prompt:", message);
 
+    // Headers go out before retrieval and the model's first token, so a client
+    // that cancels while waiting has a response it can close
+    res.setHeader("Content-Type", "text/event-stream");
+    res.setHeader("Cache-Control", "no-cache");
+    res.setHeader("Connection", "keep-alive");
+    res.flushHeaders();
+
     let fileContent = "";
     fileContent = await processUserMessage(message, files, chatID);
 
@@ -32,9 +39,6 @@ export const openSourceRAGModelChat = async (req, res) => {
     );
 
     let assistantMessageContentString = "";
-    res.setHeader("Content-Type", "text/event-stream");
-    res.setHeader("Cache-Control", "no-cache");
-    res.setHeader("Connection", "keep-alive");
 
     for await (const chunk of assistantMessageContent) {
       const contentChunk = chunk.choices[0]?.delta?.content || "";
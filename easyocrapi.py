@@ -1,50 +1,236 @@
 # Filename: easyocrapi.py
 
-from fastapi import FastAPI, File, UploadFile
-from fastapi.responses import JSONResponse
-import easyocr
-import tempfile
-from pdf2image import convert_from_path
+from typing import Optional
+
+from fastapi import Depends, FastAPI, File, Form, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+import json
+import logging
+import time
 import os
 
+from ocr_cache import OcrCache, document_key
+from ocr_fetch import DocumentTooLarge, FetchError, fetch_document, spool_stream, spool_upload
+from ocr_jobs import DONE, OcrJobQueue
+from ocr_pipeline import cached_pages, extract_pdf_pages, iter_page_texts, join_pages, page_report
+from ocr_preprocess import InvalidOptions, make_options, options_key
+import ocr_reader
+from ocr_reader import get_reader
+import tracing
+
+logger = logging.getLogger(__name__)
+
 app = FastAPI()
+# Request ids + "http" spans, see tracing.py; GET /metrics exposes them
+app.middleware("http")(tracing.http_middleware)
+
+# OCR results of previously seen documents/pages
+cache = OcrCache()
+
+# Worker processes for /jobs/ (started on the first submitted job)
+jobs = OcrJobQueue(cache)
+
+@app.on_event("startup")
+def load_reader():
+    # EasyOCR is loaded lazily / in the background (OCR_WARMUP), see ocr_reader.py
+    ocr_reader.warm_up()
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    if ocr_reader.is_ready():
+        return {"ready": True, "device": getattr(get_reader(), "device", None)}
+    if ocr_reader.load_error() is None:
+        # OCR_WARMUP=lazy: nothing has asked for the reader yet, so the probe starts loading it
+        ocr_reader.load_in_background()
+    return JSONResponse(status_code=503, content={"ready": False, "error": ocr_reader.load_error()})
 
-# Initialize EasyOCR
-reader = easyocr.Reader(["ar", "en"], gpu=True)  # Arabic and English
+async def receive_document(request, file, url, options):
+    """The request's PDF, as (scratch file path, sha256, cached page texts or None).
+
+    The PDF comes as a multipart "file", as a raw application/pdf body, or as a
+    "url" this service downloads itself (so the caller never has to). Either way
+    it is streamed to disk once, hashed on the way; the caller deletes the file.
+    If the texts are cached the file is already gone and the path is None.
+    """
+    if url:
+        path, digest = await run_in_threadpool(fetch_document, url, cache)
+    elif file is not None:
+        path, digest = await run_in_threadpool(spool_upload, file.file)
+    elif request.headers.get("content-type", "").split(";")[0].strip() == "application/pdf":
+        path, digest = await spool_stream(request.stream())
+    else:
+        raise ValueError("Send the PDF as a file, as an application/pdf body, or its url")
+    logger.debug("Received PDF %s (%s)", digest[:12], url or "upload")
+
+    texts = cache.get_document(document_key(digest, options_key(options)))
+    if texts is None and path is None:
+        # Unchanged since the last fetch (304), but its OCR result was evicted since
+        path, digest = await run_in_threadpool(fetch_document, url, cache, False)
+    elif texts is not None and path is not None:
+        os.unlink(path)
+        path = None
+    return path, digest, texts
+
+def error_response(e):
+    if isinstance(e, DocumentTooLarge):
+        status = 413
+    elif isinstance(e, ValueError):
+        status = 400
+    elif isinstance(e, FetchError):
+        status = 502
+    else:
+        status = 500
+    return JSONResponse(status_code=status, content={"status": "error", "message": str(e)})
+
+@app.exception_handler(InvalidOptions)
+async def invalid_options(request, e):
+    # Raised by the ocr_options dependency, before the endpoint's own error handling
+    return error_response(e)
+
+def ocr_options(
+    preprocess: Optional[bool] = Form(None),
+    target_text_height: Optional[int] = Form(None),
+    min_dpi: Optional[int] = Form(None),
+    max_dpi: Optional[int] = Form(None),
+):
+    # Per-request preprocessing overrides, see ocr_preprocess.DEFAULT_OPTIONS
+    return make_options(preprocess=preprocess, target_text_height=target_text_height, min_dpi=min_dpi, max_dpi=max_dpi)
 
 @app.post("/extract-text/")
-async def extract_text(file: UploadFile = File(...)):
+async def extract_text(
+    request: Request,
+    file: Optional[UploadFile] = File(None),
+    url: Optional[str] = Form(None),
+    options: dict = Depends(ocr_options),
+):
     try:
-        # Save the uploaded PDF temporarily
-        print("Saving PDF...")
-        temp_pdf = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-        content = await file.read()
-        temp_pdf.write(content)
-        temp_pdf.close()
-
-        # Convert PDF to images
-        images = convert_from_path(temp_pdf.name)
-
-        extracted_text = ""
-
-        for img in images:
-            # Save each image temporarily
-            print("Processing new page...")
-            temp_img = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-            img.save(temp_img.name, "PNG")
-
-            # OCR on each page image
-            result = reader.readtext(temp_img.name, detail=0, paragraph=True)
-            extracted_text += "\n".join(result) + "\n"
-            print(f"Extracted text from page: {extracted_text.strip()}")
-            # Cleanup temp image
-            temp_img.close()
-            os.unlink(temp_img.name)
-
-        # Cleanup temp PDF
-        os.unlink(temp_pdf.name)
-
-        return JSONResponse(content={"status": "success", "extracted_text": extracted_text.strip()})
+        temp_pdf_path, digest, texts = await receive_document(request, file, url, options)
+        if texts is not None:
+            return JSONResponse(content={
+                "status": "success",
+                "cached": True,
+                "extracted_text": join_pages(texts),
+                **page_report(cached_pages(texts)),
+            })
+
+        try:
+            # Use the text layer where possible, rasterize and OCR the rest in parallel
+            # (off the event loop, so other requests keep being served meanwhile)
+            pages = await run_in_threadpool(lambda: extract_pdf_pages(get_reader(), temp_pdf_path, cache, options))
+        finally:
+            # Cleanup temp PDF
+            os.unlink(temp_pdf_path)
+
+        texts = [page["text"] for page in pages]
+        cache.put_document(document_key(digest, options_key(options)), texts)
+        return JSONResponse(content={
+            "status": "success",
+            "cached": False,
+            "extracted_text": join_pages(texts),
+            **page_report(pages),
+        })
     
     except Exception as e:
-        return JSONResponse(status_code=500, content={"status": "error", "message": str(e)})
+        return error_response(e)
+
+@app.post("/extract-text/stream/")
+async def extract_text_stream(
+    request: Request,
+    file: Optional[UploadFile] = File(None),
+    url: Optional[str] = Form(None),
+    options: dict = Depends(ocr_options),
+):
+    # NDJSON: one {"page", "source", "text", "seconds", "elapsed", ...} line per page as soon as it
+    # is ready, then a final {"done": true, ...} line (or {"error": ...} if OCR failed)
+    try:
+        temp_pdf_path, digest, cached_texts = await receive_document(request, file, url, options)
+    except Exception as e:
+        return error_response(e)
+
+    def page_texts():
+        if cached_texts is not None:
+            yield from cached_pages(cached_texts)
+            return
+        texts = []
+        try:
+            for page in iter_page_texts(get_reader(), temp_pdf_path, cache=cache, options=options):
+                texts.append(page["text"])
+                yield page
+        finally:
+            os.unlink(temp_pdf_path)
+        cache.put_document(document_key(digest, options_key(options)), texts)
+
+    def generate():
+        started = last = time.perf_counter()
+        pages = []
+        try:
+            for page in page_texts():
+                now = time.perf_counter()
+                pages.append(page)
+                yield json.dumps({
+                    **page,
+                    "seconds": round(now - last, 3),
+                    "elapsed": round(now - started, 3),
+                }, ensure_ascii=False) + "\n"
+                last = now
+            report = page_report(pages)
+            yield json.dumps({
+                "done": True,
+                "pages": len(pages),
+                "sources": report["sources"],
+                "pixels": report["pixels"],
+                "cached": cached_texts is not None,
+                "elapsed": round(time.perf_counter() - started, 3),
+            }) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": str(e), "pages": len(pages)}) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(tracing.render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats/")
+async def cache_stats():
+    return cache.stats()
+
+@app.post("/jobs/")
+async def submit_job(
+    request: Request,
+    file: Optional[UploadFile] = File(None),
+    url: Optional[str] = Form(None),
+    options: dict = Depends(ocr_options),
+):
+    try:
+        temp_pdf_path, digest, texts = await receive_document(request, file, url, options)
+    except Exception as e:
+        return error_response(e)
+    # The job deletes the file when it is done with it
+    job_id = await run_in_threadpool(jobs.submit, temp_pdf_path, digest, options, texts)
+    return jobs.status(job_id)
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    status = jobs.status(job_id)
+    if status is None:
+        return JSONResponse(status_code=404, content={"status": "error", "message": "Unknown job"})
+    return status
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    status = jobs.status(job_id)
+    if status is None:
+        return JSONResponse(status_code=404, content={"status": "error", "message": "Unknown job"})
+    if status["status"] != DONE:
+        return JSONResponse(status_code=409, content={"status": status["status"], "message": status["error"] or "Job not finished"})
+    return {"status": "success", **jobs.result(job_id)}
+
+@app.on_event("shutdown")
+def shutdown_jobs():
+    jobs.shutdown()
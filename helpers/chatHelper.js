@@ -11,6 +11,14 @@ import { DocxLoader } from "@langchain/community/document_loaders/fs/docx";
 
 const embedding_model = new OpenAIEmbeddings({ apiKey: process.env.apiKey });
 
+// Local retrieval service (retrieval_service.py). When set, documents are
+// ingested there and searched there instead of scanning every Supabase row.
+const RETRIEVAL_API_URL = process.env.RETRIEVAL_API_URL;
+
+// OCR service (easyocrapi.py). PDFs are passed to it by URL: it downloads them
+// itself (streamed to disk, conditional re-fetches), so they are never buffered here.
+const OCR_API_URL = process.env.OCR_API_URL || "http://localhost:5000";
+
 const DEFAULT_SYSTEM_PROMPT =
   `You are Neena, an AI Assistant developed by Omar Khattab to help student know about certain topic` +
   `Now's Date and time:  ${new Date().toLocaleString()}`;
@@ -66,38 +74,25 @@ export async function analyzeAudioWithGroq(audioUrl, message) {
   }
 }
 
-import FormData from 'form-data';
-import fs from 'fs';
-import path from 'path';
+// .docx / .pptx loaders need the whole file in memory
+async function fetchBlob(url) {
+  const response = await axios.get(url, { responseType: "arraybuffer" });
+  return new Blob([response.data]);
+}
 
 async function fetchDocumentContent(url, chatId) {
   try {
-    const response = await axios.get(url, { responseType: "arraybuffer" });
-    const fileBlob = new Blob([response.data]);
-
     let loader;
 
     if (url.endsWith(".pdf")) {
       // ✨ New: use EasyOCR Python API instead of WebPDFLoader
       console.log("Using EasyOCR API to extract text from PDF:", url);
 
-      // Save PDF temporarily
-      const tempFilePath = path.join("./", `temp_${Date.now()}.pdf`);
-      fs.writeFileSync(tempFilePath, Buffer.from(await fileBlob.arrayBuffer()));
-
-      // Send to Python API
-      const formData = new FormData();
-      formData.append("file", fs.createReadStream(tempFilePath));
-
       const ocrResponse = await axios.post(
-        "http://localhost:5000/extract-text/", // Your Python API URL
-        formData,
-        { headers: formData.getHeaders() }
+        `${OCR_API_URL}/extract-text/`,
+        new URLSearchParams({ url })
       );
 
-      // Clean up the temp file
-      fs.unlinkSync(tempFilePath);
-
       const extractedText = ocrResponse.data.extracted_text;
 
       if (!extractedText || extractedText.trim() === "") {
@@ -114,10 +109,10 @@ async function fetchDocumentContent(url, chatId) {
       ];
     } 
     else if (url.endsWith(".docx")) {
-      loader = new DocxLoader(fileBlob);
+      loader = new DocxLoader(await fetchBlob(url));
     } 
     else if (url.endsWith(".pptx")) {
-      loader = new PPTXLoader(fileBlob);
+      loader = new PPTXLoader(await fetchBlob(url));
     } 
     else {
       throw new Error("Unsupported file type.");
@@ -206,12 +201,57 @@ function calculateKeywordRelevance(query, content) {
   return score;
 }
 
+// Whole text of a docx / pptx: the retrieval service chunks it itself
+async function fetchDocumentText(url) {
+  let loader;
+  if (url.endsWith(".docx")) {
+    loader = new DocxLoader(await fetchBlob(url));
+  } else if (url.endsWith(".pptx")) {
+    loader = new PPTXLoader(await fetchBlob(url));
+  } else {
+    throw new Error("Unsupported file type.");
+  }
+
+  const documents = await loader.load();
+  const text = documents.map((doc) => doc.pageContent || "").join("\n\n").trim();
+  if (!text) {
+    throw new Error("No content extracted from the document.");
+  }
+  return text;
+}
+
+async function ingestDocument(url, chatId) {
+  // One request per document, so the service's batching and dedupe see all of its chunks
+  const text = await fetchDocumentText(url);
+  const { data } = await axios.post(
+    `${RETRIEVAL_API_URL}/ingest/`,
+    new URLSearchParams({ chatId, url, text })
+  );
+  console.log("Document ingested:", data);
+}
+
+async function ingestPdf(url, chatId) {
+  // Just the URL: the OCR service behind the retrieval service fetches the PDF
+  const { data } = await axios.post(
+    `${RETRIEVAL_API_URL}/ingest/`,
+    new URLSearchParams({ chatId, url })
+  );
+  console.log("PDF ingested:", data);
+}
+
 export async function processAndEmbedDocuments(urls, chatId) {
-  const batchSize = 5; // Process in smaller batches
+  const batchSize = 100; // Texts per embeddings request / rows per insert
   const chunks = [];
 
   for (const url of urls) {
     try {
+      // Documents go to the retrieval service whole: it chunks, dedupes (by chunk
+      // hash), embeds in batches and stores them itself. PDFs are OCR'd there page
+      // by page, each page chunked/embedded while the next ones are being OCR'd
+      if (RETRIEVAL_API_URL) {
+        await (url.endsWith(".pdf") ? ingestPdf(url, chatId) : ingestDocument(url, chatId));
+        continue;
+      }
       const content = await fetchDocumentContent(url, chatId);
       chunks.push(...content);
     } catch (error) {
@@ -219,36 +259,71 @@ export async function processAndEmbedDocuments(urls, chatId) {
     }
   }
 
-  // Process in batches to avoid overwhelming the database
+  // One embeddings request and one bulk insert per batch
   for (let i = 0; i < chunks.length; i += batchSize) {
     const batch = chunks.slice(i, i + batchSize);
-    await Promise.all(
-      batch.map(async (chunk) => {
-        const embedding = await embedding_model.embedQuery(chunk.pageContent);
-
-        // Insert document into Supabase
-        const { data, error } = await supabaseClient.from("documents").insert({
-          chatId,
-          content_url: chunk.metadata.url,
-          content: chunk.pageContent,
-          metadata: chunk.metadata,
-          embedding,
-          created_at: new Date().toISOString(),
-        });
-
-        if (error) {
-          console.error("Error inserting into Supabase:", error.message);
-        } else {
-          console.log("Document inserted successfully:", data);
-        }
-      })
+    const embeddings = await embedding_model.embedDocuments(
+      batch.map((chunk) => chunk.pageContent)
     );
+
+    const rows = batch.map((chunk, index) => ({
+      chatId,
+      content_url: chunk.metadata.url,
+      content: chunk.pageContent,
+      metadata: chunk.metadata,
+      embedding: embeddings[index],
+      created_at: new Date().toISOString(),
+    }));
+
+    const { error } = await supabaseClient.from("documents").insert(rows);
+
+    if (error) {
+      console.error("Error inserting into Supabase:", error.message);
+    } else {
+      console.log(`${rows.length} documents inserted successfully`);
+    }
+  }
+}
+
+// Top documents from the local retrieval service (vector similarity fused with
+// BM25 keyword scores there), or null to fall back to Supabase
+async function searchRetrievalService(query, queryEmbedding, chatId, k) {
+  if (!RETRIEVAL_API_URL) return null;
+  try {
+    const { data } = await axios.post(`${RETRIEVAL_API_URL}/search/`, {
+      chatId,
+      embedding: queryEmbedding,
+      query,
+      k,
+    });
+    return data.results.length ? data.results : null;
+  } catch (error) {
+    console.error("Error searching the retrieval service:", error.message);
+    return null;
   }
 }
 
 
 export async function getRelevantDocuments(query, chatId, maxResults = 5) {
   try {
+    // Generate embedding for the query
+    const queryEmbedding = await embedding_model.embedQuery(query);
+
+    const results = await searchRetrievalService(
+      query,
+      queryEmbedding,
+      chatId,
+      maxResults
+    );
+    if (results) {
+      return results.map((doc) => ({
+        url: doc.url,
+        content: doc.content,
+        metadata: doc.metadata,
+        similarity: doc.similarity,
+      }));
+    }
+
     const { data: allDocuments, error: fetchError } = await supabaseClient
       .from("documents")
       .select("*")
@@ -257,9 +332,6 @@ export async function getRelevantDocuments(query, chatId, maxResults = 5) {
     if (fetchError) throw fetchError;
     if (!allDocuments?.length) return [];
 
-    // Generate embedding for the query
-    const queryEmbedding = await embedding_model.embedQuery(query);
-
     // Perform hybrid search using both semantic similarity and keyword matching
     const rankedResults = allDocuments.map((doc) => {
       const similarity = calculateCosineSimilarity(
@@ -737,6 +809,17 @@ export async function fetchExistingDocuments(chatId, message) {
 
 export async function hasDocumentsForChatId(chatId) {
   try {
+    if (RETRIEVAL_API_URL) {
+      try {
+        const { data } = await axios.get(
+          `${RETRIEVAL_API_URL}/documents/${encodeURIComponent(chatId)}`
+        );
+        if (data.count > 0) return true;
+      } catch (error) {
+        console.error("Error checking the retrieval service:", error.message);
+      }
+    }
+
     const { data, error } = await supabaseClient
       .from("documents")
       .select("id") // ✅ Only fetch IDs (not full document contents)
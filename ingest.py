@@ -0,0 +1,222 @@
+# Filename: ingest.py
+#
+# Document ingestion for the retrieval service: OCR'd pages -> chunks -> embeddings
+# -> vector store, with per-stage timings.
+#
+# - pages are chunked by text_chunker as they stream in, and every
+#   EMBEDDING_BATCH chunks are deduped, embedded and written while the OCR API
+#   is still working on the following pages
+# - chunks are hashed (vector_store.content_hash) and chunks the chat already has
+#   are skipped, as are repeats within the same document
+# - embeddings are cached by (model, chunk hash) in SQLite, so re-uploading a
+#   document, even to another chat, never embeds the same chunk twice
+# - what is left is embedded in batches of EMBEDDING_BATCH texts per API call
+#   and each batch is written to the store in one bulk append
+#
+# Embedding backends: "openai" (the embeddings API, same model the Node server
+# embeds queries with) or "hash" (deterministic, offline; for local runs).
+#
+# Usage: python ingest.py mybook.pdf <chat_id>   (OCRs through easyocrapi first)
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+from api_client import client
+from arabic_text import tokenize
+from text_chunker import chunk_pages
+from vector_store import content_hash
+
+load_dotenv()
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+EMBEDDING_BATCH = int(os.getenv("EMBEDDING_BATCH", 256))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3")
+OPENAI_EMBEDDINGS_URL = "https://api.openai.com/v1/embeddings"
+
+
+class HashEmbedder:
+    """Deterministic bag-of-words feature hashing: no network, same text -> same vector."""
+
+    def __init__(self, dim=1536):
+        self.dim = dim
+        self.name = f"hash-{dim}"
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for token in tokenize(text):
+                digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+                vectors[i, digest % self.dim] += 1.0 if digest >> 63 else -1.0
+        return vectors
+
+
+class OpenAIEmbedder:
+    def __init__(self, model=EMBEDDING_MODEL, batch_size=EMBEDDING_BATCH):
+        self.model = model
+        self.name = model
+        self.batch_size = batch_size
+        # The Node server reads the key from "apiKey" in the same .env
+        self.api_key = os.getenv("OPENAI_API_KEY") or os.getenv("apiKey")
+
+    def embed(self, texts):
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            response = client.post(
+                "embeddings",
+                OPENAI_EMBEDDINGS_URL,
+                json={"model": self.model, "input": texts[i:i + self.batch_size]},
+                headers={"Authorization": f"Bearer {self.api_key}"},
+            )
+            response.raise_for_status()
+            data = sorted(response.json()["data"], key=lambda item: item["index"])
+            vectors.extend(item["embedding"] for item in data)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def get_embedder(backend=EMBEDDING_BACKEND):
+    if backend == "hash":
+        return HashEmbedder()
+    if backend == "openai":
+        return OpenAIEmbedder()
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+
+class EmbeddingCache:
+    def __init__(self, path=EMBEDDING_CACHE_PATH):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._db.commit()
+
+    def get_many(self, model, hashes):
+        """{chunk hash: vector} for the hashes cached for model."""
+        found = {}
+        keys = {f"{model}:{h.hex()}": h for h in hashes}
+        key_list = list(keys)
+        with self._lock:
+            # SQLite caps the number of bound parameters per statement
+            for i in range(0, len(key_list), 500):
+                batch = key_list[i:i + 500]
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, vector in rows:
+                    found[keys[key]] = np.frombuffer(vector, dtype=np.float32)
+        return found
+
+    def put_many(self, model, items):
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(f"{model}:{h.hex()}", np.asarray(v, dtype=np.float32).tobytes()) for h, v in items],
+            )
+            self._db.commit()
+
+
+def ingest_chunks(store, chat_id, chunks, url=None, metadata=None, embedder=None, cache=None, batch_size=EMBEDDING_BATCH):
+    """Dedupe, embed and store chunks ({"text", "metadata"}) for a chat, batch_size at a time.
+
+    Returns counts, per-stage timings and throughput. The "chunk" stage includes
+    waiting for the pages, i.e. the OCR time when chunks come from a live stream.
+    """
+    embedder = embedder or get_embedder()
+    metadata = {**(metadata or {}), "chatId": chat_id, "url": url}
+    timings = {"chunk": 0.0, "dedupe": 0.0, "embed": 0.0, "write": 0.0}
+    counts = {"chunks": 0, "duplicates": 0, "cached": 0, "embedded": 0, "added": 0, "characters": 0}
+    started = time.perf_counter()
+    last = started
+    stored = store.hashes(chat_id)
+
+    def stage(name):
+        nonlocal last
+        now = time.perf_counter()
+        timings[name] += now - last
+        last = now
+
+    def flush(batch):
+        new_chunks = {}
+        for chunk in batch:
+            digest = content_hash(chunk["text"])
+            if digest not in stored and digest not in new_chunks:
+                new_chunks[digest] = chunk
+        stored.update(new_chunks)
+        stage("dedupe")
+
+        cached = cache.get_many(embedder.name, new_chunks) if cache else {}
+        missing = [digest for digest in new_chunks if digest not in cached]
+        embedded = {}
+        if missing:
+            embedded = dict(zip(missing, embedder.embed([new_chunks[digest]["text"] for digest in missing])))
+            if cache:
+                cache.put_many(embedder.name, embedded.items())
+        stage("embed")
+
+        if new_chunks:
+            store.add(
+                chat_id,
+                np.stack([cached[h] if h in cached else embedded[h] for h in new_chunks]),
+                [
+                    {"content": chunk["text"], "url": url, "metadata": {**metadata, **chunk["metadata"]}}
+                    for chunk in new_chunks.values()
+                ],
+            )
+        stage("write")
+
+        counts["duplicates"] += len(batch) - len(new_chunks)
+        counts["cached"] += len(new_chunks) - len(missing)
+        counts["embedded"] += len(missing)
+        counts["added"] += len(new_chunks)
+
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        counts["chunks"] += 1
+        counts["characters"] += len(chunk["text"])
+        if len(batch) >= batch_size:
+            stage("chunk")
+            flush(batch)
+            batch = []
+    stage("chunk")
+    if batch:
+        flush(batch)
+
+    seconds = time.perf_counter() - started
+    return {
+        **counts,
+        "embedder": embedder.name,
+        "timings": {name: round(value, 4) for name, value in timings.items()},
+        "seconds": round(seconds, 4),
+        "chunks_per_second": round(counts["chunks"] / seconds, 1) if seconds else None,
+        "chars_per_second": round(counts["characters"] / seconds, 1) if seconds else None,
+    }
+
+
+def ingest_pages(store, chat_id, pages, **kwargs):
+    """ingest_chunks() over page dicts ({"page", "text"}), chunked as they arrive."""
+    return ingest_chunks(store, chat_id, chunk_pages(pages), **kwargs)
+
+
+def ingest_text(store, chat_id, text, **kwargs):
+    """ingest_chunks() for text that isn't split into pages (counted as page 1)."""
+    return ingest_pages(store, chat_id, [{"page": 1, "text": text}], **kwargs)
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    from ocrclient import stream_pages
+    from vector_store import VectorStore
+
+    pdf_path, chat_id = sys.argv[1], sys.argv[2]
+    # Pages are chunked and embedded while the OCR API is still working on the next ones
+    report = ingest_pages(VectorStore(), chat_id, stream_pages(pdf_path), url=pdf_path, cache=EmbeddingCache())
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,101 @@
+# Filename: keyword_index.py
+#
+# Per-chat BM25 inverted index, built once when documents are ingested.
+# Every row's term frequencies are appended to terms.jsonl in the chat's vector
+# store folder; the in-memory postings are built from it once per process and
+# then only read the lines appended since. Scoring a query touches the postings
+# of its terms only, never the documents themselves.
+
+import json
+import math
+import os
+import threading
+from collections import Counter
+
+import numpy as np
+
+from arabic_text import tokenize
+
+TERMS_FILENAME = "terms.jsonl"
+
+# Standard BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+class _Postings:
+    def __init__(self):
+        # Bytes of terms.jsonl already loaded
+        self.position = 0
+        self.doc_lengths = []
+        # term -> ([rows], [term frequencies])
+        self.postings = {}
+
+
+class KeywordIndex:
+    def __init__(self, chat_dir):
+        """chat_dir(chat_id) -> folder the chat's index file lives in."""
+        self.chat_dir = chat_dir
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def path(self, chat_id):
+        return os.path.join(self.chat_dir(chat_id), TERMS_FILENAME)
+
+    def add(self, chat_id, first_row, texts):
+        """Index texts as rows first_row, first_row + 1, ... of the chat."""
+        lines = []
+        for row, text in enumerate(texts, start=first_row):
+            tokens = tokenize(text)
+            lines.append(json.dumps({"row": row, "length": len(tokens), "tf": Counter(tokens)}, ensure_ascii=False))
+        with open(self.path(chat_id), "a", encoding="utf-8") as f:
+            f.write("".join(line + "\n" for line in lines))
+
+    def _load(self, chat_id, count):
+        # Caller holds the lock
+        index = self._cache.get(chat_id)
+        if index is None or len(index.doc_lengths) > count:
+            index = self._cache[chat_id] = _Postings()
+        if len(index.doc_lengths) == count or not os.path.exists(self.path(chat_id)):
+            return index
+
+        with open(self.path(chat_id), "rb") as f:
+            f.seek(index.position)
+            for line in f:
+                if len(index.doc_lengths) >= count or not line.endswith(b"\n"):
+                    break
+                entry = json.loads(line)
+                index.doc_lengths.append(entry["length"])
+                for term, tf in entry["tf"].items():
+                    rows, tfs = index.postings.setdefault(term, ([], []))
+                    rows.append(entry["row"])
+                    tfs.append(tf)
+                index.position += len(line)
+        return index
+
+    def scores(self, chat_id, query, count):
+        """BM25 score of each of the chat's first count rows for query (zeros where no term matches)."""
+        scores = np.zeros(count, dtype=np.float32)
+        terms = set(tokenize(query))
+        if not count or not terms:
+            return scores
+
+        with self._lock:
+            index = self._load(chat_id, count)
+            doc_lengths = np.asarray(index.doc_lengths, dtype=np.float32)
+            postings = [index.postings[term] for term in terms if term in index.postings]
+
+        if not postings:
+            return scores
+        documents = len(doc_lengths)
+        length_norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths / max(doc_lengths.mean(), 1.0))
+        for rows, tfs in postings:
+            rows = np.asarray(rows, dtype=np.int64)
+            tfs = np.asarray(tfs, dtype=np.float32)
+            idf = math.log(1 + (documents - len(rows) + 0.5) / (len(rows) + 0.5))
+            scores[rows] += idf * tfs * (BM25_K1 + 1) / (tfs + length_norm[rows])
+        return scores
+
+    def forget(self, chat_id):
+        with self._lock:
+            self._cache.pop(chat_id, None)
@@ -0,0 +1,122 @@
+# Filename: ocr_cache.py
+#
+# Persistent, size-bounded OCR result cache (SQLite).
+# Documents are keyed by the SHA-256 of the uploaded bytes, pages by the SHA-256
+# of the rasterized page, so a re-upload returns instantly and a partially
+# changed document only OCRs the pages that changed.
+# Documents fetched by URL also keep their ETag / Last-Modified and hash here,
+# for conditional re-fetches (ocr_fetch.py).
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+OCR_CACHE_PATH = os.getenv("OCR_CACHE_PATH", "ocr_cache.sqlite3")
+OCR_CACHE_MAX_MB = float(os.getenv("OCR_CACHE_MAX_MB", 512))
+
+
+def document_hash(content, variant=None):
+    return document_key(hashlib.sha256(content).hexdigest(), variant)
+
+
+def document_key(digest, variant=None):
+    # variant tells apart results of the same bytes processed with different options
+    return f"{digest}:{variant}" if variant else digest
+
+
+def page_hash(page):
+    # Shape is part of the key so two pages with the same bytes but different sizes never collide
+    digest = hashlib.sha256(repr(page.shape).encode())
+    digest.update(page.tobytes())
+    return digest.hexdigest()
+
+
+class OcrCache:
+    def __init__(self, path=OCR_CACHE_PATH, max_bytes=int(OCR_CACHE_MAX_MB * 1024 * 1024)):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, kind TEXT NOT NULL, value TEXT NOT NULL,"
+            " size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        self._db.commit()
+        self._total_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        self.counters = {
+            "document_hits": 0, "document_misses": 0,
+            "page_hits": 0, "page_misses": 0,
+            "url_hits": 0, "url_misses": 0,
+        }
+
+    def _get(self, kind, key):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM entries WHERE key = ?", (f"{kind}:{key}",)).fetchone()
+            if row is None:
+                self.counters[f"{kind}_misses"] += 1
+                return None
+            self.counters[f"{kind}_hits"] += 1
+            self._db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), f"{kind}:{key}"))
+            self._db.commit()
+            return row[0]
+
+    def _put(self, kind, key, value):
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            old = self._db.execute("SELECT size FROM entries WHERE key = ?", (f"{kind}:{key}",)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, kind, value, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                (f"{kind}:{key}", kind, value, size, time.time()),
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        # Drop least recently used entries until we are back under the size limit
+        while self._total_bytes > self.max_bytes:
+            rows = self._db.execute("SELECT key, size FROM entries ORDER BY last_used LIMIT 64").fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._total_bytes -= size
+                if self._total_bytes <= self.max_bytes:
+                    break
+
+    def get_document(self, key):
+        value = self._get("document", key)
+        return json.loads(value) if value is not None else None
+
+    def put_document(self, key, pages):
+        self._put("document", key, json.dumps(pages, ensure_ascii=False))
+
+    def get_page(self, key):
+        return self._get("page", key)
+
+    def put_page(self, key, text):
+        self._put("page", key, text)
+
+    def get_url(self, url):
+        value = self._get("url", url)
+        return json.loads(value) if value is not None else None
+
+    def put_url(self, url, validators):
+        # {"etag", "last_modified", "digest"} of the last download of url
+        self._put("url", url, json.dumps(validators))
+
+    def stats(self):
+        with self._lock:
+            entries = self._db.execute("SELECT kind, COUNT(*) FROM entries GROUP BY kind").fetchall()
+            return {
+                **self.counters,
+                "entries": dict(entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
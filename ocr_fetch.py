@@ -0,0 +1,177 @@
+# Filename: ocr_fetch.py
+#
+# Gets a document onto local disk for easyocrapi.py exactly once, without ever
+# holding it in memory: multipart uploads are copied in chunks out of the
+# request's spooled file, raw application/pdf bodies and document URLs are
+# streamed straight into the scratch file. The bytes are hashed while they are
+# written (the OCR cache key) and refused past OCR_MAX_DOCUMENT_MB.
+# URL fetches are conditional: the ETag / Last-Modified of the last download
+# are kept in the OCR cache, and a 304 reuses the known hash with no transfer.
+# Document URLs come from clients, so every host (the first one and each
+# redirect target) is resolved and refused if it is not a public address, or
+# not in OCR_FETCH_ALLOWED_HOSTS when that is set. The check runs just before
+# the request; a DNS answer that changes in between is not caught.
+
+import hashlib
+import ipaddress
+import os
+import shutil
+import socket
+import tempfile
+from urllib.parse import urljoin, urlparse
+
+import requests
+
+import tracing
+
+OCR_MAX_DOCUMENT_MB = float(os.getenv("OCR_MAX_DOCUMENT_MB", 200))
+MAX_DOCUMENT_BYTES = int(OCR_MAX_DOCUMENT_MB * 1024 * 1024)
+# (connect, read) seconds for document downloads
+FETCH_TIMEOUT = (float(os.getenv("OCR_FETCH_CONNECT_TIMEOUT", 5)), float(os.getenv("OCR_FETCH_TIMEOUT", 60)))
+CHUNK_SIZE = 1024 * 1024
+MAX_REDIRECTS = 5
+# Comma-separated hostnames documents may be fetched from; empty = any public host
+ALLOWED_HOSTS = {h.strip().lower() for h in os.getenv("OCR_FETCH_ALLOWED_HOSTS", "").split(",") if h.strip()}
+# 1 = also fetch from private / loopback addresses (local development only)
+ALLOW_PRIVATE = os.getenv("OCR_FETCH_ALLOW_PRIVATE", "0") == "1"
+
+# Kept-alive connections to the document hosts (cloudinary, ...)
+session = requests.Session()
+
+
+class DocumentTooLarge(ValueError):
+    pass
+
+
+class FetchError(Exception):
+    pass
+
+
+class BlockedURL(ValueError):
+    pass
+
+
+class HashingWriter:
+    """File-like sink that hashes and counts what goes through it, up to max_bytes."""
+
+    def __init__(self, f, max_bytes):
+        self.f = f
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise DocumentTooLarge(f"Document is larger than {OCR_MAX_DOCUMENT_MB:g} MB")
+        self.sha256.update(data)
+        self.f.write(data)
+
+
+def spool(copy, max_bytes=MAX_DOCUMENT_BYTES):
+    """Scratch PDF filled by copy(writer): (path, sha256). The caller deletes the file."""
+    temp_pdf = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
+    try:
+        with temp_pdf:
+            writer = HashingWriter(temp_pdf, max_bytes)
+            copy(writer)
+    except BaseException:
+        os.unlink(temp_pdf.name)
+        raise
+    return temp_pdf.name, writer.sha256.hexdigest()
+
+
+def spool_upload(fileobj, max_bytes=MAX_DOCUMENT_BYTES):
+    # UploadFile.file: Starlette already spooled the multipart part (memory, then disk)
+    fileobj.seek(0)
+    return spool(lambda writer: shutil.copyfileobj(fileobj, writer, CHUNK_SIZE), max_bytes)
+
+
+async def spool_stream(chunks, max_bytes=MAX_DOCUMENT_BYTES):
+    """spool() for an async iterator of bytes (a raw request body)."""
+    temp_pdf = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
+    try:
+        with temp_pdf:
+            writer = HashingWriter(temp_pdf, max_bytes)
+            async for chunk in chunks:
+                writer.write(chunk)
+    except BaseException:
+        os.unlink(temp_pdf.name)
+        raise
+    return temp_pdf.name, writer.sha256.hexdigest()
+
+
+def check_url(url):
+    """Raise BlockedURL unless url is http(s) on an allowed host that resolves only to public addresses."""
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise BlockedURL("Document URL must be http(s)")
+    host = parsed.hostname.lower()
+    if ALLOWED_HOSTS and host not in ALLOWED_HOSTS:
+        raise BlockedURL(f"Fetching documents from {host} is not allowed")
+    if ALLOW_PRIVATE:
+        return
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)}
+    except socket.gaierror as e:
+        raise FetchError(f"Fetching the document failed: cannot resolve {host}") from e
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%")[0])
+        ip = getattr(ip, "ipv4_mapped", None) or ip
+        if not ip.is_global or ip.is_multicast:
+            raise BlockedURL(f"Fetching documents from {host} is not allowed (private address)")
+
+
+def open_document(url, headers):
+    """GET url as a stream, following redirects by hand so that each hop is checked."""
+    for _ in range(MAX_REDIRECTS + 1):
+        check_url(url)
+        response = session.get(url, headers=headers, stream=True, timeout=FETCH_TIMEOUT, allow_redirects=False)
+        if not response.is_redirect:
+            return response
+        response.close()
+        url = urljoin(url, response.headers["Location"])
+    raise FetchError(f"Fetching the document failed: more than {MAX_REDIRECTS} redirects")
+
+
+def fetch_document(url, cache=None, conditional=True, max_bytes=MAX_DOCUMENT_BYTES):
+    """Stream url to a scratch PDF: (path, sha256), or (None, sha256) when the
+    server says the copy seen last time is still current (HTTP 304)."""
+    check_url(url)
+    known = cache.get_url(url) if cache is not None and conditional else None
+    headers = {}
+    if known:
+        if known.get("etag"):
+            headers["If-None-Match"] = known["etag"]
+        if known.get("last_modified"):
+            headers["If-Modified-Since"] = known["last_modified"]
+
+    with tracing.span("fetch_document"):
+        try:
+            with open_document(url, headers) as response:
+                if response.status_code == 304 and known:
+                    tracing.increment("fetch_not_modified_total")
+                    return None, known["digest"]
+                if response.status_code != 200:
+                    raise FetchError(f"Fetching the document failed: HTTP {response.status_code}")
+                length = response.headers.get("Content-Length", "")
+                if length.isdigit() and int(length) > max_bytes:
+                    raise DocumentTooLarge(f"Document is larger than {OCR_MAX_DOCUMENT_MB:g} MB")
+
+                def copy(writer):
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        writer.write(chunk)
+
+                path, digest = spool(copy, max_bytes)
+                validators = {
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                }
+        except requests.exceptions.RequestException as e:
+            raise FetchError(f"Fetching the document failed: {e}") from e
+
+    tracing.increment("fetch_bytes_total", os.path.getsize(path))
+    if cache is not None and any(validators.values()):
+        cache.put_url(url, {**validators, "digest": digest})
+    return path, digest
@@ -0,0 +1,195 @@
+# Filename: ocr_jobs.py
+#
+# Job queue for OCR: submit() returns a job id right away and the pages are OCR'd
+# by a pool of worker processes, each with its own preloaded EasyOCR reader.
+# Documents are split into batches of OCR_BATCH_PAGES pages, so pages from
+# several uploads interleave across the pool instead of queueing behind each other.
+
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from ocr_cache import OcrCache, document_key
+from ocr_pipeline import (
+    SOURCE_TEXT_LAYER, OCR_TEXT_LAYER,
+    cached_pages, count_pages, join_pages, ocr_page_cached, page_report,
+)
+from ocr_preprocess import make_options, options_key, rasterize_pages
+from pdf_text import usable_text_layer
+
+OCR_PROCESSES = int(os.getenv("OCR_PROCESSES", os.cpu_count() or 1))
+OCR_BATCH_PAGES = int(os.getenv("OCR_BATCH_PAGES", 4))
+# Finished jobs kept around for /jobs/{id}/result
+OCR_JOBS_KEEP = int(os.getenv("OCR_JOBS_KEEP", 100))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+ERROR = "error"
+
+# Reader and page cache owned by each worker process
+_worker_reader = None
+_worker_cache = None
+
+
+def _init_worker(processes, cache_path=None, cache_max_bytes=None):
+    global _worker_reader, _worker_cache
+    from ocr_reader import create_reader
+    # The pool's processes split the cores between their torch thread pools
+    _worker_reader = create_reader(workers=processes)
+    if cache_path is not None:
+        # Same SQLite file as the API's cache (WAL, so the processes don't block each other):
+        # pages OCR'd here are reused by later jobs and by /extract-text/
+        _worker_cache = OcrCache(cache_path, cache_max_bytes)
+
+
+def _ocr_batch(pdf_path, page_numbers, options):
+    pages = []
+    for page_number, (page, info) in zip(page_numbers, rasterize_pages(pdf_path, page_numbers, options)):
+        text, source = ocr_page_cached(_worker_reader, page, _worker_cache)
+        pages.append({"page": page_number, "text": text, "source": source, **info})
+    return pages
+
+
+class OcrJobQueue:
+    def __init__(self, cache=None, processes=OCR_PROCESSES, batch_pages=OCR_BATCH_PAGES):
+        self.cache = cache
+        self.processes = processes
+        self.batch_pages = batch_pages
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _get_pool(self):
+        # Started on first use so importing the API doesn't spawn (and load) every worker
+        with self._lock:
+            if self._pool is None:
+                cache_args = (self.cache.path, self.cache.max_bytes) if self.cache is not None else ()
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.processes, *cache_args),
+                )
+            return self._pool
+
+    def submit(self, pdf_path, digest, options=None, texts=None):
+        """Queue a PDF for OCR and return its job id. Blocks only for the text-layer pass.
+
+        The job owns pdf_path (a scratch file, see ocr_fetch) and deletes it when done.
+        texts are the document's page texts if the caller found them in the cache
+        (easyocrapi.receive_document looks them up, so they aren't looked up again
+        here); pdf_path may then be None.
+        """
+        options = options or make_options()
+        job_id = str(uuid.uuid4())
+        job = {
+            "job_id": job_id,
+            "status": QUEUED,
+            "created": time.time(),
+            "finished": None,
+            "pages_total": None,
+            "pages_done": 0,
+            "error": None,
+            "result": None,
+        }
+        with self._lock:
+            self.jobs[job_id] = job
+            self._forget_old_jobs()
+
+        doc_key = document_key(digest, options_key(options))
+        if texts is not None:
+            if pdf_path is not None:
+                os.unlink(pdf_path)
+            job["pages_total"] = job["pages_done"] = len(texts)
+            self._finish(job, cached_pages(texts))
+            return job_id
+        if pdf_path is None:
+            self._fail(job, "Document is no longer cached, send it again")
+            return job_id
+
+        try:
+            total_pages = count_pages(pdf_path)
+            native = usable_text_layer(pdf_path, total_pages) if OCR_TEXT_LAYER else [None] * total_pages
+        except Exception as e:
+            os.unlink(pdf_path)
+            self._fail(job, e)
+            return job_id
+
+        pages = [
+            {"page": number, "text": text, "source": SOURCE_TEXT_LAYER} if text is not None else None
+            for number, text in enumerate(native, start=1)
+        ]
+        ocr_page_numbers = [number for number, text in enumerate(native, start=1) if text is None]
+        job["pages_total"] = total_pages
+        job["pages_done"] = total_pages - len(ocr_page_numbers)
+
+        batches = [
+            ocr_page_numbers[start:start + self.batch_pages]
+            for start in range(0, len(ocr_page_numbers), self.batch_pages)
+        ]
+        if not batches:
+            os.unlink(pdf_path)
+            self._finish(job, pages, doc_key)
+            return job_id
+
+        job["status"] = RUNNING
+        remaining = [len(batches)]
+
+        def on_batch_done(future, page_numbers):
+            with self._lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+                if job["status"] == RUNNING:
+                    try:
+                        for page in future.result():
+                            pages[page["page"] - 1] = page
+                        job["pages_done"] += len(page_numbers)
+                    except Exception as e:
+                        self._fail(job, e)
+            if last:
+                os.unlink(pdf_path)
+                if job["status"] == RUNNING:
+                    self._finish(job, pages, doc_key)
+
+        pool = self._get_pool()
+        for page_numbers in batches:
+            future = pool.submit(_ocr_batch, pdf_path, page_numbers, options)
+            future.add_done_callback(lambda future, page_numbers=page_numbers: on_batch_done(future, page_numbers))
+        return job_id
+
+    def _finish(self, job, pages, doc_key=None):
+        texts = [page["text"] for page in pages]
+        if doc_key is not None and self.cache is not None:
+            self.cache.put_document(doc_key, texts)
+        job["result"] = {"extracted_text": join_pages(texts), **page_report(pages)}
+        job["finished"] = time.time()
+        job["status"] = DONE
+
+    def _fail(self, job, error):
+        job["error"] = str(error)
+        job["finished"] = time.time()
+        job["status"] = ERROR
+
+    def _forget_old_jobs(self):
+        finished = [job for job in self.jobs.values() if job["finished"] is not None]
+        finished.sort(key=lambda job: job["finished"])
+        for job in finished[:max(0, len(finished) - OCR_JOBS_KEEP)]:
+            del self.jobs[job["job_id"]]
+
+    def status(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        return {key: value for key, value in job.items() if key != "result"}
+
+    def result(self, job_id):
+        job = self.jobs.get(job_id)
+        return job["result"] if job is not None else None
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,141 @@
+# Filename: ocr_pipeline.py
+#
+# Page-parallel OCR for PDFs. Pages are rasterized a few at a time and the
+# page arrays go straight to EasyOCR, so nothing is written to disk and at
+# most OCR_CHUNK_PAGES rasterized pages are held in memory at once.
+# Pages with a usable embedded text layer are never rasterized at all, and the
+# rest go through ocr_preprocess (adaptive DPI, grayscale, crop) first.
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pdf2image import pdfinfo_from_path
+
+from ocr_cache import page_hash
+from ocr_preprocess import rasterize_pages
+from ocr_reader import OCR_WORKERS
+from pdf_text import usable_text_layer
+import tracing
+
+# Number of pages rasterized per chunk: this is the memory ceiling of the pipeline
+OCR_CHUNK_PAGES = int(os.getenv("OCR_CHUNK_PAGES", max(OCR_WORKERS, 4)))
+
+# Set to 0 to always OCR, even pages that have an embedded text layer
+OCR_TEXT_LAYER = os.getenv("OCR_TEXT_LAYER", "1") == "1"
+
+# Where a page's text came from
+SOURCE_TEXT_LAYER = "text"
+SOURCE_CACHE = "cache"
+SOURCE_OCR = "ocr"
+SOURCE_BLANK = "blank"
+
+# OCR_WORKERS pages OCR'd at once with the shared reader (EasyOCR/torch release the
+# GIL while running); the reader caps torch's own threads to match, see ocr_reader
+_executor = ThreadPoolExecutor(max_workers=OCR_WORKERS, thread_name_prefix="ocr")
+
+
+def count_pages(pdf_path):
+    return int(pdfinfo_from_path(pdf_path)["Pages"])
+
+
+def iter_page_chunks(pdf_path, page_numbers, chunk_pages=OCR_CHUNK_PAGES, options=None):
+    """Yield ([page numbers], [(page array or None, raster info)]) for chunks of at most chunk_pages pages."""
+    for start in range(0, len(page_numbers), chunk_pages):
+        chunk = page_numbers[start:start + chunk_pages]
+        with tracing.span("rasterize"):
+            pages = rasterize_pages(pdf_path, chunk, options)
+        yield chunk, pages
+
+
+def ocr_page(reader, page):
+    result = reader.readtext(page, detail=0, paragraph=True)
+    return "\n".join(result)
+
+
+def ocr_page_cached(reader, page, cache=None):
+    """Return (text, source) for a rasterized page (None for a blank page)."""
+    if page is None:
+        return "", SOURCE_BLANK
+    if cache is None:
+        return ocr_page(reader, page), SOURCE_OCR
+    key = page_hash(page)
+    text = cache.get_page(key)
+    if text is not None:
+        return text, SOURCE_CACHE
+    text = ocr_page(reader, page)
+    cache.put_page(key, text)
+    return text, SOURCE_OCR
+
+
+def ocr_page_traced(reader, page, cache=None, request_id=None):
+    # Runs on a pool thread, where the request id contextvar isn't set: it is passed in
+    started = time.perf_counter()
+    text, source = ocr_page_cached(reader, page, cache)
+    tracing.record("ocr_page", time.perf_counter() - started, request_id=request_id, source=source)
+    return text, source
+
+
+def iter_ocr_pages(reader, pdf_path, page_numbers, chunk_pages=OCR_CHUNK_PAGES, cache=None, options=None):
+    """Yield page dicts for the given pages, OCR'ing each chunk across the worker pool."""
+    request_id = tracing.current_request_id()
+    for chunk, pages in iter_page_chunks(pdf_path, page_numbers, chunk_pages, options):
+        results = _executor.map(lambda page: ocr_page_traced(reader, page[0], cache, request_id), pages)
+        for page_number, (_, info), (text, source) in zip(chunk, pages, results):
+            yield {"page": page_number, "text": text, "source": source, **info}
+
+
+def iter_page_texts(reader, pdf_path, chunk_pages=OCR_CHUNK_PAGES, cache=None, text_layer=OCR_TEXT_LAYER, options=None):
+    """Yield {"page", "text", "source", ...} for every page, in page order.
+
+    Pages with a usable embedded text layer are returned as is. The rest are
+    preprocessed, rasterized and OCR'd, in which case the dict also holds the
+    raster info ("dpi", "pixels", "baseline_pixels"); with a cache, pages whose
+    rasterized image was already OCR'd are not OCR'd again.
+    """
+    total_pages = count_pages(pdf_path)
+    with tracing.span("text_layer"):
+        native = usable_text_layer(pdf_path, total_pages) if text_layer else [None] * total_pages
+
+    ocr_page_numbers = [number for number, text in enumerate(native, start=1) if text is None]
+    ocr_results = iter_ocr_pages(reader, pdf_path, ocr_page_numbers, chunk_pages, cache, options)
+
+    for page_number, text in enumerate(native, start=1):
+        if text is not None:
+            yield {"page": page_number, "text": text, "source": SOURCE_TEXT_LAYER}
+        else:
+            yield next(ocr_results)
+
+
+def extract_pdf_pages(reader, pdf_path, cache=None, options=None):
+    """Return the page dicts of every page."""
+    return list(iter_page_texts(reader, pdf_path, cache=cache, options=options))
+
+
+def cached_pages(texts):
+    """Page dicts for a document whose texts came from the document cache."""
+    return [{"page": number, "text": text, "source": SOURCE_CACHE} for number, text in enumerate(texts, start=1)]
+
+
+def page_report(pages):
+    """Which path (text layer, cache, OCR or blank) each page took, and the pixels preprocessing saved."""
+    counts = {}
+    pixels = baseline_pixels = 0
+    for page in pages:
+        counts[page["source"]] = counts.get(page["source"], 0) + 1
+        if "baseline_pixels" in page:
+            pixels += page["pixels"]
+            baseline_pixels += page["baseline_pixels"]
+    return {
+        "pages": [{key: value for key, value in page.items() if key != "text"} for page in pages],
+        "sources": counts,
+        "pixels": {"ocr": pixels, "baseline": baseline_pixels, "saved": baseline_pixels - pixels},
+    }
+
+
+def join_pages(texts):
+    return "\n".join(texts).strip()
+
+
+def extract_pdf_text(reader, pdf_path, cache=None, options=None):
+    return join_pages(page["text"] for page in extract_pdf_pages(reader, pdf_path, cache, options))
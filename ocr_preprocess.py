@@ -0,0 +1,157 @@
+# Filename: ocr_preprocess.py
+#
+# Page rasterization tuned for OCR cost. Every page is first rendered at a tiny
+# probe DPI to measure its text line height and ink bounding box, then rendered
+# once, in grayscale, at the DPI that brings text to target_text_height pixels,
+# cropped to the ink. Blank pages are never rendered at full size or OCR'd.
+
+import os
+
+import numpy as np
+from PIL import Image
+from pdf2image import convert_from_path
+
+# convert_from_path's default, i.e. what every page used to be rendered at
+BASELINE_DPI = 200
+PROBE_DPI = 50
+
+# Pixels darker than this count as ink
+INK_THRESHOLD = 160
+# Pages with less ink than this (fraction of the page) are treated as blank
+BLANK_INK_RATIO = 0.0005
+# Whitespace kept around the ink when cropping, in inches
+CROP_MARGIN = 0.1
+
+DEFAULT_OPTIONS = {
+    "preprocess": os.getenv("OCR_PREPROCESS", "1") == "1",
+    # Text height EasyOCR is given, in pixels
+    "target_text_height": int(os.getenv("OCR_TARGET_TEXT_HEIGHT", 32)),
+    "min_dpi": int(os.getenv("OCR_MIN_DPI", 100)),
+    "max_dpi": int(os.getenv("OCR_MAX_DPI", 300)),
+}
+
+
+# Highest DPI a request may ask for (a page's pixels grow with its square)
+DPI_LIMIT = 600
+
+
+class InvalidOptions(ValueError):
+    pass
+
+
+def make_options(**overrides):
+    """DEFAULT_OPTIONS with every override that isn't None applied; InvalidOptions if they don't make sense."""
+    options = dict(DEFAULT_OPTIONS)
+    options.update({key: value for key, value in overrides.items() if value is not None})
+    for key, limit in (("target_text_height", None), ("min_dpi", DPI_LIMIT), ("max_dpi", DPI_LIMIT)):
+        value = options[key]
+        if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+            raise InvalidOptions(f"{key} must be a positive integer")
+        if limit is not None and value > limit:
+            raise InvalidOptions(f"{key} must be at most {limit}")
+    if options["min_dpi"] > options["max_dpi"]:
+        raise InvalidOptions("min_dpi must not be greater than max_dpi")
+    return options
+
+
+def options_key(options):
+    """Short string identifying options that change OCR output (used in cache keys)."""
+    if not options["preprocess"]:
+        return "raw"
+    return f"pre-{options['target_text_height']}-{options['min_dpi']}-{options['max_dpi']}"
+
+
+def page_runs(page_numbers):
+    """Group sorted page numbers into (first, last) runs of consecutive pages."""
+    runs = []
+    for page_number in page_numbers:
+        if runs and runs[-1][1] == page_number - 1:
+            runs[-1][1] = page_number
+        else:
+            runs.append([page_number, page_number])
+    return runs
+
+
+def render(pdf_path, page_numbers, **kwargs):
+    images = []
+    for first_page, last_page in page_runs(page_numbers):
+        images.extend(convert_from_path(pdf_path, first_page=first_page, last_page=last_page, **kwargs))
+    return images
+
+
+def analyze_probe(probe):
+    """Return (line height in probe pixels or None, ink bounding box or None if the page is blank)."""
+    ink = np.asarray(probe) < INK_THRESHOLD
+    if ink.mean() < BLANK_INK_RATIO:
+        return None, None
+
+    # Text lines are runs of rows that contain ink
+    rows = np.concatenate(([False], ink.any(axis=1), [False]))
+    edges = np.flatnonzero(rows[1:] != rows[:-1])
+    heights = edges[1::2] - edges[::2]
+    heights = heights[heights > 1]
+    line_height = float(np.median(heights)) if heights.size else None
+
+    ys = np.flatnonzero(ink.any(axis=1))
+    xs = np.flatnonzero(ink.any(axis=0))
+    return line_height, (xs[0], ys[0], xs[-1] + 1, ys[-1] + 1)
+
+
+def choose_dpi(line_height, options):
+    if line_height is None:
+        dpi = BASELINE_DPI
+    else:
+        dpi = options["target_text_height"] * PROBE_DPI / line_height
+    return int(min(max(dpi, options["min_dpi"]), options["max_dpi"]))
+
+
+def preprocess_page(pdf_path, page_number, probe, options):
+    """Return (grayscale page array or None if blank, info)."""
+    width, height = probe.size
+    scale = BASELINE_DPI / PROBE_DPI
+    info = {"dpi": None, "pixels": 0, "baseline_pixels": int(width * scale) * int(height * scale)}
+
+    line_height, box = analyze_probe(probe)
+    if box is None:
+        return None, info
+
+    dpi = choose_dpi(line_height, options)
+    image = convert_from_path(pdf_path, dpi=dpi, first_page=page_number, last_page=page_number, grayscale=True)[0]
+
+    scale = dpi / PROBE_DPI
+    margin = CROP_MARGIN * dpi
+    left, top, right, bottom = box
+    image = image.crop((
+        max(0, int(left * scale - margin)),
+        max(0, int(top * scale - margin)),
+        min(image.width, int(right * scale + margin)),
+        min(image.height, int(bottom * scale + margin)),
+    ))
+
+    # min_dpi can leave large print bigger than needed: downscale it to the target height
+    if line_height is not None:
+        text_height = line_height * scale
+        if text_height > options["target_text_height"] * 1.25:
+            factor = options["target_text_height"] / text_height
+            image = image.resize((max(1, int(image.width * factor)), max(1, int(image.height * factor))), Image.BILINEAR)
+
+    info["dpi"] = dpi
+    info["pixels"] = image.width * image.height
+    return np.asarray(image), info
+
+
+def rasterize_pages(pdf_path, page_numbers, options=None):
+    """Return [(page array or None for blank pages, info)] for the given pages, in order."""
+    options = options or DEFAULT_OPTIONS
+    if not options["preprocess"]:
+        pages = []
+        for image in render(pdf_path, page_numbers):
+            pixels = image.width * image.height
+            pages.append((np.asarray(image), {"dpi": BASELINE_DPI, "pixels": pixels, "baseline_pixels": pixels}))
+        return pages
+
+    probes = render(pdf_path, page_numbers, dpi=PROBE_DPI, grayscale=True)
+    return [
+        preprocess_page(pdf_path, page_number, probe, options)
+        for page_number, probe in zip(page_numbers, probes)
+    ]
@@ -0,0 +1,113 @@
+# Filename: ocr_reader.py
+#
+# EasyOCR reader that is only built when needed. Importing this module does not
+# import easyocr/torch, so `uvicorn --reload` restarts and process spawns are fast.
+#
+#   OCR_GPU     auto (default, use CUDA if torch sees it) | 1 | 0
+#   OCR_WARMUP  background (default, load in a thread at startup) | eager |
+#               lazy (on the first OCR request, or the first GET /ready, which starts it in the background)
+#   OCR_MODEL_DIR  where EasyOCR keeps its model files; when set, nothing is downloaded
+#   OCR_WORKERS    pages OCR'd at once with the one reader (default 2, see ocr_pipeline)
+#
+# One reader is shared by the OCR_WORKERS threads: its torch models only run
+# forward passes, which torch allows from several threads at once, but every
+# call also spreads over torch's own intra-op thread pool. On CPU that pool is
+# capped at cores / OCR_WORKERS, so the threads together use each core once
+# instead of cores x cores threads fighting over them. On a GPU the calls share
+# the device, and more workers mostly overlap the CPU-side pre/post-processing.
+
+import logging
+import os
+import threading
+
+OCR_LANGUAGES = ["ar", "en"]  # Arabic and English
+
+OCR_GPU = os.getenv("OCR_GPU", "auto").lower()
+OCR_WARMUP = os.getenv("OCR_WARMUP", "background").lower()
+OCR_MODEL_DIR = os.getenv("OCR_MODEL_DIR")
+OCR_WORKERS = max(1, int(os.getenv("OCR_WORKERS", 2)))
+
+logger = logging.getLogger(__name__)
+
+_reader = None
+_load_error = None
+_lock = threading.Lock()
+# Thread loading the reader in the background, see load_in_background()
+_loader = None
+_loader_lock = threading.Lock()
+
+
+def use_gpu():
+    if OCR_GPU == "auto":
+        import torch
+        return torch.cuda.is_available()
+    return OCR_GPU in ("1", "true", "yes")
+
+
+def limit_torch_threads(workers):
+    """Give each of workers concurrent reader calls an equal share of the cores."""
+    import torch
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+
+
+def create_reader(workers=OCR_WORKERS):
+    """A new reader; workers = how many callers will use it (or its process's siblings) at once."""
+    import easyocr
+
+    gpu = use_gpu()
+    if not gpu:
+        limit_torch_threads(workers)
+    options = {"gpu": gpu}
+    if OCR_MODEL_DIR:
+        options["model_storage_directory"] = OCR_MODEL_DIR
+        options["download_enabled"] = False
+    return easyocr.Reader(OCR_LANGUAGES, **options)
+
+
+def get_reader():
+    """Return the process-wide reader, loading it on first use."""
+    global _reader, _load_error
+    if _reader is not None:
+        return _reader
+    with _lock:
+        if _reader is None:
+            try:
+                _reader = create_reader()
+                _load_error = None
+            except Exception as e:
+                _load_error = str(e)
+                raise
+    return _reader
+
+
+def is_ready():
+    return _reader is not None
+
+
+def load_error():
+    return _load_error
+
+
+def _load():
+    try:
+        get_reader()
+    except Exception:
+        logger.exception("Failed to load EasyOCR reader")
+
+
+def load_in_background():
+    """Start loading the reader in a thread, unless it is loaded or being loaded already."""
+    global _loader
+    with _loader_lock:
+        if _reader is not None or (_loader is not None and _loader.is_alive()):
+            return
+        _loader = threading.Thread(target=_load, name="ocr-warmup", daemon=True)
+        _loader.start()
+
+
+def warm_up():
+    """Start loading the reader according to OCR_WARMUP."""
+    if OCR_WARMUP == "eager":
+        get_reader()
+    elif OCR_WARMUP == "background":
+        load_in_background()
@@ -0,0 +1,70 @@
+# Filename: ocrclient.py
+#
+# Client helpers for the OCR API (easyocrapi.py).
+# stream_pages() yields each page as soon as the server has OCR'd it, so callers
+# can start chunking/embedding before the whole document is done.
+# The *_url variants send only the document's URL: the OCR API downloads it
+# itself (conditionally, see ocr_fetch.py), so the PDF never passes through here.
+# Local PDFs are sent as a raw application/pdf body, which requests streams from
+# the open file (a multipart body would be built in memory first).
+
+import json
+
+from api_client import OCR_API_URL, client
+
+OCR_URL = f"{OCR_API_URL}/extract-text/"
+OCR_STREAM_URL = f"{OCR_API_URL}/extract-text/stream/"
+PDF_HEADERS = {"Content-Type": "application/pdf"}
+
+
+def extract_text(pdf_path, url=OCR_URL):
+    with open(pdf_path, "rb") as f:
+        response = client.post("ocr", url, data=f, headers=PDF_HEADERS)
+    response.raise_for_status()
+    return response.json()["extracted_text"]
+
+
+def extract_text_from_url(document_url, url=OCR_URL):
+    response = client.post("ocr", url, data={"url": document_url})
+    response.raise_for_status()
+    return response.json()["extracted_text"]
+
+
+def stream_pages(pdf_path, url=OCR_STREAM_URL):
+    """Yield {"page", "source", "text", "seconds", "elapsed"} dicts in page order."""
+    with open(pdf_path, "rb") as f:
+        yield from stream_document(f, url)
+
+
+def stream_document(content, url=OCR_STREAM_URL):
+    """stream_pages() for a PDF given as bytes or an open file, sent as the raw request body."""
+    return _stream(url, data=content, headers=PDF_HEADERS)
+
+
+def stream_url(document_url, url=OCR_STREAM_URL):
+    """stream_pages() for a PDF the OCR API fetches from document_url."""
+    return _stream(url, data={"url": document_url})
+
+
+def _stream(url, **kwargs):
+    with client.stream("ocr", "POST", url, **kwargs) as response:
+        response.raise_for_status()
+        response.encoding = "utf-8"
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            event = json.loads(line)
+            if "error" in event:
+                raise RuntimeError(f"OCR failed after {event.get('pages', 0)} pages: {event['error']}")
+            if event.get("done"):
+                return
+            yield event
+
+
+if __name__ == "__main__":
+    import sys
+
+    pdf_path = sys.argv[1] if len(sys.argv) > 1 else "mybook.pdf"
+    for page in stream_pages(pdf_path):
+        print(f"--- Page {page['page']} ({page['seconds']}s, {page['elapsed']}s total) ---")
+        print(page["text"])
@@ -0,0 +1,60 @@
+# Filename: pdf_text.py
+#
+# Embedded text layer extraction (poppler's pdftotext, which pdf2image already needs).
+# Pages whose text layer is usable skip rasterization and OCR entirely; scanned pages
+# and pages with broken Arabic shaping fall through to EasyOCR.
+
+import os
+import re
+import subprocess
+
+# Minimum number of non-space characters for a text layer to count as "real" text
+TEXT_LAYER_MIN_CHARS = int(os.getenv("TEXT_LAYER_MIN_CHARS", 40))
+
+ARABIC_RE = re.compile(r"[\u0600-\u06FF]")
+# Glyph-level (already shaped) Arabic: the PDF stored presentation forms instead of letters
+ARABIC_PRESENTATION_RE = re.compile(r"[\uFB50-\uFDFF\uFE70-\uFEFF]")
+# Fonts without a ToUnicode map come out as replacement chars or (cid:NN) escapes
+GARBAGE_RE = re.compile(r"\uFFFD|\(cid:\d+\)|[\uE000-\uF8FF]")
+ARABIC_WORD_RE = re.compile(r"[\u0600-\u06FF]+")
+
+
+def read_text_layer(pdf_path):
+    """Return the embedded text of every page, or None if pdftotext is unavailable."""
+    try:
+        result = subprocess.run(
+            ["pdftotext", "-enc", "UTF-8", pdf_path, "-"],
+            capture_output=True, check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    pages = result.stdout.decode("utf-8", errors="replace").split("\f")
+    # pdftotext terminates every page with a form feed
+    if pages and not pages[-1].strip():
+        pages.pop()
+    return pages
+
+
+def text_layer_problem(text):
+    """Return why a page's text layer can't be used, or None if it can."""
+    chars = "".join(text.split())
+    if len(chars) < TEXT_LAYER_MIN_CHARS:
+        return "too little text"
+    if len(GARBAGE_RE.findall(text)) > len(chars) * 0.02:
+        return "unmapped glyphs"
+    if ARABIC_RE.search(text) or ARABIC_PRESENTATION_RE.search(text):
+        if len(ARABIC_PRESENTATION_RE.findall(text)) > len(chars) * 0.05:
+            return "arabic presentation forms"
+        # Broken shaping also shows up as letters split into one-letter "words"
+        words = ARABIC_WORD_RE.findall(text)
+        if words and sum(len(word) == 1 for word in words) > len(words) * 0.5:
+            return "arabic letters split apart"
+    return None
+
+
+def usable_text_layer(pdf_path, total_pages):
+    """List with the embedded text for pages that can skip OCR, None for the rest."""
+    pages = read_text_layer(pdf_path)
+    if pages is None or len(pages) != total_pages:
+        return [None] * total_pages
+    return [text.strip() if text_layer_problem(text) is None else None for text in pages]
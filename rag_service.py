@@ -1,18 +1,64 @@
+import os
+import queue
+import threading
 import tkinter as tk
 from tkinter import messagebox, ttk
-from PIL import Image, ImageTk
+from PIL import Image
 import requests
+from api_client import CHAT_API_URL, abort_stream, client, iter_sse_events
 from dotenv import load_dotenv
 import json
 # Load environment variables
 load_dotenv()
 
-API_URL = "http://localhost:3000/api/chat"
+API_URL = CHAT_API_URL
 headers = {"Content-Type": "application/json"}
 
 chat_session_id = None  # Global variable to store chatID
 
-def send_message(message, files=None):
+BACKGROUND_IMAGE = "bub2.jpg"
+WINDOW_SIZE = (1024, 768)
+# Resized background, decoded by Tk directly on the next start (no JPEG decode + LANCZOS resize)
+BACKGROUND_CACHE_DIR = ".gui_cache"
+# How often the GUI picks up tokens from the worker thread, in ms
+POLL_INTERVAL = 30
+
+class Cancellation:
+    """Cancels one send_message() call from another thread.
+
+    set() also shuts the reply's connection down, so a reply that is stalled
+    (before its first token or between two) stops right away instead of
+    holding the worker thread and socket until the read timeout.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._response = None
+
+    def is_set(self):
+        return self._event.is_set()
+
+    def set(self):
+        with self._lock:
+            self._event.set()
+            response = self._response
+        if response is not None:
+            abort_stream(response)
+
+    def attach(self, response):
+        with self._lock:
+            self._response = response
+            cancelled = self._event.is_set()
+        if cancelled:
+            abort_stream(response)
+
+
+def send_message(message, files=None, on_token=None, cancel=None):
+    """Send a message and return the whole reply; on_token(text) is called for every streamed token.
+
+    cancel (a Cancellation) stops the request, even while it waits for the next token.
+    """
     global chat_session_id
 
     data = {
@@ -31,35 +77,40 @@ def send_message(message, files=None):
     print(data)
 
     try:
-        response = requests.post(API_URL, json=data, headers=headers)
-        print("🔄 Response itself: ",response.text)
-        if response.status_code == 200:
+        with client.stream("chat", "POST", API_URL, json=data, headers=headers) as response:
+            response.encoding = "utf-8"
+            if response.status_code != 200:
+                return f"Error: {response.status_code}\n{response.text}"
+
+            combined_content = ""
+            if cancel is not None:
+                cancel.attach(response)
             try:
-                # Try to read SSE response content
-                response_lines = response.text.strip().split("\n\n")
-                combined_content = ""
-
-                for line in response_lines:
-                    if line.startswith("data: "):
-                        json_chunk = line.replace("data: ", "")
-                        try:
-                            parsed_chunk = json.loads(json_chunk)  # quick and dirty
-                            for key, value in parsed_chunk.items():
-                                if key == "content":
-                                    combined_content += value
-                                elif key == "chatID":
-                                    chat_session_id = value
-                        except Exception as e:
-                            print(f"❗ Failed to parse chunk:)# {json_chunk} — {e}")
-                print(f"this is final chatID: {chat_session_id}")
-                print(f"this is final content: {combined_content}")
-
-                return combined_content.strip() if combined_content else "No content in response."
-            except ValueError:
-                print("❗ response code not 200")
-                return response.text
-        else:
-            return f"Error: {response.status_code}\n{response.text}"
+                for json_chunk in iter_sse_events(response):
+                    if cancel is not None and cancel.is_set():
+                        break
+                    try:
+                        parsed_chunk = json.loads(json_chunk)
+                    except ValueError as e:
+                        print(f"❗ Failed to parse chunk: {json_chunk} — {e}")
+                        continue
+                    for key, value in parsed_chunk.items():
+                        if key == "content":
+                            combined_content += value
+                            if on_token:
+                                on_token(value)
+                        elif key == "chatID":
+                            chat_session_id = value
+            except requests.exceptions.RequestException:
+                # Cancelling shuts the connection down under the read
+                if cancel is None or not cancel.is_set():
+                    raise
+            if cancel is not None and cancel.is_set():
+                return combined_content.strip() + "\n\n⛔ Cancelled."
+            print(f"this is final chatID: {chat_session_id}")
+            print(f"this is final content: {combined_content}")
+
+            return combined_content.strip() if combined_content else "No content in response."
     except requests.exceptions.RequestException as e:
         return f"Request failed: {e}"
 
@@ -100,6 +151,10 @@ class ChatApp:
         self.send_button = self.create_rounded_button(self.button_frame, "🚀 Send", self.on_send, "#4CAF50", "white")
         self.send_button.pack(side="left", padx=15)
 
+        self.cancel_button = self.create_rounded_button(self.button_frame, "⛔ Cancel", self.on_cancel, "#9E9E9E", "white")
+        self.cancel_button.pack(side="left", padx=15)
+        self.cancel_button.config(state="disabled")
+
         self.clear_button = self.create_rounded_button(self.button_frame, "🧹 Clear", self.on_clear, "#FF5722", "white")
         self.clear_button.pack(side="left", padx=15)
 
@@ -108,11 +163,29 @@ class ChatApp:
         self.response_text.pack(pady=20)
         self.response_text.config(state="disabled")
 
+        # Requests run on a worker thread and hand tokens to the GUI through this queue
+        self.events = queue.Queue()
+        self.request_id = 0
+        self.cancel_event = None
+        self.root.after(POLL_INTERVAL, self.poll_events)
+
+    def background_path(self):
+        # Cache key: source file, its mtime and the target size
+        stat = os.stat(BACKGROUND_IMAGE)
+        width, height = WINDOW_SIZE
+        name = f"{os.path.splitext(os.path.basename(BACKGROUND_IMAGE))[0]}_{width}x{height}_{stat.st_mtime_ns}.ppm"
+        path = os.path.join(BACKGROUND_CACHE_DIR, name)
+        if not os.path.exists(path):
+            os.makedirs(BACKGROUND_CACHE_DIR, exist_ok=True)
+            with Image.open(BACKGROUND_IMAGE) as image:
+                image = image.convert("RGB").resize(WINDOW_SIZE, Image.Resampling.LANCZOS)
+                image.save(path + ".tmp", format="PPM")
+            os.replace(path + ".tmp", path)
+        return path
+
     def set_background_image(self):
         try:
-            bg_image = Image.open("bub2.jpg")
-            bg_image = bg_image.resize((1024, 768), Image.Resampling.LANCZOS)
-            bg_photo = ImageTk.PhotoImage(bg_image)
+            bg_photo = tk.PhotoImage(file=self.background_path())
             self.bg_label = tk.Label(self.root, image=bg_photo)
             self.bg_label.place(relwidth=1, relheight=1)
             self.bg_label.image = bg_photo
@@ -142,24 +215,80 @@ class ChatApp:
             messagebox.showwarning("Input Error", "Please enter a message.")
             return
 
+        self.set_response("⏳ Sending message...\n")
+        self.send_button.config(state="disabled")
+        self.cancel_button.config(state="normal")
+
+        # Events of an older (cancelled) request are ignored by poll_events
+        self.request_id += 1
+        self.cancel_event = Cancellation()
+        threading.Thread(
+            target=self.request_worker,
+            args=(self.request_id, self.cancel_event, message, file_url if file_url else None),
+            daemon=True,
+        ).start()
+
+    def request_worker(self, request_id, cancel_event, message, file_url):
+        # Runs off the Tk thread: only talks to the GUI through the queue
+        def on_token(token):
+            self.events.put((request_id, "token", token))
+
+        response = send_message(message, file_url, on_token=on_token, cancel=cancel_event)
+        self.events.put((request_id, "done", str(response)))
+
+    def poll_events(self):
+        tokens = []
+        done = None
+        try:
+            while True:
+                request_id, kind, value = self.events.get_nowait()
+                if request_id != self.request_id:
+                    continue
+                if kind == "token":
+                    tokens.append(value)
+                else:
+                    done = value
+        except queue.Empty:
+            pass
+
+        if tokens:
+            if self.response_text.get(1.0, "end-1c").startswith("⏳"):
+                self.set_response("")
+            self.append_response("".join(tokens))
+        if done is not None:
+            self.set_response(done)
+            self.finish_request()
+        self.root.after(POLL_INTERVAL, self.poll_events)
+
+    def on_cancel(self):
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+            # Stop listening right away; the worker's connection is shut down too
+            self.request_id += 1
+            self.append_response("\n\n⛔ Cancelled.")
+            self.finish_request()
+
+    def finish_request(self):
+        self.cancel_event = None
+        self.send_button.config(state="normal")
+        self.cancel_button.config(state="disabled")
+
+    def set_response(self, text):
         self.response_text.config(state="normal")
         self.response_text.delete(1.0, tk.END)
-        self.response_text.insert(tk.END, "⏳ Sending message...\n")
+        self.response_text.insert(tk.END, text)
         self.response_text.config(state="disabled")
 
-        response = send_message(message, file_url if file_url else None)
-
+    def append_response(self, text):
         self.response_text.config(state="normal")
-        self.response_text.delete(1.0, tk.END)
-        self.response_text.insert(tk.END, str(response))
+        self.response_text.insert(tk.END, text)
+        self.response_text.see(tk.END)
         self.response_text.config(state="disabled")
 
     def on_clear(self):
         self.message_entry.delete(0, tk.END)
         self.file_entry.delete(0, tk.END)
-        self.response_text.config(state="normal")
-        self.response_text.delete(1.0, tk.END)
-        self.response_text.config(state="disabled")
+        self.set_response("")
 
 # Run the GUI
 if __name__ == "__main__":
@@ -0,0 +1,130 @@
+# Filename: retrieval_service.py
+#
+# Per-chat document retrieval over the local vector store (vector_store.py).
+# The Node server embeds the query and asks for the top k documents of a chat
+# instead of fetching and scoring every row itself; with the query text the
+# results are ranked by vector similarity fused with BM25 (keyword_index.py).
+#
+# POST /ingest/ takes a PDF (streamed page by page through easyocrapi) or plain
+# text and runs the ingest.py pipeline: chunking, dedupe, batched embeddings,
+# bulk writes, overlapping with the OCR of the following pages. A url without
+# file or text is a PDF that easyocrapi downloads itself.
+#
+# Run: uvicorn retrieval_service:app --port 5001
+
+from typing import List, Optional
+
+from fastapi import FastAPI, File, Form, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel
+
+from ingest import EmbeddingCache, get_embedder, ingest_pages, ingest_text
+from ocrclient import stream_document, stream_url
+from vector_store import VECTOR_WEIGHT, VectorStore
+import tracing
+
+app = FastAPI()
+app.middleware("http")(tracing.http_middleware)
+
+store = VectorStore()
+# Embeddings of chunks seen before, by model and chunk hash
+embedding_cache = EmbeddingCache()
+
+
+class Document(BaseModel):
+    content: str
+    embedding: List[float]
+    url: Optional[str] = None
+    metadata: dict = {}
+
+
+class AddDocuments(BaseModel):
+    chatId: str
+    documents: List[Document]
+
+
+class Search(BaseModel):
+    chatId: str
+    embedding: List[float]
+    k: int = 5
+    # Query text: adds BM25 keyword scores to the vector similarity
+    query: Optional[str] = None
+    vectorWeight: float = VECTOR_WEIGHT
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(tracing.render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/documents/")
+async def add_documents(body: AddDocuments):
+    try:
+        count = await run_in_threadpool(
+            store.add,
+            body.chatId,
+            [document.embedding for document in body.documents],
+            [{"content": d.content, "url": d.url, "metadata": d.metadata} for d in body.documents],
+        )
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"status": "error", "message": str(e)})
+    return {"status": "success", "added": len(body.documents), "count": count}
+
+
+@app.post("/search/")
+async def search(body: Search):
+    try:
+        results = await run_in_threadpool(store.search, body.chatId, body.embedding, body.k, body.query, body.vectorWeight)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"status": "error", "message": str(e)})
+    return {"status": "success", "results": results}
+
+
+@app.get("/documents/{chat_id}")
+async def document_count(chat_id: str):
+    try:
+        return {"chatId": chat_id, "count": store.count(chat_id)}
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"status": "error", "message": str(e)})
+
+
+@app.delete("/documents/{chat_id}")
+async def delete_documents(chat_id: str):
+    try:
+        await run_in_threadpool(store.delete, chat_id)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"status": "error", "message": str(e)})
+    return {"status": "success"}
+
+
+@app.post("/ingest/")
+async def ingest(
+    chatId: str = Form(...),
+    url: Optional[str] = Form(None),
+    text: Optional[str] = Form(None),
+    file: Optional[UploadFile] = File(None),
+):
+    try:
+        if file is not None or (url and not text):
+            # The upload is passed on from its spooled file; a url alone is a PDF easyocrapi fetches itself
+            pages = stream_document(file.file) if file is not None else stream_url(url)
+            report = await run_in_threadpool(
+                ingest_pages, store, chatId, pages, url=url, embedder=get_embedder(), cache=embedding_cache
+            )
+        elif text and text.strip():
+            report = await run_in_threadpool(
+                ingest_text, store, chatId, text, url=url, embedder=get_embedder(), cache=embedding_cache
+            )
+        else:
+            return JSONResponse(status_code=400, content={"status": "error", "message": "No text to ingest"})
+        return {"status": "success", **report}
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"status": "error", "message": str(e)})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"status": "error", "message": str(e)})
@@ -0,0 +1,89 @@
+# Filename: tests/test_ingest.py
+#
+# ingest.ingest_chunks / ingest_text into a temporary VectorStore, with the
+# offline hash embedder: dedupe, embedding cache hits and batching.
+#
+# Run: python -m unittest discover tests
+
+import os
+import tempfile
+import unittest
+
+from ingest import EmbeddingCache, HashEmbedder, ingest_chunks, ingest_text
+from vector_store import VectorStore
+
+
+class CountingEmbedder(HashEmbedder):
+    """HashEmbedder that records the texts of every embed() call."""
+
+    def __init__(self):
+        super().__init__(dim=256)
+        self.calls = []
+
+    def embed(self, texts):
+        self.calls.append(list(texts))
+        return super().embed(texts)
+
+
+def chunks(*texts):
+    return [{"text": text, "metadata": {"page": 1}} for text in texts]
+
+
+class IngestTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = VectorStore(os.path.join(self.tmp.name, "store"))
+        self.cache = EmbeddingCache(os.path.join(self.tmp.name, "embeddings.sqlite3"))
+        self.embedder = CountingEmbedder()
+
+    def tearDown(self):
+        self.cache._db.close()
+        self.tmp.cleanup()
+
+    def ingest(self, chat_id, items, **kwargs):
+        return ingest_chunks(self.store, chat_id, items, url="doc.pdf", embedder=self.embedder, cache=self.cache, **kwargs)
+
+    def test_duplicates_are_skipped(self):
+        # Repeats differing only in whitespace or Arabic spelling are the same chunk
+        report = self.ingest("chat", chunks("first chunk", "second chunk", "first  chunk", "أحمد", "احمد"))
+        self.assertEqual((report["chunks"], report["duplicates"], report["added"]), (5, 2, 3))
+        self.assertEqual(self.store.count("chat"), 3)
+
+        report = self.ingest("chat", chunks("second chunk", "third chunk"))
+        self.assertEqual((report["duplicates"], report["embedded"], report["added"]), (1, 1, 1))
+        self.assertEqual(self.embedder.calls[-1], ["third chunk"])
+        self.assertEqual(self.store.count("chat"), 4)
+
+    def test_embedding_cache_hits(self):
+        self.ingest("chat", chunks("alpha text", "beta text"))
+        self.assertEqual(len(self.embedder.calls), 1)
+
+        # Same document in another chat: stored again, but nothing is embedded
+        report = self.ingest("other", chunks("alpha text", "beta text"))
+        self.assertEqual((report["cached"], report["embedded"], report["added"]), (2, 0, 2))
+        self.assertEqual(len(self.embedder.calls), 1)
+        best = self.store.search("other", self.embedder.embed(["beta text"])[0], k=1)[0]
+        self.assertEqual(best["content"], "beta text")
+        self.assertAlmostEqual(best["similarity"], 1.0, places=5)
+
+        report = self.ingest("third", chunks("alpha text", "gamma text"))
+        self.assertEqual((report["cached"], report["embedded"]), (1, 1))
+        self.assertEqual(self.embedder.calls[-1], ["gamma text"])
+
+    def test_batches(self):
+        report = self.ingest("chat", chunks(*(f"chunk number {i}" for i in range(5))), batch_size=2)
+        self.assertEqual(report["added"], 5)
+        self.assertEqual([len(call) for call in self.embedder.calls], [2, 2, 1])
+
+    def test_ingest_text(self):
+        text = " ".join(f"sentence {i} of a long document." for i in range(400))
+        report = ingest_text(self.store, "chat", text, url="doc.docx", embedder=self.embedder, cache=self.cache)
+        self.assertGreater(report["chunks"], 1)
+        self.assertEqual(report["added"], self.store.count("chat"))
+        document = self.store.documents("chat", [0])[0]
+        self.assertEqual(document["url"], "doc.docx")
+        self.assertEqual(document["metadata"]["chatId"], "chat")
+
+
+if __name__ == "__main__":
+    unittest.main()
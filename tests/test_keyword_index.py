@@ -0,0 +1,84 @@
+# Filename: tests/test_keyword_index.py
+#
+# keyword_index.KeywordIndex (BM25 over terms.jsonl) and the hybrid search
+# vector_store builds on it.
+#
+# Run: python -m unittest discover tests
+
+import os
+import tempfile
+import unittest
+
+from keyword_index import KeywordIndex
+from vector_store import VectorStore
+
+
+class KeywordIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index = KeywordIndex(lambda chat_id: self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_bm25_ranking(self):
+        texts = [
+            "the cat sat on the mat",
+            "the dog chased the cat and the cat ran",
+            "the dog slept",
+            "a long text about many other things and a cat somewhere near the end of it",
+        ]
+        self.index.add("chat", 0, texts)
+        scores = self.index.scores("chat", "cat", len(texts))
+        # More occurrences rank higher, a longer document lower, no match scores 0
+        self.assertGreater(scores[1], scores[0])
+        self.assertGreater(scores[0], scores[3])
+        self.assertEqual(scores[2], 0)
+        # A rare term weighs more than a common one
+        scores = self.index.scores("chat", "the slept", len(texts))
+        self.assertEqual(int(scores.argmax()), 2)
+
+    def test_no_match(self):
+        self.index.add("chat", 0, ["alpha", "beta"])
+        self.assertEqual(self.index.scores("chat", "gamma", 2).tolist(), [0, 0])
+        self.assertEqual(self.index.scores("chat", "...", 2).tolist(), [0, 0])
+        self.assertEqual(self.index.scores("chat", "alpha", 0).tolist(), [])
+
+    def test_arabic_normalization(self):
+        texts = ["أحمد يَكتُبُ الكِتابَ", "ذهب إلى المدرسة", "كلمة أخرى"]
+        self.index.add("chat", 0, texts)
+        # Hamza forms, diacritics, alef maqsura and tatweel are folded on both sides
+        for query, row in (("احمد", 0), ("الكتاب", 0), ("يكـتب", 0), ("الى", 1), ("إلي", 1)):
+            scores = self.index.scores("chat", query, len(texts))
+            self.assertEqual(int(scores.argmax()), row, query)
+            self.assertGreater(scores[row], 0, query)
+
+    def test_rows_added_later_are_loaded(self):
+        self.index.add("chat", 0, ["alpha"])
+        self.assertGreater(self.index.scores("chat", "alpha", 1)[0], 0)
+        self.index.add("chat", 1, ["beta alpha"])
+        scores = self.index.scores("chat", "beta", 2)
+        self.assertEqual(scores[0], 0)
+        self.assertGreater(scores[1], 0)
+        # Only the first count rows are scored (rows past it aren't committed yet)
+        self.assertEqual(len(self.index.scores("chat", "beta", 1)), 1)
+        # Another process reads the whole file
+        self.assertGreater(KeywordIndex(lambda chat_id: self.tmp.name).scores("chat", "beta", 2)[1], 0)
+
+
+class HybridSearchTests(unittest.TestCase):
+    def test_keywords_break_vector_ties(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = VectorStore(directory)
+            texts = ["invoice total amount", "meeting notes", "invoice invoice due date"]
+            store.add("chat", [[1, 0], [1, 0], [1, 0]], [{"content": t, "url": None, "metadata": {}} for t in texts])
+            results = store.search("chat", [1, 0], k=3, query="invoice")
+            self.assertEqual(results[0]["content"], "invoice invoice due date")
+            self.assertEqual(results[-1]["content"], "meeting notes")
+            self.assertAlmostEqual(results[0]["keyword"], 1.0, places=5)
+            self.assertEqual(results[-1]["keyword"], 0)
+            self.assertTrue(os.path.exists(store.keywords.path("chat")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+# Filename: tests/test_vector_store.py
+#
+# vector_store.VectorStore on a temporary folder: top-k order, persistence
+# across a reopen, and the checks on chat ids and embedding sizes.
+#
+# Run: python -m unittest discover tests
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from vector_store import VectorStore, top_k
+
+
+def document(text):
+    return {"content": text, "url": "doc.pdf", "metadata": {"page": 1}}
+
+
+class TopKTests(unittest.TestCase):
+    def test_best_first(self):
+        scores = np.array([0.1, 0.9, 0.5, 0.7], dtype=np.float32)
+        self.assertEqual(top_k(scores, 2).tolist(), [1, 3])
+        self.assertEqual(top_k(scores, 10).tolist(), [1, 3, 2, 0])
+        self.assertEqual(top_k(scores, 0).tolist(), [])
+
+
+class VectorStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = VectorStore(self.tmp.name)
+        # Unit vectors along the axes, plus one between the first two
+        self.embeddings = np.array([[1, 0, 0], [0, 1, 0], [0, 0, 1], [1, 1, 0]], dtype=np.float32)
+        self.texts = ["x axis", "y axis", "z axis", "x and y"]
+        self.store.add("chat", self.embeddings, [document(text) for text in self.texts])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_search_orders_by_similarity(self):
+        results = self.store.search("chat", [1, 0.1, 0], k=3)
+        self.assertEqual([r["content"] for r in results], ["x axis", "x and y", "y axis"])
+        similarities = [r["similarity"] for r in results]
+        self.assertEqual(similarities, sorted(similarities, reverse=True))
+        self.assertAlmostEqual(self.store.search("chat", [0, 0, 5], k=1)[0]["similarity"], 1.0, places=5)
+        self.assertEqual(results[0]["metadata"], {"page": 1})
+
+    def test_k_larger_than_the_chat(self):
+        self.assertEqual(len(self.store.search("chat", [1, 0, 0], k=10)), 4)
+        self.assertEqual(self.store.search("other", [1, 0, 0], k=5), [])
+
+    def test_appends_and_reopen(self):
+        self.store.add("chat", [[0, -1, 0]], [document("minus y")])
+        self.assertEqual(self.store.count("chat"), 5)
+        # A new process: memmaps, offsets and hashes are read back from disk
+        reopened = VectorStore(self.tmp.name)
+        self.assertEqual(reopened.count("chat"), 5)
+        self.assertEqual(reopened.search("chat", [0, -1, 0], k=1)[0]["content"], "minus y")
+        self.assertEqual(reopened.search("chat", [0, 0, 1], k=1)[0]["content"], "z axis")
+        self.assertEqual(reopened.hashes("chat"), self.store.hashes("chat"))
+        self.assertEqual(len(reopened.hashes("chat")), 5)
+
+    def test_rows_past_the_recorded_count_are_ignored(self):
+        # An append interrupted before info.json was written
+        with open(os.path.join(self.store.chat_dir("chat"), "vectors.f32"), "ab") as f:
+            f.write(np.ones(3, dtype=np.float32).tobytes())
+        reopened = VectorStore(self.tmp.name)
+        self.assertEqual(reopened.count("chat"), 4)
+        reopened.add("chat", [[0, 0, -1]], [document("minus z")])
+        self.assertEqual(reopened.search("chat", [0, 0, -1], k=1)[0]["content"], "minus z")
+        self.assertEqual(reopened.search("chat", [1, 0, 0], k=1)[0]["content"], "x axis")
+
+    def test_invalid_input(self):
+        with self.assertRaises(ValueError):
+            self.store.add("chat", [[1, 0]], [document("wrong size")])
+        with self.assertRaises(ValueError):
+            self.store.add("chat", [[1, 0, 0]], [])
+        with self.assertRaises(ValueError):
+            self.store.search("chat", [1, 0], k=1)
+        with self.assertRaises(ValueError):
+            self.store.search("../chat", [1, 0, 0], k=1)
+
+    def test_delete(self):
+        self.store.delete("chat")
+        self.assertEqual(self.store.count("chat"), 0)
+        self.assertEqual(self.store.search("chat", [1, 0, 0], k=3), [])
+        self.assertFalse(os.path.exists(self.store.chat_dir("chat")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+# Filename: text_chunker.py
+#
+# Streaming chunker for OCR output. Takes page dicts ({"page", "text"}) as the
+# OCR API produces them (ocrclient.stream_pages / ocr_pipeline.iter_page_texts)
+# and yields overlapping chunks of about CHUNK_TOKENS tokens as soon as each one
+# is full, so chunking and embedding run while later pages are still being OCR'd.
+# Only the sentences of the chunk being built are kept in memory.
+#
+# Chunks end on sentence boundaries (Latin and Arabic punctuation), never in the
+# middle of a word, and carry where they came from: first/last page and the
+# paragraph index and character offset within those pages.
+
+import math
+import re
+
+CHUNK_TOKENS = 300
+OVERLAP_TOKENS = 50
+
+# Paragraphs: EasyOCR (paragraph=True) gives one per line; text layers separate them with blank lines
+BLANK_LINE = re.compile(r"\n[ \t]*\n")
+# Sentence ends: . ! ? and Arabic question mark, full stop and semicolon, followed by space
+SENTENCE_END = re.compile(r"(?<=[.!?؟۔؛])\s+")
+WORD = re.compile(r"\S+")
+
+
+def estimate_tokens(text):
+    # ~4 characters per token for Latin text; Arabic and other scripts tokenize denser
+    ascii_chars = sum(1 for char in text if char.isascii())
+    return math.ceil(ascii_chars / 4 + (len(text) - ascii_chars) / 2)
+
+
+def iter_paragraphs(text):
+    """Yield (paragraph index, character offset in text, paragraph text)."""
+    separator = BLANK_LINE if BLANK_LINE.search(text) else re.compile(r"\n")
+    start = 0
+    index = 0
+    for match in [*separator.finditer(text), None]:
+        end = match.start() if match else len(text)
+        paragraph = text[start:end]
+        if paragraph.strip():
+            yield index, start, paragraph
+            index += 1
+        if match:
+            start = match.end()
+
+
+def iter_sentences(paragraph, max_tokens=CHUNK_TOKENS):
+    """Yield (offset in paragraph, sentence); sentences longer than max_tokens are cut between words."""
+    start = 0
+    for match in [*SENTENCE_END.finditer(paragraph), None]:
+        end = match.start() if match else len(paragraph)
+        sentence = paragraph[start:end]
+        if sentence.strip():
+            if estimate_tokens(sentence) <= max_tokens:
+                yield start, sentence
+            else:
+                piece_start = piece_end = None
+                for word in WORD.finditer(sentence):
+                    if piece_start is not None and estimate_tokens(sentence[piece_start:word.end()]) > max_tokens:
+                        yield start + piece_start, sentence[piece_start:piece_end]
+                        piece_start = None
+                    if piece_start is None:
+                        piece_start = word.start()
+                    piece_end = word.end()
+                if piece_start is not None:
+                    yield start + piece_start, sentence[piece_start:piece_end]
+        if match:
+            start = match.end()
+
+
+def iter_units(pages, max_tokens=CHUNK_TOKENS):
+    """Yield sentence units {"text", "tokens", "page", "paragraph", "offset", "end_offset"} in reading order."""
+    for page in pages:
+        text = page.get("text") or ""
+        for paragraph_index, paragraph_offset, paragraph in iter_paragraphs(text):
+            for sentence_offset, sentence in iter_sentences(paragraph, max_tokens):
+                sentence = sentence.strip()
+                offset = text.index(sentence, paragraph_offset + sentence_offset)
+                yield {
+                    "text": sentence,
+                    "tokens": estimate_tokens(sentence),
+                    "page": page["page"],
+                    "paragraph": paragraph_index,
+                    "offset": offset,
+                    "end_offset": offset + len(sentence),
+                }
+
+
+def make_chunk(units):
+    first, last = units[0], units[-1]
+    return {
+        "text": " ".join(unit["text"] for unit in units),
+        "metadata": {
+            "page": first["page"],
+            "end_page": last["page"],
+            "paragraph": first["paragraph"],
+            "end_paragraph": last["paragraph"],
+            "offset": first["offset"],
+            "end_offset": last["end_offset"],
+        },
+    }
+
+
+def chunk_pages(pages, chunk_tokens=CHUNK_TOKENS, overlap_tokens=OVERLAP_TOKENS):
+    """Yield {"text", "metadata"} chunks from an iterable of page dicts, as the pages arrive."""
+    units = []
+    tokens = 0
+    # Units at the start of `units` that the previous chunk already ended with
+    carried = 0
+    for unit in iter_units(pages, chunk_tokens):
+        if units and tokens + unit["tokens"] > chunk_tokens and len(units) > carried:
+            yield make_chunk(units)
+            # Carry the last sentences (up to overlap_tokens) into the next chunk
+            kept = []
+            kept_tokens = 0
+            for previous in reversed(units):
+                if kept_tokens + previous["tokens"] > overlap_tokens:
+                    break
+                kept.insert(0, previous)
+                kept_tokens += previous["tokens"]
+            units, tokens, carried = kept, kept_tokens, len(kept)
+        units.append(unit)
+        tokens += unit["tokens"]
+    if len(units) > carried:
+        yield make_chunk(units)
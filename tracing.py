@@ -0,0 +1,157 @@
+# Filename: tracing.py
+#
+# Timing spans, request ids and Prometheus-style metrics shared by easyocrapi,
+# retrieval_service and the Django app.
+#
+# - every request gets an id (the incoming X-Request-ID header or a new one),
+#   kept in a contextvar and forwarded on upstream calls by api_client
+# - span("name", **labels) times a block; durations are aggregated into the
+#   span_seconds histogram and, when TRACE_LOG is set, appended to that file as
+#   one JSON line per span
+# - render_metrics() returns everything in the Prometheus text format (/metrics)
+# - http_middleware is the FastAPI/Starlette middleware that does the above per request
+
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+REQUEST_ID_HEADER = "X-Request-ID"
+TRACE_LOG = os.getenv("TRACE_LOG")
+
+# Histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+request_id_var = ContextVar("request_id", default=None)
+
+_lock = threading.Lock()
+# (name, labels) -> [bucket counts..., sum, count]
+_histograms = {}
+# (name, labels) -> value
+_counters = {}
+
+
+def new_request_id():
+    return uuid.uuid4().hex[:16]
+
+
+def current_request_id():
+    return request_id_var.get()
+
+
+def start_request(request_id=None):
+    """Set the request id of the current context; returns a token for end_request()."""
+    return request_id_var.set(request_id or new_request_id())
+
+
+def end_request(token):
+    request_id_var.reset(token)
+
+
+def _key(name, labels):
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def observe(name, seconds, **labels):
+    """Add one observation to the histogram name{labels}."""
+    key = _key(name, labels)
+    with _lock:
+        values = _histograms.get(key)
+        if values is None:
+            values = _histograms[key] = [0] * len(BUCKETS) + [0.0, 0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                values[i] += 1
+        values[-2] += seconds
+        values[-1] += 1
+
+
+def increment(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def trace(event, **fields):
+    """Append one JSON line to TRACE_LOG (no-op when it isn't set)."""
+    if not TRACE_LOG:
+        return
+    line = json.dumps({"ts": round(time.time(), 6), "event": event, **fields}, ensure_ascii=False, default=str)
+    with _lock:
+        with open(TRACE_LOG, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def record(span_name, seconds, request_id=None, **labels):
+    """Record a span that was timed elsewhere."""
+    observe("span_seconds", seconds, span=span_name, **labels)
+    trace(span_name, request_id=request_id or current_request_id(), seconds=round(seconds, 6), **labels)
+
+
+@contextmanager
+def span(span_name, request_id=None, **labels):
+    """Time the block as span_name; request_id overrides the contextvar (for worker threads)."""
+    started = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        if error:
+            increment("span_errors_total", span=span_name, **labels)
+        record(span_name, seconds, request_id=request_id, **labels)
+
+
+def _format_labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+def render_metrics():
+    """All histograms and counters in the Prometheus text exposition format."""
+    with _lock:
+        histograms = {key: list(values) for key, values in _histograms.items()}
+        counters = dict(_counters)
+
+    lines = []
+    for name in sorted({name for name, _ in histograms}):
+        lines.append(f"# TYPE {name} histogram")
+        for (metric, labels), values in sorted(histograms.items()):
+            if metric != name:
+                continue
+            for bound, count in zip(BUCKETS, values):
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', str(bound))])} {count}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {values[-1]}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {values[-2]:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {values[-1]}")
+    for name in sorted({name for name, _ in counters}):
+        lines.append(f"# TYPE {name} counter")
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+async def http_middleware(request, call_next):
+    """FastAPI middleware: request id in, "http" span per route, request id out."""
+    token = start_request(request.headers.get(REQUEST_ID_HEADER))
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers[REQUEST_ID_HEADER] = current_request_id()
+        return response
+    finally:
+        route = request.scope.get("route")
+        record("http", time.perf_counter() - started, path=getattr(route, "path", "unmatched"), status=status)
+        end_request(token)
@@ -0,0 +1,234 @@
+# Filename: vector_store.py
+#
+# File-backed per-chat embedding store, used by retrieval_service.py instead of
+# pulling every row of a chat out of Supabase and scoring it in JavaScript.
+#
+# Each chat is a folder holding:
+#   vectors.f32   the chat's embeddings, one normalized float32 row each (memory-mapped)
+#   offsets.i64   byte offset of every row's document in documents.jsonl
+#   documents.jsonl  {"content", "url", "metadata"} per row, in the same order
+#   terms.jsonl   the rows' term frequencies for BM25 (keyword_index.py)
+#   hashes.bin    SHA-256 of every row's content, so ingest.py can skip chunks already stored
+# Search is one matrix-vector product over the memmap plus argpartition for the
+# top k, and only the k winning documents are read back from disk. Hybrid search
+# fuses the cosine similarity with the BM25 score normalized to 0..1.
+
+import hashlib
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+from arabic_text import normalize as normalize_text
+from keyword_index import TERMS_FILENAME, KeywordIndex
+
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", "vector_store")
+
+VECTORS_FILENAME = "vectors.f32"
+OFFSETS_FILENAME = "offsets.i64"
+DOCUMENTS_FILENAME = "documents.jsonl"
+HASHES_FILENAME = "hashes.bin"
+INFO_FILENAME = "info.json"
+
+# Chat ids become folder names
+CHAT_ID_PATTERN = re.compile(r"^[\w-]{1,128}$")
+
+# Hybrid score = VECTOR_WEIGHT * cosine + (1 - VECTOR_WEIGHT) * normalized BM25
+VECTOR_WEIGHT = 0.7
+
+
+def content_hash(text):
+    # Same text up to whitespace / Arabic spelling variants = same chunk
+    return hashlib.sha256(" ".join(normalize_text(text).split()).encode("utf-8")).digest()
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def top_k(scores, k):
+    """Indices of the k highest scores, best first, without sorting the whole array."""
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if scores.size > k:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.size)
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class VectorStore:
+    def __init__(self, directory=VECTOR_STORE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        # chat_id -> (row count, vectors memmap, offsets memmap)
+        self._maps = {}
+        self.keywords = KeywordIndex(self.chat_dir)
+
+    def _lock(self, chat_id):
+        with self._locks_guard:
+            return self._locks.setdefault(chat_id, threading.Lock())
+
+    def chat_dir(self, chat_id):
+        if not CHAT_ID_PATTERN.match(str(chat_id)):
+            raise ValueError(f"Invalid chat id: {chat_id!r}")
+        return os.path.join(self.directory, str(chat_id))
+
+    def _path(self, chat_id, filename):
+        return os.path.join(self.chat_dir(chat_id), filename)
+
+    def info(self, chat_id):
+        try:
+            with open(self._path(chat_id, INFO_FILENAME), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"dim": None, "count": 0, "terms_bytes": 0, "hashes_bytes": 0}
+
+    def count(self, chat_id):
+        return self.info(chat_id)["count"]
+
+    def add(self, chat_id, embeddings, documents):
+        """Append embeddings (n x dim) and their documents ({"content", "url", "metadata"})."""
+        vectors = normalize(embeddings)
+        if vectors.ndim != 2 or len(vectors) != len(documents):
+            raise ValueError("Expected one embedding per document")
+        if not len(vectors):
+            return self.count(chat_id)
+
+        with self._lock(chat_id):
+            os.makedirs(self.chat_dir(chat_id), exist_ok=True)
+            info = self.info(chat_id)
+            if info["dim"] is not None and info["dim"] != vectors.shape[1]:
+                raise ValueError(f"Embedding size {vectors.shape[1]} does not match the chat's {info['dim']}")
+
+            # Drop rows an interrupted append left past the recorded count
+            sizes = {
+                VECTORS_FILENAME: info["count"] * vectors.shape[1] * 4,
+                OFFSETS_FILENAME: info["count"] * 8,
+                TERMS_FILENAME: info.get("terms_bytes", 0),
+                HASHES_FILENAME: info.get("hashes_bytes", 0),
+            }
+            for filename, size in sizes.items():
+                path = self._path(chat_id, filename)
+                if os.path.exists(path) and os.path.getsize(path) > size:
+                    os.truncate(path, size)
+
+            with open(self._path(chat_id, DOCUMENTS_FILENAME), "ab") as f:
+                position = f.tell()
+                offsets = []
+                for document in documents:
+                    line = json.dumps(document, ensure_ascii=False).encode("utf-8") + b"\n"
+                    offsets.append(position)
+                    f.write(line)
+                    position += len(line)
+            with open(self._path(chat_id, OFFSETS_FILENAME), "ab") as f:
+                f.write(np.asarray(offsets, dtype=np.int64).tobytes())
+            with open(self._path(chat_id, VECTORS_FILENAME), "ab") as f:
+                f.write(np.ascontiguousarray(vectors).tobytes())
+            self.keywords.add(chat_id, info["count"], [document["content"] for document in documents])
+            with open(self._path(chat_id, HASHES_FILENAME), "ab") as f:
+                f.write(b"".join(content_hash(document["content"]) for document in documents))
+
+            # info.json is written last: rows beyond its count are ignored, so a crash
+            # in the middle of an append never exposes a half-written row
+            info = {
+                "dim": int(vectors.shape[1]),
+                "count": info["count"] + len(vectors),
+                "terms_bytes": os.path.getsize(self.keywords.path(chat_id)),
+                "hashes_bytes": os.path.getsize(self._path(chat_id, HASHES_FILENAME)),
+            }
+            tmp_path = self._path(chat_id, INFO_FILENAME + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(info, f)
+            os.replace(tmp_path, self._path(chat_id, INFO_FILENAME))
+            return info["count"]
+
+    def hashes(self, chat_id):
+        """content_hash() of every document stored for the chat."""
+        size = self.info(chat_id).get("hashes_bytes", 0)
+        if not size:
+            return set()
+        with open(self._path(chat_id, HASHES_FILENAME), "rb") as f:
+            data = f.read(size)
+        return {data[i:i + 32] for i in range(0, len(data), 32)}
+
+    def _matrices(self, chat_id):
+        info = self.info(chat_id)
+        count = info["count"]
+        if not count:
+            return None, None
+        cached = self._maps.get(chat_id)
+        if cached is not None and cached[0] == count:
+            return cached[1], cached[2]
+        vectors = np.memmap(self._path(chat_id, VECTORS_FILENAME), dtype=np.float32, mode="r", shape=(count, info["dim"]))
+        offsets = np.memmap(self._path(chat_id, OFFSETS_FILENAME), dtype=np.int64, mode="r", shape=(count,))
+        self._maps[chat_id] = (count, vectors, offsets)
+        return vectors, offsets
+
+    def _read_documents(self, chat_id, offsets):
+        documents = []
+        with open(self._path(chat_id, DOCUMENTS_FILENAME), "rb") as f:
+            for offset in offsets:
+                f.seek(int(offset))
+                documents.append(json.loads(f.readline()))
+        return documents
+
+    def scores(self, chat_id, query_embedding):
+        """Cosine similarity of the query to every row of the chat (empty array if none)."""
+        vectors, _ = self._matrices(chat_id)
+        if vectors is None:
+            return np.empty(0, dtype=np.float32)
+        query = normalize(query_embedding)
+        if query.shape[-1] != vectors.shape[1]:
+            raise ValueError(f"Query embedding size {query.shape[-1]} does not match the chat's {vectors.shape[1]}")
+        return vectors @ query
+
+    def documents(self, chat_id, rows):
+        _, offsets = self._matrices(chat_id)
+        return self._read_documents(chat_id, offsets[rows]) if offsets is not None else []
+
+    def search(self, chat_id, query_embedding, k=5, query=None, vector_weight=VECTOR_WEIGHT):
+        """Top k documents for the query: [{"content", "url", "metadata", "similarity", ...}], best first.
+
+        With the query text, similarity is the hybrid score and "vector" / "keyword"
+        hold its two parts.
+        """
+        vector_scores = self.scores(chat_id, query_embedding)
+        if not query:
+            rows = top_k(vector_scores, k)
+            return [
+                {**document, "similarity": float(vector_scores[row])}
+                for row, document in zip(rows, self.documents(chat_id, rows))
+            ]
+
+        keyword_scores = self.keywords.scores(chat_id, query, len(vector_scores))
+        best = keyword_scores.max() if keyword_scores.size else 0.0
+        if best > 0:
+            keyword_scores /= best
+        scores = vector_weight * vector_scores + (1 - vector_weight) * keyword_scores
+        rows = top_k(scores, k)
+        return [
+            {
+                **document,
+                "similarity": float(scores[row]),
+                "vector": float(vector_scores[row]),
+                "keyword": float(keyword_scores[row]),
+            }
+            for row, document in zip(rows, self.documents(chat_id, rows))
+        ]
+
+    def delete(self, chat_id):
+        with self._lock(chat_id):
+            self._maps.pop(chat_id, None)
+            self.keywords.forget(chat_id)
+            chat_dir = self.chat_dir(chat_id)
+            if os.path.isdir(chat_dir):
+                for name in os.listdir(chat_dir):
+                    os.remove(os.path.join(chat_dir, name))
+                os.rmdir(chat_dir)